@@ -0,0 +1,64 @@
+# Standard library imports
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BanStore:
+    """Set of banned user IDs, written through to the StateStore.
+
+    Membership checks never touch the disk. A ban or unban is one single-row
+    write to the bans table (an fsync'd append to SQLite's write-ahead log,
+    which SQLite checkpoints into the database by itself).
+
+    When shard workers share the database, bans made by another process are
+    picked up by refresh(): at most every `refresh_interval` seconds it checks
+    SQLite's data_version and reloads the set only if someone else committed.
+    """
+
+    def __init__(self, state, refresh_interval=1.0):
+        self.state = state
+        self.refresh_interval = refresh_interval
+        self.bans = state.load_bans()
+        self._version = state.data_version()
+        self._checked_at = time.monotonic()
+
+    def refresh(self, force=False):
+        """Reload the set if another connection has written to the database."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return
+        self._checked_at = now
+        version = self.state.data_version()
+        if version != self._version:
+            self._version = version
+            self.bans = self.state.load_bans()
+
+    def __contains__(self, user_id):
+        self.refresh()
+        return user_id in self.bans
+
+    def __iter__(self):
+        return iter(self.bans)
+
+    def __len__(self):
+        return len(self.bans)
+
+    def add(self, user_id):
+        """Ban a user. Returns False if they were already banned."""
+        self.refresh()
+        if user_id in self.bans:
+            return False
+        self.state.add_ban(user_id)
+        self.bans.add(user_id)
+        return True
+
+    def discard(self, user_id):
+        """Unban a user. Returns False if they were not banned."""
+        self.refresh()
+        if user_id not in self.bans:
+            return False
+        self.state.remove_ban(user_id)
+        self.bans.discard(user_id)
+        return True
@@ -0,0 +1,95 @@
+# Micro-benchmark: per-frame CPU cost of the websocket frame decoder.
+#
+# Usage: python bench_decoder.py [frames_file]
+# frames_file holds one raw Pusher frame per line. Without it a synthetic mix shaped
+# like a busy bubble is used (mostly chat messages, read marks, typing and other noise).
+
+# Standard library imports
+import sys
+import json
+import time
+import random
+from datetime import datetime
+# Local imports
+from framedecoder import FrameDecoder, JSON_BACKEND, parse_timestamp
+
+
+def sample_frames(count=20000, seed=1):
+    """Build a synthetic stream of Pusher frames."""
+    rng = random.Random(seed)
+    frames = []
+    for i in range(count):
+        roll = rng.random()
+        channel = "private-bubble.3832006.abcdef"
+        if roll < 0.45:
+            inner = {
+                "message": {
+                    "id": 90000000 + i,
+                    "bubble_id": 3832006,
+                    "message": rng.choice(["hello", "lol", "!checkpoll 3", "anyone here?", "x" * 200]),
+                    "created_at": f"2025-05-23 12:{i // 600 % 60:02d}:{i // 10 % 60:02d}",
+                    "messagemedia": [],
+                    "reactionsummary": [],
+                    "user": {"id": 5300000 + rng.randrange(500), "firstname": "Test", "lastname": "User",
+                             "fullname": "Test User", "profilepic": True},
+                }
+            }
+            frame = {"event": "App\\Events\\MessageAdded", "data": json.dumps(inner), "channel": channel}
+        elif roll < 0.65:
+            inner = {"user_id": 5300000 + rng.randrange(500), "bubble_id": 3832006, "message_id": 90000000 + i}
+            frame = {"event": "App\\Events\\MarkUpdated", "data": json.dumps(inner), "channel": channel}
+        elif roll < 0.95:
+            inner = {"user_id": 5300000 + rng.randrange(500), "bubble_id": 3832006, "thread_id": None}
+            frame = {"event": rng.choice(["client-typing", "App\\Events\\UserTyping", "App\\Events\\MessageUpdated"]),
+                     "data": json.dumps(inner), "channel": channel}
+        else:
+            frame = {"event": "pusher:ping", "data": {}}
+        frames.append(json.dumps(frame))
+    return frames
+
+
+def baseline(raw):
+    """The old connect_and_listen path: decode every frame, then decode data again."""
+    msg_data = json.loads(raw)
+    event_name = msg_data.get("event", "")
+    if event_name in ("App\\Events\\MessageAdded", "App\\Events\\MarkUpdated", "App\\Events\\BubbleChanged"):
+        msg_content = json.loads(msg_data.get("data", "{}"))
+        if event_name == "App\\Events\\MessageAdded":
+            datetime.strptime(msg_content["message"]["created_at"], "%Y-%m-%d %H:%M:%S")
+    return event_name
+
+
+def fast(decoder, raw):
+    frame = decoder.decode(raw)
+    if frame is not None and frame.event == "App\\Events\\MessageAdded":
+        parse_timestamp(frame.data["message"]["created_at"])
+    return frame
+
+
+def measure(fn, frames, rounds=5):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for raw in frames:
+            fn(raw)
+        best = min(best, time.perf_counter() - start)
+    return best / len(frames) * 1e9
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            frames = [line.rstrip("\n") for line in f if line.strip()]
+    else:
+        frames = sample_frames()
+
+    decoder = FrameDecoder()
+    old_ns = measure(baseline, frames)
+    new_ns = measure(lambda raw: fast(decoder, raw), frames)
+    print(f"{len(frames)} frames, JSON backend: {JSON_BACKEND}")
+    print(f"baseline (json.loads x2 + strptime): {old_ns:8.0f} ns/frame")
+    print(f"FrameDecoder:                        {new_ns:8.0f} ns/frame  ({old_ns / new_ns:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Standard library imports
+import time
+import asyncio
+import logging
+# Local imports
+from pronto import aio
+
+logger = logging.getLogger(__name__)
+
+
+class BubbleInfoCache:
+    """get_bubble_info results cached per bubble for `ttl` seconds.
+
+    App\\Events\\BubbleChanged payloads patch the cached bubble in place, so the
+    owner list and channelcode stay current without another API round trip.
+    Concurrent misses for the same bubble share one request.
+    """
+
+    def __init__(self, access_token, ttl=300):
+        self.access_token = access_token
+        self.ttl = ttl
+        self._entries = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, bubble_id, refresh=False):
+        """Return the bubble.info response for a bubble, fetching it if stale."""
+        bubble_id = int(bubble_id)
+        entry = self._entries.get(bubble_id)
+        if entry is not None and not refresh and time.monotonic() - entry[0] < self.ttl:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        pending = self._inflight.get(bubble_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fetch(bubble_id))
+            self._inflight[bubble_id] = pending
+        return await asyncio.shield(pending)
+
+    async def _fetch(self, bubble_id):
+        try:
+            info = await aio.get_bubble_info(self.access_token, bubble_id)
+        finally:
+            del self._inflight[bubble_id]
+        self._entries[bubble_id] = (time.monotonic(), info)
+        return info
+
+    async def owners(self, bubble_id):
+        """User IDs with the owner role in a bubble."""
+        info = await self.get(bubble_id)
+        return [row["user_id"] for row in info["bubble"]["memberships"] if row["role"] == "owner"]
+
+    async def channelcode(self, bubble_id):
+        info = await self.get(bubble_id)
+        return info["bubble"]["channelcode"]
+
+    def invalidate(self, bubble_id):
+        self._entries.pop(int(bubble_id), None)
+
+    def apply_change(self, change_data):
+        """Patch a cached bubble from a BubbleChanged payload.
+
+        A payload carrying memberships and channelcode refreshes the entry; a
+        partial one is merged but leaves the entry expired so the next read refetches.
+        """
+        bubble_obj = change_data.get("bubble") or {}
+        bubble_id = bubble_obj.get("id")
+        if not bubble_id:
+            return
+        bubble_id = int(bubble_id)
+        entry = self._entries.get(bubble_id)
+        complete = "memberships" in bubble_obj and "channelcode" in bubble_obj
+        if entry is None:
+            if complete:
+                self._entries[bubble_id] = (time.monotonic(), {"bubble": dict(bubble_obj)})
+            return
+        fetched_at, info = entry
+        info["bubble"].update(bubble_obj)
+        self._entries[bubble_id] = (time.monotonic() if complete else float("-inf"), info)
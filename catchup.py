@@ -0,0 +1,72 @@
+# Standard library imports
+import logging
+from collections import deque
+# Local imports
+from pronto import aio
+
+logger = logging.getLogger(__name__)
+
+
+class MessageTracker:
+    """Remembers which messages each bubble has dispatched.
+
+    Live events and catch-up replays both claim a message before dispatching
+    it, so whichever arrives second is dropped. Only the last `window` IDs per
+    bubble are kept; older ones are below the catch-up cursor anyway.
+    """
+
+    def __init__(self, window=2000):
+        self.window = window
+        self.last_ids = {}
+        self._recent = {}
+
+    def last(self, bubble_id):
+        """Highest message ID dispatched in a bubble, or None before the first one."""
+        return self.last_ids.get(bubble_id)
+
+    def claim(self, bubble_id, message_id):
+        """Record a message as dispatched. Returns False if it already was."""
+        try:
+            message_id = int(message_id)
+        except (TypeError, ValueError):
+            return True
+        order, ids = self._recent.setdefault(bubble_id, (deque(), set()))
+        if message_id in ids:
+            return False
+        order.append(message_id)
+        ids.add(message_id)
+        if len(order) > self.window:
+            ids.discard(order.popleft())
+        if message_id > self.last_ids.get(bubble_id, 0):
+            self.last_ids[bubble_id] = message_id
+        return True
+
+
+async def fetch_since(access_token, bubble_id, after_id, max_pages=10):
+    """Messages in a bubble newer than after_id, oldest first.
+
+    bubble.history pages backwards from `latest`, so this walks back from the
+    newest message until it reaches after_id, an empty page or max_pages.
+    """
+    found = {}
+    latest = None
+    for _ in range(max_pages):
+        response = await aio.get_bubble_messages(access_token, bubble_id, latest)
+        page = response.get("messages") or []
+        if not page:
+            break
+        reached = False
+        for message in page:
+            message_id = int(message["id"])
+            if message_id <= after_id:
+                reached = True
+            else:
+                found[message_id] = message
+        oldest = min(int(message["id"]) for message in page)
+        if reached or oldest == latest:
+            break
+        latest = oldest
+    else:
+        logger.warning(f"Catch-up for bubble {bubble_id} stopped after {max_pages} pages; "
+                       f"older missed messages were skipped")
+    return [found[message_id] for message_id in sorted(found)]
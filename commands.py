@@ -0,0 +1,113 @@
+# Standard library imports
+import re
+import logging
+from dataclasses import dataclass
+# Local imports
+from ratelimit import priority as request_priority
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+COMMAND_LATENCY = metrics.histogram("banbot_command_seconds", "Command handler run time by command", ("command",))
+
+# Permission levels
+EVERYONE = 0
+OWNER = 1
+
+
+# Argument parsers. Each takes one whitespace-separated token and raises ValueError if it doesn't fit.
+def mention(token):
+    """<@5301889> -> 5301889"""
+    match = re.fullmatch(r"<@(\d+)>", token)
+    if not match:
+        raise ValueError(f"not a mention: {token}")
+    return int(match.group(1))
+
+def choice(*options):
+    def parse(token):
+        token = token.lower()
+        if token not in options:
+            raise ValueError(f"expected one of {options}")
+        return token
+    return parse
+
+
+@dataclass
+class Command:
+    name: str
+    handler: object
+    # Parsers for the positional arguments; extra tokens are ignored
+    args: tuple = ()
+    # Pass the rest of the message (original case) as the last argument
+    rest: bool = False
+    permission: int = OWNER
+    # Run even while the bot is switched off with !bot off
+    always: bool = False
+    # Scheduler lane for the API calls the handler makes (ratelimit.URGENT..LOW); None leaves the default
+    priority: int = None
+
+
+class CommandRegistry:
+    """Maps a command's leading token to its handler.
+
+    A message is parsed once: the prefix check rejects ordinary chatter, then
+    the leading token is looked up in a dict, so adding commands costs nothing
+    per message.
+    """
+
+    def __init__(self, prefix="!"):
+        self.prefix = prefix
+        self.commands = {}
+
+    def command(self, name, *args, rest=False, permission=OWNER, always=False, priority=None):
+        """Decorator registering a handler coroutine (usually a MainBot method)."""
+        def register(handler):
+            self.commands[name] = Command(name, handler, args, rest, permission, always, priority)
+            return handler
+        return register
+
+    def parse(self, msg_text):
+        """Return (command, arguments) for a message, or None if it isn't a valid command."""
+        if not msg_text.startswith(self.prefix):
+            return None
+        parts = msg_text[len(self.prefix):].split(None, 1)
+        if not parts:
+            return None
+        command = self.commands.get(parts[0].lower())
+        if command is None:
+            return None
+        remainder = parts[1] if len(parts) > 1 else ""
+
+        values = []
+        if command.args:
+            tokens = remainder.split(None, len(command.args))
+            if len(tokens) < len(command.args):
+                return None
+            try:
+                values = [parse(token) for parse, token in zip(command.args, tokens)]
+            except ValueError:
+                return None
+            remainder = tokens[len(command.args)] if len(tokens) > len(command.args) else ""
+        if command.rest:
+            if not remainder:
+                return None
+            values.append(remainder)
+        return command, values
+
+    async def dispatch(self, bot, msg_text, user_id, msg_id, enabled=True):
+        """Run the handler for a message. Returns the Command that ran, or None."""
+        parsed = self.parse(msg_text)
+        if parsed is None:
+            return None
+        command, values = parsed
+        if not enabled and not command.always:
+            return None
+        if command.permission > await bot.permission_level(user_id):
+            return None
+        with COMMAND_LATENCY.time(command.name):
+            if command.priority is None:
+                await command.handler(bot, user_id, msg_id, *values)
+            else:
+                with request_priority(command.priority):
+                    await command.handler(bot, user_id, msg_id, *values)
+        return command
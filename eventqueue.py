@@ -0,0 +1,92 @@
+# Standard library imports
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EventWorkerPool:
+    """Runs event handlers on a fixed set of workers fed from bounded queues.
+
+    Each worker owns one queue, and an event's ordering key (the bubble ID for
+    messages) always maps to the same worker, so one bubble's messages are
+    handled in order while other bubbles carry on in parallel. When a queue is
+    full, submit() waits for room (backpressure on the websocket reader).
+    Only events submitted with droppable=True, such as ordinary chatter, give
+    up after `put_timeout` seconds and are dropped and counted; moderation
+    events are never dropped.
+
+    If `on_timing` is set, it is called after every event with the handler's
+    name, the seconds it sat in the queue and the seconds it ran.
+    """
+
+    def __init__(self, workers=4, maxsize=500, put_timeout=0.05):
+        self.worker_count = workers
+        self.maxsize = maxsize
+        self.put_timeout = put_timeout
+        self.queues = []
+        self.tasks = []
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.on_timing = None
+
+    def start(self):
+        self.queues = [asyncio.Queue(self.maxsize) for _ in range(self.worker_count)]
+        self.tasks = [asyncio.create_task(self._worker(queue)) for queue in self.queues]
+
+    def depth(self):
+        """Events waiting across all queues."""
+        return sum(queue.qsize() for queue in self.queues)
+
+    async def submit(self, key, handler, *args, droppable=False):
+        """Queue handler(*args) on the worker for `key`. Returns False if it was dropped."""
+        queue = self.queues[hash(key) % len(self.queues)]
+        item = (handler, args, time.monotonic())
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if not droppable:
+                await queue.put(item)
+                self.submitted += 1
+                return True
+            try:
+                await asyncio.wait_for(queue.put(item), self.put_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                logger.warning(f"Event queue full, dropped {handler.__name__} (dropped so far: {self.dropped})")
+                return False
+        self.submitted += 1
+        return True
+
+    async def _worker(self, queue):
+        while True:
+            handler, args, queued_at = await queue.get()
+            started = time.monotonic()
+            try:
+                await handler(*args)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error in {handler.__name__}: {e}")
+            finally:
+                self.processed += 1
+                queue.task_done()
+                if self.on_timing is not None:
+                    self.on_timing(handler.__name__, started - queued_at, time.monotonic() - started)
+
+    async def join(self):
+        """Wait until every queued event has been handled."""
+        await asyncio.gather(*(queue.join() for queue in self.queues))
+
+    async def stop(self, drain_timeout=5.0):
+        """Let queued events finish (up to drain_timeout seconds), then stop the workers."""
+        try:
+            await asyncio.wait_for(self.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping with {self.depth()} events still queued")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
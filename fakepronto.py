@@ -0,0 +1,384 @@
+# A stand-in for the Pronto API and Pusher websocket, for load testing the bot end to end.
+#
+# Usage: python fakepronto.py [--http-port 8780] [--ws-port 8781] [--latency 0.02] [--error-rate 0.01]
+# then run the bot against it:
+#   PRONTO_API_BASE_URL=http://127.0.0.1:8780/ PRONTO_PUSHER_URI=ws://127.0.0.1:8781/app/fake \
+#   BANBOT_STATE_DB=/tmp/loadtest.db accesstoken=fake python main.py
+# loadgen.py starts this server itself and drives a raid against the bot.
+
+# Standard library imports
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs
+# Third party imports
+import websockets
+
+logger = logging.getLogger(__name__)
+
+
+class FakePronto:
+    """In-memory Pronto: bubbles, messages, invites and the Pusher channels subscribed to them.
+
+    Every HTTP request waits gauss(latency, jitter) seconds, then fails with a
+    500 at `error_rate` or a 429 (Retry-After: 1) at `throttle_rate`. Listeners
+    registered with on_event() are told about kicks, adds and created messages
+    as (kind, payload, monotonic time), which is what loadgen.py measures.
+    """
+
+    def __init__(self, owner_id=1000, bot_id=5301889, latency=0.0, jitter=0.0, error_rate=0.0,
+                 throttle_rate=0.0, org_size=250, seed=None):
+        self.owner_id = owner_id
+        self.bot_id = bot_id
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.org_size = org_size
+        self.random = random.Random(seed)
+        self.bubbles = {}
+        # bubble_id -> [message, ...] oldest first
+        self.messages = {}
+        self.invites = {}
+        self.next_message_id = 100000000
+        self.next_invite = 0
+        self.next_file = 0
+        # websocket -> set of subscribed channels
+        self.subscriptions = {}
+        self.subscribed = asyncio.Condition()
+        # Open keep-alive HTTP connections, closed on stop() so their handlers end cleanly
+        self.http_clients = set()
+        self.listeners = []
+        self.requests = Counter()
+        self.injected = Counter()
+        self.routes = [
+            ("POST", r"/api/v2/bubble\.info", self.bubble_info),
+            ("POST", r"/api/v1/bubble\.kick", self.bubble_kick),
+            ("POST", r"/api/clients/chats/(\d+)/memberships/batch", self.memberships_batch),
+            ("GET", r"/api/clients/groups/(\d+)/invites", self.list_invites),
+            ("POST", r"/api/clients/groups/(\d+)/invites", self.create_invite),
+            ("DELETE", r"/api/clients/invites/([^/]+)", self.delete_invite),
+            ("POST", r"/api/v1/message\.create", self.message_create),
+            ("POST", r"/api/v1/message\.edit", self.ok),
+            ("POST", r"/api/v1/bubble\.update", self.ok),
+            ("POST", r"/api/clients/messages/(\d+)/reactions", self.add_reaction),
+            ("POST", r"/api/v1/bubble\.history", self.bubble_history),
+            ("POST", r"/api/v1/pusher\.auth", self.pusher_auth),
+            ("POST", r"/api/v1/user\.info", self.user_info),
+            ("GET", r"/api/clients/users/search", self.user_search),
+            ("PUT", r"/api/files", self.upload_file),
+        ]
+        self.routes = [(method, re.compile(pattern + "$"), handler) for method, pattern, handler in self.routes]
+
+    # State
+    def bubble(self, bubble_id):
+        bubble_id = int(bubble_id)
+        bubble = self.bubbles.get(bubble_id)
+        if bubble is None:
+            bubble = self.bubbles[bubble_id] = {
+                "id": bubble_id,
+                "title": f"Bubble {bubble_id}",
+                "channelcode": f"fake{bubble_id}",
+                "memberships": [
+                    {"user_id": self.owner_id, "role": "owner"},
+                    {"user_id": self.bot_id, "role": "owner"},
+                ],
+                "pinned_message": {"id": 1, "user_id": self.owner_id, "message": ""},
+            }
+            self.messages[bubble_id] = []
+            self.invites[bubble_id] = []
+        return bubble
+
+    def user(self, user_id):
+        user_id = int(user_id)
+        return {"id": user_id, "firstname": "User", "lastname": str(user_id), "fullname": f"User {user_id}"}
+
+    def new_message(self, bubble_id, user_id, text, parent_id=None):
+        self.bubble(bubble_id)
+        self.next_message_id += 1
+        message = {
+            "id": self.next_message_id,
+            "bubble_id": int(bubble_id),
+            "message": text,
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            "messagemedia": [],
+            "reactionsummary": [],
+            "parentmessage_id": parent_id,
+            "user": self.user(user_id),
+        }
+        self.messages[int(bubble_id)].append(message)
+        return message
+
+    def on_event(self, listener):
+        self.listeners.append(listener)
+
+    def emit(self, kind, payload):
+        now = time.monotonic()
+        for listener in self.listeners:
+            listener(kind, payload, now)
+
+    # Websocket side
+    def channel(self, bubble_id):
+        return f"private-bubble.{int(bubble_id)}.{self.bubble(bubble_id)['channelcode']}"
+
+    async def push(self, channel, event, data):
+        """Send an event to every socket subscribed to a channel. Returns how many got it."""
+        frame = json.dumps({"event": event, "channel": channel, "data": json.dumps(data)})
+        sent = 0
+        for websocket, channels in list(self.subscriptions.items()):
+            if channel in channels:
+                try:
+                    await websocket.send(frame)
+                    sent += 1
+                except websockets.exceptions.ConnectionClosed:
+                    pass
+        return sent
+
+    async def message_added(self, bubble_id, user_id, text):
+        message = self.new_message(bubble_id, user_id, text)
+        await self.push(self.channel(bubble_id), "App\\Events\\MessageAdded", {"message": message})
+        return message
+
+    async def mark_updated(self, bubble_id, user_id):
+        return await self.push(self.channel(bubble_id), "App\\Events\\MarkUpdated",
+                               {"user_id": int(user_id), "bubble_id": int(bubble_id), "message_id": self.next_message_id})
+
+    async def bubble_changed(self, bubble_id, rotate_channelcode=False):
+        bubble = self.bubble(bubble_id)
+        old_channel = self.channel(bubble_id)
+        if rotate_channelcode:
+            bubble["channelcode"] = f"fake{bubble_id}-{self.random.randrange(1 << 30)}"
+        return await self.push(old_channel, "App\\Events\\BubbleChanged", {"bubble": dict(bubble)})
+
+    async def drop_connections(self):
+        """Close every websocket, as a network blip would."""
+        for websocket in list(self.subscriptions):
+            await websocket.close()
+
+    async def wait_subscribed(self, channel, timeout=30.0):
+        async with self.subscribed:
+            await asyncio.wait_for(
+                self.subscribed.wait_for(lambda: any(channel in c for c in self.subscriptions.values())), timeout)
+
+    async def handle_websocket(self, websocket, path=None):
+        self.subscriptions[websocket] = set()
+        socket_id = f"{self.random.randrange(10 ** 6)}.{self.random.randrange(10 ** 6)}"
+        await websocket.send(json.dumps({
+            "event": "pusher:connection_established",
+            "data": json.dumps({"socket_id": socket_id, "activity_timeout": 120}),
+        }))
+        try:
+            async for raw in websocket:
+                frame = json.loads(raw)
+                event = frame.get("event")
+                data = frame.get("data") or {}
+                if event == "pusher:ping":
+                    await websocket.send(json.dumps({"event": "pusher:pong", "data": {}}))
+                elif event == "pusher:subscribe":
+                    self.subscriptions[websocket].add(data["channel"])
+                    await websocket.send(json.dumps({"event": "pusher_internal:subscription_succeeded",
+                                                     "channel": data["channel"], "data": "{}"}))
+                    async with self.subscribed:
+                        self.subscribed.notify_all()
+                elif event == "pusher:unsubscribe":
+                    self.subscriptions[websocket].discard(data["channel"])
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            del self.subscriptions[websocket]
+
+    # HTTP side
+    async def handle_http(self, reader, writer):
+        self.http_clients.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, value = line.decode("latin-1").split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get("expect", "").lower() == "100-continue":
+                    writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload, extra = await self.dispatch(method, target, body)
+                data = b"" if payload is None else json.dumps(payload).encode()
+                head = f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                for name, value in extra.items():
+                    head += f"{name}: {value}\r\n"
+                writer.write(head.encode() + b"\r\n" + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.http_clients.discard(writer)
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(url.path)
+            if route_method == method and match:
+                break
+        else:
+            return 404, {"message": f"No fake for {method} {url.path}"}, {}
+        self.requests[handler.__name__] += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+        roll = self.random.random()
+        if roll < self.error_rate:
+            self.injected["500"] += 1
+            return 500, {"message": "Injected server error"}, {}
+        if roll < self.error_rate + self.throttle_rate:
+            self.injected["429"] += 1
+            return 429, {"message": "Too Many Attempts."}, {"Retry-After": "1"}
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            # File uploads carry raw bytes
+            payload = {"raw": body}
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return await handler(payload, query, *match.groups())
+
+    async def ok(self, payload, query):
+        return 200, {"ok": True}, {}
+
+    async def bubble_info(self, payload, query):
+        return 200, {"ok": True, "bubble": self.bubble(payload["bubble_id"])}, {}
+
+    async def bubble_kick(self, payload, query):
+        self.emit("kick", {"bubble_id": int(payload["bubble_id"]), "users": [int(u) for u in payload["users"]]})
+        return 200, {"ok": True}, {}
+
+    async def memberships_batch(self, payload, query, bubble_id):
+        self.emit("add", {"bubble_id": int(bubble_id), "users": [int(u) for u in payload["user_ids"]]})
+        return 200, {"ok": True}, {}
+
+    async def list_invites(self, payload, query, bubble_id):
+        self.bubble(bubble_id)
+        return 200, {"data": list(self.invites[int(bubble_id)])}, {}
+
+    async def create_invite(self, payload, query, bubble_id):
+        return 200, {"data": self.add_invite(bubble_id, self.owner_id)}, {}
+
+    def add_invite(self, bubble_id, user_id):
+        self.bubble(bubble_id)
+        self.next_invite += 1
+        invite = {"code": f"inv{self.next_invite}", "user_id": int(user_id)}
+        self.invites[int(bubble_id)].append(invite)
+        return invite
+
+    async def delete_invite(self, payload, query, code):
+        for invites in self.invites.values():
+            invites[:] = [invite for invite in invites if invite["code"] != code]
+        return 200, None, {}
+
+    async def message_create(self, payload, query):
+        message = self.new_message(payload["bubble_id"], payload.get("user_id", self.bot_id), payload["message"],
+                                   payload.get("parentmessage_id"))
+        message["messagemedia"] = [{"key": key} for key in payload.get("attachment_file_keys") or []]
+        self.emit("message", message)
+        await self.push(self.channel(payload["bubble_id"]), "App\\Events\\MessageAdded", {"message": message})
+        return 200, {"ok": True, "message": message}, {}
+
+    async def add_reaction(self, payload, query, message_id):
+        message_id = int(message_id)
+        for bubble_id, messages in self.messages.items():
+            for message in messages:
+                if message["id"] == message_id:
+                    summary = message["reactionsummary"]
+                    for row in summary:
+                        if row["emoji"] == payload["emoji"]:
+                            row["count"] += 1
+                            break
+                    else:
+                        summary.append({"emoji": payload["emoji"], "count": 1})
+                    self.emit("reaction", {"message_id": message_id, "emoji": payload["emoji"]})
+                    await self.push(self.channel(bubble_id), "App\\Events\\MessageUpdated", {"message": message})
+                    return 200, {"data": {"message_id": message_id}}, {}
+        return 422, {"message": "The given data was invalid."}, {}
+
+    async def bubble_history(self, payload, query):
+        messages = self.messages.get(int(payload["bubble_id"]), [])
+        thread_id = payload.get("thread_id")
+        if thread_id is not None:
+            parents = [m for m in messages if m["id"] == int(thread_id)]
+            replies = [m for m in messages if m.get("parentmessage_id") == int(thread_id)]
+            return 200, {"ok": True, "parentmessages": parents, "messages": replies[-50:]}, {}
+        latest = payload.get("latest")
+        if latest is not None:
+            messages = [m for m in messages if m["id"] < int(latest)]
+        return 200, {"ok": True, "messages": list(reversed(messages[-50:]))}, {}
+
+    async def pusher_auth(self, payload, query):
+        return 200, {"auth": f"fake:{payload['socket_id']}:{payload['channel_name']}"}, {}
+
+    async def user_info(self, payload, query):
+        return 200, {"ok": True, "user": self.user(payload["id"])}, {}
+
+    async def user_search(self, payload, query):
+        start = int(query.get("cursor", 0))
+        end = min(start + 100, self.org_size)
+        users = [self.user(1000 + i) for i in range(start, end)]
+        return 200, {"data": users, "cursors": {"next": str(end) if end < self.org_size else None}}, {}
+
+    async def upload_file(self, payload, query):
+        self.next_file += 1
+        return 200, {"data": {"key": f"fake-file-{self.next_file}"}}, {}
+
+    async def start(self, host="127.0.0.1", http_port=8780, ws_port=8781):
+        self.http_server = await asyncio.start_server(self.handle_http, host, http_port)
+        self.ws_server = await websockets.serve(self.handle_websocket, host, ws_port)
+        logger.info(f"Fake Pronto API on http://{host}:{http_port}/, Pusher on ws://{host}:{ws_port}/app/fake")
+
+    async def stop(self):
+        self.http_server.close()
+        for writer in list(self.http_clients):
+            writer.close()
+        self.ws_server.close()
+        await self.http_server.wait_closed()
+        await self.ws_server.wait_closed()
+
+
+def add_server_arguments(parser):
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--http-port", type=int, default=8780)
+    parser.add_argument("--ws-port", type=int, default=8781)
+    parser.add_argument("--owner", type=int, default=1000, help="user ID that owns every bubble")
+    parser.add_argument("--latency", type=float, default=0.0, help="mean API latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="standard deviation of the API latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of API calls answered with a 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of API calls answered with a 429")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def server_from_arguments(args):
+    return FakePronto(args.owner, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      throttle_rate=args.throttle_rate, seed=args.seed)
+
+
+async def serve_forever(args):
+    server = server_from_arguments(args)
+    await server.start(args.host, args.http_port, args.ws_port)
+    await asyncio.Future()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Fake Pronto API and Pusher server")
+    add_server_arguments(parser)
+    try:
+        asyncio.run(serve_forever(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
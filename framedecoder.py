@@ -0,0 +1,86 @@
+# Standard library imports
+import re
+import json
+import logging
+from datetime import datetime
+from functools import lru_cache
+from dataclasses import dataclass
+
+# orjson is several times faster than the json module; use it when it is installed
+try:
+    import orjson
+    json_loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    json_loads = json.loads
+    JSON_BACKEND = "json"
+
+logger = logging.getLogger(__name__)
+
+# Events the bot acts on; every other frame is skipped after peeking its name
+HANDLED_EVENTS = frozenset({
+    "pusher:ping",
+    "pusher:pong",
+    "App\\Events\\MessageAdded",
+    "App\\Events\\MarkUpdated",
+    "App\\Events\\BubbleChanged",
+    # Carries reactionsummary, which keeps poll tallies current
+    "App\\Events\\MessageUpdated",
+})
+
+# Matches the top-level "event" key. Inside the "data" string every quote is escaped,
+# so this can't match an "event" key nested in the payload.
+_EVENT_RE = re.compile(r'"event"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+@dataclass
+class Frame:
+    event: str
+    channel: str = None
+    # The decoded "data" of the frame (Pusher sends it as a JSON string)
+    data: dict = None
+
+
+def peek_event(raw):
+    """Return the event name of a raw Pusher frame without decoding it."""
+    match = _EVENT_RE.search(raw)
+    if match is None:
+        return ""
+    name = match.group(1)
+    return name.replace("\\\\", "\\") if "\\" in name else name
+
+
+@lru_cache(maxsize=4096)
+def parse_timestamp(value):
+    """Parse Pronto's "%Y-%m-%d %H:%M:%S" timestamps; cached since bursts share a second."""
+    if len(value) == 19 and value[4] == "-" and value[7] == "-" and value[10] == " " and value[13] == ":" and value[16] == ":":
+        return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                        int(value[11:13]), int(value[14:16]), int(value[17:19]))
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+
+class FrameDecoder:
+    """Turns raw websocket frames into Frames, skipping events nobody handles.
+
+    Pluggable: BanBot accepts any object with a decode(raw) method, and the JSON
+    backend can be swapped with `loads`.
+    """
+
+    def __init__(self, handled=HANDLED_EVENTS, loads=json_loads):
+        self.handled = handled
+        self.loads = loads
+        self.decoded = 0
+        self.skipped = 0
+
+    def decode(self, raw):
+        """Return a Frame, or None if the frame's event isn't handled."""
+        event = peek_event(raw)
+        if event not in self.handled:
+            self.skipped += 1
+            return None
+        self.decoded += 1
+        outer = self.loads(raw)
+        data = outer.get("data")
+        if isinstance(data, (str, bytes)):
+            data = self.loads(data) if data else {}
+        return Frame(event, outer.get("channel"), data if data is not None else {})
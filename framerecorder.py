@@ -0,0 +1,87 @@
+# Standard library imports
+import gzip
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class FrameRecorder:
+    """Appends raw websocket frames to a gzip log for later replay.
+
+    Each line is "<seconds since recording started>\\t<raw frame>". Pusher
+    frames are single-line JSON, so tabs and newlines inside them are already
+    escaped. write() only buffers the line; a writer thread compresses and
+    flushes the buffer every `flush_interval` seconds, so the event loop never
+    waits on zlib or the disk and a crash loses at most that much of the
+    recording. close() writes out what is left.
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self._started = time.monotonic()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="frame-recorder", daemon=True)
+        self._thread.start()
+        self.frames = 0
+        logger.info(f"Recording websocket frames to {path}")
+
+    def write(self, raw):
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8", "replace")
+        line = f"{time.monotonic() - self._started:.6f}\t{raw}\n"
+        with self._lock:
+            self._pending.append(line)
+        self.frames += 1
+
+    def _flush(self):
+        with self._lock:
+            lines, self._pending = self._pending, []
+        if lines:
+            self._file.write("".join(lines))
+            self._file.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self._flush()
+            except Exception as e:
+                logger.error(f"Could not write frames to {self.path}: {e}")
+
+    def close(self):
+        if self._file is not None:
+            self._stop.set()
+            self._thread.join()
+            self._flush()
+            self._file.close()
+            self._file = None
+            logger.info(f"Recorded {self.frames} frames to {self.path}")
+
+
+def read_frames(path):
+    """Yield (offset in seconds, raw frame) from a recording, oldest first.
+
+    A log appended to by several runs restarts its offsets at 0; those runs
+    are laid end to end. A line cut short by a crash is skipped.
+    """
+    base = 0.0
+    last = 0.0
+    with gzip.open(path, "rt", encoding="utf-8") as log:
+        try:
+            for line in log:
+                offset, sep, raw = line.rstrip("\n").partition("\t")
+                if not sep:
+                    continue
+                offset = float(offset)
+                if offset + base < last:
+                    base = last
+                last = offset + base
+                yield last, raw
+        except EOFError:
+            # The recording wasn't closed cleanly; keep what was flushed
+            logger.warning(f"{path} ends mid-stream; replaying the frames before the cut")
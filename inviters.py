@@ -0,0 +1,72 @@
+# Standard library imports
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class InviterCounts:
+    """How many invite links each user made after a banned user rejoined.
+
+    Counts live in a dict keyed by user_id. Changes are written behind: the first
+    change schedules a flush `flush_delay` seconds later, and everything changed
+    in that window goes to the StateStore as one transaction (sooner if
+    `max_pending` users are waiting). Call close() on shutdown to flush the rest.
+
+    Changes are written as increments, so shard workers sharing the database
+    don't overwrite each other's counts; each flush reads back the totals.
+    """
+
+    def __init__(self, state, flush_delay=2.0, max_pending=200):
+        self.state = state
+        self.flush_delay = flush_delay
+        self.max_pending = max_pending
+        self.counts = state.load_inviters()
+        # user_id -> increments not yet written
+        self._pending = {}
+        self._flush_task = None
+
+    def __getitem__(self, user_id):
+        return self.counts.get(user_id, 0)
+
+    def increment(self, user_id):
+        """Count one more invite for a user and return their new total."""
+        count = self.counts.get(user_id, 0) + 1
+        self.counts[user_id] = count
+        self._pending[user_id] = self._pending.get(user_id, 0) + 1
+        if len(self._pending) >= self.max_pending:
+            self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+        return count
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(self.flush_delay)
+        finally:
+            self._flush_task = None
+        self.flush()
+
+    def flush(self):
+        """Write every changed count now."""
+        if not self._pending:
+            return
+        batch = self._pending
+        self._pending = {}
+        try:
+            totals = self.state.add_inviters(batch)
+        except Exception as e:
+            # Put the increments back so the next flush retries them
+            for user_id, increment in batch.items():
+                self._pending[user_id] = self._pending.get(user_id, 0) + increment
+            logger.error(f"Failed to save inviter counts: {e}")
+            return
+        # Totals include other workers' increments; keep any made since this flush started
+        for user_id, total in totals.items():
+            self.counts[user_id] = total + self._pending.get(user_id, 0)
+
+    def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self.flush()
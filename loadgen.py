@@ -0,0 +1,199 @@
+# Load generator: runs a raid against the bot through fakepronto.py and reports latency percentiles.
+#
+# Usage: python loadgen.py --spawn-bot [--raiders 50] [--rejoin-rate 20] [--chatter-rate 50]
+#                          [--command-rate 2] [--duration 30] [--latency 0.02] [--error-rate 0.01]
+# Without --spawn-bot, start the bot yourself with the environment printed at startup.
+#
+# The owner first bans every raider with !ban; then, for --duration seconds, banned
+# raiders "rejoin" (MarkUpdated) while ordinary members chat and the owner runs !poll.
+# Time-to-kick runs from a rejoin (or !ban) frame being sent to the bubble.kick that
+# removes that user; command latency from a !poll frame to the bot's "Poll #" reply.
+
+# Standard library imports
+import os
+import sys
+import time
+import signal
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+from collections import defaultdict
+# Local imports
+from fakepronto import add_server_arguments, server_from_arguments
+
+logger = logging.getLogger(__name__)
+
+MAIN_BUBBLE_ID = 3832006
+
+
+def percentiles(samples):
+    if not samples:
+        return "no samples"
+    ordered = sorted(samples)
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+    return (f"n={len(ordered)} p50={at(0.5):.1f}ms p90={at(0.9):.1f}ms "
+            f"p99={at(0.99):.1f}ms max={ordered[-1] * 1000:.1f}ms")
+
+
+class LoadGenerator:
+    def __init__(self, server, args):
+        self.server = server
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.bubble_id = args.bubble
+        self.raiders = [900000 + i for i in range(args.raiders)]
+        # user_id -> send times of rejoins not kicked yet
+        self.pending_kicks = defaultdict(list)
+        # poll token -> send time
+        self.pending_commands = {}
+        self.ban_kicks = []
+        self.rejoin_kicks = []
+        self.command_latency = []
+        self.kick_calls = 0
+        self.kicked_users = 0
+        self.rejoins = 0
+        self.chatter = 0
+        server.on_event(self.on_server_event)
+
+    def on_server_event(self, kind, payload, now):
+        if kind == "kick" and payload["bubble_id"] == self.bubble_id:
+            self.kick_calls += 1
+            self.kicked_users += len(payload["users"])
+            for user_id in payload["users"]:
+                for sent_at, is_ban in self.pending_kicks.pop(user_id, []):
+                    (self.ban_kicks if is_ban else self.rejoin_kicks).append(now - sent_at)
+        elif kind == "message":
+            for token in [token for token in self.pending_commands if token in payload["message"]]:
+                self.command_latency.append(now - self.pending_commands.pop(token))
+
+    async def paced(self, rate, action):
+        """Call action() `rate` times a second (Poisson arrivals) until the run ends."""
+        if rate <= 0:
+            return
+        while time.monotonic() < self.deadline:
+            await asyncio.sleep(self.random.expovariate(rate))
+            await action()
+
+    async def rejoin(self):
+        user_id = self.random.choice(self.raiders)
+        self.pending_kicks[user_id].append((time.monotonic(), False))
+        self.rejoins += 1
+        if self.args.invites:
+            # The raider's friends made invite links, which the bot purges and counts
+            self.server.add_invite(self.bubble_id, self.random.randrange(2000, 2000 + self.args.invites))
+        await self.server.mark_updated(self.bubble_id, user_id)
+
+    async def chat(self):
+        self.chatter += 1
+        user_id = self.random.randrange(1000, 1000 + self.args.members)
+        await self.server.message_added(self.bubble_id, user_id, self.random.choice(["hello", "lol", "anyone here?"]))
+
+    async def command(self):
+        token = f"loadgen-{len(self.pending_commands) + len(self.command_latency)}"
+        self.pending_commands[token] = time.monotonic()
+        await self.server.message_added(self.bubble_id, self.args.owner, f"!poll {token}")
+
+    async def run(self):
+        channel = self.server.channel(self.bubble_id)
+        logger.info(f"Waiting for the bot to subscribe to {channel}")
+        await self.server.wait_subscribed(channel, self.args.connect_timeout)
+
+        # Ban phase: the owner bans every raider
+        for user_id in self.raiders:
+            self.pending_kicks[user_id].append((time.monotonic(), True))
+            await self.server.message_added(self.bubble_id, self.args.owner, f"!ban <@{user_id}>")
+        await self.settle(lambda: not any(is_ban for waits in self.pending_kicks.values() for _, is_ban in waits))
+
+        # Raid phase
+        logger.info(f"Raiding for {self.args.duration}s")
+        self.deadline = time.monotonic() + self.args.duration
+        await asyncio.gather(
+            self.paced(self.args.rejoin_rate, self.rejoin),
+            self.paced(self.args.chatter_rate, self.chat),
+            self.paced(self.args.command_rate, self.command),
+        )
+        await self.settle(lambda: not self.pending_kicks and not self.pending_commands)
+
+    async def settle(self, done, timeout=None):
+        deadline = time.monotonic() + (timeout or self.args.drain_timeout)
+        while not done() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    def report(self):
+        missed_kicks = sum(len(waits) for waits in self.pending_kicks.values())
+        lines = [
+            f"rejoins sent: {self.rejoins}, chat messages: {self.chatter}, commands: "
+            f"{len(self.command_latency) + len(self.pending_commands)}",
+            f"!ban -> kick:        {percentiles(self.ban_kicks)}",
+            f"rejoin -> kick:      {percentiles(self.rejoin_kicks)}",
+            f"!poll -> reply:      {percentiles(self.command_latency)}",
+            f"kick calls: {self.kick_calls} for {self.kicked_users} users; "
+            f"never kicked: {missed_kicks}; commands never answered: {len(self.pending_commands)}",
+            f"API requests: {dict(self.server.requests)}",
+            f"injected failures: {dict(self.server.injected)}",
+        ]
+        return "\n".join(lines)
+
+
+def bot_environment(args, db_path):
+    return {
+        "PRONTO_API_BASE_URL": f"http://{args.host}:{args.http_port}/",
+        "PRONTO_FILES_URL": f"http://{args.host}:{args.http_port}/api/files",
+        "PRONTO_PUSHER_URI": f"ws://{args.host}:{args.ws_port}/app/fake",
+        "BANBOT_STATE_DB": db_path,
+        "accesstoken": "fake",
+    }
+
+
+async def main(args):
+    server = server_from_arguments(args)
+    await server.start(args.host, args.http_port, args.ws_port)
+    db_path = os.path.join(tempfile.mkdtemp(prefix="loadgen-"), "state.db")
+    environment = bot_environment(args, db_path)
+    bot = None
+    if args.spawn_bot:
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+        bot = await asyncio.create_subprocess_exec(
+            sys.executable, script, env=dict(os.environ, **environment),
+            stdout=asyncio.subprocess.DEVNULL, stderr=None if args.bot_logs else asyncio.subprocess.DEVNULL)
+    else:
+        logger.info("Start the bot with: " + " ".join(f"{key}={value}" for key, value in environment.items())
+                    + " python main.py")
+    generator = LoadGenerator(server, args)
+    try:
+        await generator.run()
+        print(generator.report())
+    finally:
+        if bot is not None:
+            # SIGTERM lets the bot drain its queues and flush state before exiting
+            bot.send_signal(signal.SIGTERM)
+            try:
+                await asyncio.wait_for(bot.wait(), args.drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Bot didn't exit after SIGTERM; killing it")
+                bot.kill()
+                await bot.wait()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Drive a raid against the bot through the fake Pronto server")
+    add_server_arguments(parser)
+    parser.add_argument("--bubble", type=int, default=MAIN_BUBBLE_ID)
+    parser.add_argument("--raiders", type=int, default=50, help="banned accounts that keep rejoining")
+    parser.add_argument("--members", type=int, default=200, help="ordinary members chatting")
+    parser.add_argument("--invites", type=int, default=0,
+                        help="add an invite link from one of this many members with every rejoin")
+    parser.add_argument("--rejoin-rate", type=float, default=20.0, help="rejoins per second")
+    parser.add_argument("--chatter-rate", type=float, default=50.0, help="chat messages per second")
+    parser.add_argument("--command-rate", type=float, default=2.0, help="!poll commands per second")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--connect-timeout", type=float, default=60.0)
+    parser.add_argument("--drain-timeout", type=float, default=15.0)
+    parser.add_argument("--spawn-bot", action="store_true", help="run main.py against the fake server")
+    parser.add_argument("--bot-logs", action="store_true", help="show the spawned bot's log output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,174 @@
+# Standard library imports
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+# Fields every LogRecord has; anything else on a record came in through `extra=` and is logged too
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+_plain_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, then any extra fields."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.processName != "MainProcess":
+            entry["process"] = record.processName
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets at most `burst` records per call site through every `window` seconds.
+
+    Records below `level` always pass. A call site is the logger, level, file
+    and line, so one logger.error(f"...") repeated for thousands of users
+    counts as one line however its text varies. The first record let through
+    after some were held back carries suppressed=<count>.
+    """
+
+    def __init__(self, burst=5, window=60.0, level=logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.level = level
+        # call site -> [window start, records passed, records suppressed]
+        self._sites = {}
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno)
+        now = time.monotonic()
+        site = self._sites.get(key)
+        if site is None or now - site[0] >= self.window:
+            held_back = site[2] if site is not None else 0
+            self._sites[key] = [now, 1, 0]
+            if held_back:
+                record.suppressed = held_back
+            return True
+        if site[1] < self.burst:
+            site[1] += 1
+            return True
+        site[2] += 1
+        self.suppressed += 1
+        return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops and counts records when the queue is full instead of blocking."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Render the message and traceback now, since args and exc_info may not survive the
+        # thread hop, but leave the formatting itself to the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _plain_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Root logging through a bounded queue, written out by a QueueListener thread.
+
+    Code on the event loop only filters the record, renders its message and
+    puts it on the queue; formatting to JSON and the terminal or disk writes
+    happen on the listener's thread.
+    """
+
+    def __init__(self, handlers, maxsize=10000, rate_limit=None):
+        self.queue = queue.Queue(maxsize)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.rate_limit = rate_limit
+        if rate_limit is not None:
+            self.handler.addFilter(rate_limit)
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+
+    @property
+    def dropped(self):
+        return self.handler.dropped
+
+    @property
+    def suppressed(self):
+        return self.rate_limit.suppressed if self.rate_limit is not None else 0
+
+    def start(self):
+        self.listener.start()
+
+    def stop(self):
+        """Write out what is queued and stop the listener thread."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+
+# The installed pipeline, if setup_logging() installed one
+pipeline = None
+
+
+def setup_logging(level=None, json_format=None, path=None, force=False):
+    """Send root logging through a LogPipeline, unless logging is already configured.
+
+    Defaults come from BANBOT_LOG_LEVEL (INFO), BANBOT_LOG_FORMAT (json, or
+    text for the classic one-line format) and BANBOT_LOG_FILE (also append
+    to this file). Like logging.basicConfig, it does nothing when the root
+    logger already has handlers, unless force is set.
+    """
+    global pipeline
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return None
+    if pipeline is not None:
+        pipeline.stop()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+    level = level or os.getenv("BANBOT_LOG_LEVEL", "INFO").upper()
+    if json_format is None:
+        json_format = os.getenv("BANBOT_LOG_FORMAT", "json") != "text"
+    path = path or os.getenv("BANBOT_LOG_FILE")
+    formatter = JsonFormatter() if json_format else logging.Formatter(logging.BASIC_FORMAT)
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if path:
+        handlers.append(logging.FileHandler(path, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    pipeline = LogPipeline(handlers, rate_limit=RateLimitFilter())
+    root.addHandler(pipeline.handler)
+    root.setLevel(level)
+    pipeline.start()
+    atexit.register(pipeline.stop)
+    return pipeline
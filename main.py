@@ -1,47 +1,93 @@
 # Standard library imports
+import os
+import time
+import signal
 import asyncio
 import websockets
 from datetime import datetime
 # Local imports
 from pronto import *
-from mainbot import MainBot
+from mainbot import MainBot, SharedState, admin_bubble_id, commands
+from bubblecache import BubbleInfoCache
+from eventqueue import EventWorkerPool
+from framedecoder import FrameDecoder, parse_timestamp
 from accesstoken import getAccesstoken
+from shards import Coordinator
+from supervisor import ConnectionSupervisor, Backoff, HealthCheck
+from catchup import MessageTracker, fetch_since
+from framerecorder import FrameRecorder
+from metrics import metrics, serve_metrics, log_summaries
+from logpipeline import setup_logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging: JSON lines written by a background thread (see logpipeline.py).
+# None when the importer configured logging itself, as replay.py does
+log_pipeline = setup_logging()
 logger = logging.getLogger(__name__)
 
 # Info Location:
-API_BASE_URL = "https://stanfordohs.pronto.io/"
+API_BASE_URL = os.getenv("PRONTO_API_BASE_URL", "https://stanfordohs.pronto.io/")
 accesstoken = getAccesstoken()
 USER_ID = "5301889"
 INT_USER_ID = 5301889
 MAIN_BUBBLE_ID = "3832006"
 ORG_ID = 2245
 
-async def keep_alive(websocket, interval=30):
-    """Sends a ping event periodically to keep the connection alive."""
-    try:
-        while True:
-            ping_message = json.dumps({"event": "pusher:ping", "data": {}})
-            await websocket.send(ping_message)
-            await asyncio.sleep(interval)
-    except websockets.exceptions.ConnectionClosedOK:
-        # Connection closed normally
-        logger.info("WebSocket connection closed cleanly")
-    except websockets.exceptions.ConnectionClosedError as e:
-        # Unexpected disconnection
-        logger.error(f"WebSocket connection closed unexpectedly: {e}")
-
-    except Exception as e:
-        # Catch-all for other issues
-        logger.error(f"Error in keep-alive: {e}")
 
+def parse_bubbles(spec):
+    """"3832006:4206470,3832010" -> {"3832006": "4206470", "3832010": admin_bubble_id}.
+
+    Each entry is bubble[:admin bubble]; a bubble without one reports to admin_bubble_id.
+    """
+    bubbles = {}
+    for entry in (spec or "").split(","):
+        if not entry.strip():
+            continue
+        bubble, _, admin_bubble = entry.partition(":")
+        bubbles[str(int(bubble))] = str(int(admin_bubble)) if admin_bubble.strip() else admin_bubble_id
+    return bubbles
+
+
+# Bubbles moderated over the one websocket connection: bubble ID -> admin bubble ID.
+# BANBOT_BUBBLES overrides the default, e.g. "3832006:4206470,3832010:4206470"
+BUBBLES = parse_bubbles(os.getenv("BANBOT_BUBBLES")) or {
+    MAIN_BUBBLE_ID: admin_bubble_id,
+}
+INVITE_PURGE_CONCURRENCY = 10
+INVITE_PURGE_TIMEOUT = 5.0
+BUBBLE_INFO_TTL = 300
+EVENT_WORKERS = 4
+EVENT_QUEUE_SIZE = 500
+PUSHER_URI = os.getenv("PRONTO_PUSHER_URI", "wss://ws-mt1.pusher.com/app/f44139496d9b75f37d27?protocol=7&client=js&version=8.3.0&flash=false")
+RECONNECT_BASE_DELAY = 0.25
+RECONNECT_MAX_DELAY = 30.0
+HEALTH_INTERVAL = 15.0
+HEALTH_TIMEOUT = 5.0
+# Pages of bubble.history (50 messages each) fetched per bubble after a reconnect
+CATCH_UP_MAX_PAGES = 10
+# Worker processes for sharded mode (0 runs everything in this process)
+SHARDS = int(os.getenv("BANBOT_SHARDS", "0"))
+# Write every raw websocket frame to this gzip file for replay.py (unset: don't record)
+RECORD_PATH = os.getenv("BANBOT_RECORD")
+# Prometheus text endpoint on localhost (0 turns it off); shard workers take the next free ports
+METRICS_PORT = int(os.getenv("BANBOT_METRICS_PORT", "9108"))
+METRICS_SUMMARY_INTERVAL = 60.0
+
+FRAME_LATENCY = metrics.histogram("banbot_frame_seconds", "Websocket frame handling time on the reader by event",
+                                  ("event",))
+EVENT_QUEUE_WAIT = metrics.histogram("banbot_event_queue_wait_seconds", "Time events wait for an event pool worker",
+                                     ("handler",))
+EVENT_HANDLER_LATENCY = metrics.histogram("banbot_event_handler_seconds", "Event handler run time on the pool",
+                                          ("handler",))
 
 class BanBot:
-    """Main bot class for managing polls, games and commands."""
+    """Main bot class for managing polls, games and commands.
 
-    def __init__(self):
+    One websocket connection carries every moderated bubble: each bubble gets
+    its own private channel and its own MainBot, and the MainBots share the
+    ban store, HTTP pool and caches through one SharedState.
+    """
+
+    def __init__(self, bubbles=None):
         self.access_token = getAccesstoken()
         self.pending_banishes = {}
         self.pending_unbanishes = {}
@@ -50,7 +96,30 @@ class BanBot:
         self.banished = []
         self.is_bot_owner = False
         self.bubble_owners = []
-        self.main_bot = MainBot(MAIN_BUBBLE_ID)
+        self.bubble_cache = BubbleInfoCache(self.access_token, BUBBLE_INFO_TTL)
+        self.shared = SharedState(self.access_token, self.bubble_cache)
+        # bubble_id -> MainBot, and bubble_id -> channelcode of its current subscription
+        self.bots = {
+            int(bubble): MainBot(bubble, self.shared, admin_bubble)
+            for bubble, admin_bubble in (bubbles or BUBBLES).items()
+        }
+        self.channels = {}
+        self.main_bot = self.bots.get(int(MAIN_BUBBLE_ID)) or next(iter(self.bots.values()))
+        # The websocket reader only parses and enqueues; handlers run on these workers
+        self.event_pool = EventWorkerPool(EVENT_WORKERS, EVENT_QUEUE_SIZE)
+        self.event_pool.on_timing = self.observe_event
+        self.decoder = FrameDecoder()
+        # Reconnects with backoff and drops connections whose pongs stop coming
+        self.supervisor = ConnectionSupervisor(self.connect_and_listen, Backoff(RECONNECT_BASE_DELAY, RECONNECT_MAX_DELAY))
+        self.health = HealthCheck(self.supervisor.metrics, HEALTH_INTERVAL, HEALTH_TIMEOUT)
+        # Dispatched message IDs, so messages missed while disconnected can be replayed once
+        self.tracker = MessageTracker()
+        self.catch_up_task = None
+        self.recovered = 0
+        self.recorder = None
+        if RECORD_PATH:
+            # Shard workers each keep their own file; gzip streams can't be interleaved
+            self.recorder = FrameRecorder(f"{RECORD_PATH}.{os.getpid()}" if SHARDS > 0 else RECORD_PATH)
         self.process_messages = True
         self.last_activity_time = datetime.min
         self.stored_messages = []
@@ -65,160 +134,319 @@ class BanBot:
                 "https://docs.google.com/document/d/1pYLhxWIXCVS49JT3aBVMjMlXQmPQbxkgjQjEXj87dSA/edit?tab=t.0")
             self.rules.append(
                 "https://docs.google.com/document/d/17PhM0JfKHGlqzJ0OBohS4GQEAuc-ea0accY-lGU6zzs/edit?usp=sharing")
+        self.register_metrics()
+
+    def observe_event(self, handler, waited, ran):
+        EVENT_QUEUE_WAIT.observe(waited, handler)
+        EVENT_HANDLER_LATENCY.observe(ran, handler)
+
+    def register_metrics(self):
+        """Expose the counters the bot's components already keep."""
+        pool, decoder, connection = self.event_pool, self.decoder, self.supervisor.metrics
+        shared, cache = self.shared, self.bubble_cache
+        for name, help, read, kind in [
+            ("banbot_event_queue_depth", "Events waiting for a worker", pool.depth, "gauge"),
+            ("banbot_events_submitted_total", "Events queued on the pool", lambda: pool.submitted, "counter"),
+            ("banbot_events_dropped_total", "Events dropped on a full queue", lambda: pool.dropped, "counter"),
+            ("banbot_event_errors_total", "Event handlers that raised", lambda: pool.errors, "counter"),
+            ("banbot_frames_decoded_total", "Websocket frames decoded", lambda: decoder.decoded, "counter"),
+            ("banbot_frames_skipped_total", "Websocket frames skipped unparsed", lambda: decoder.skipped, "counter"),
+            ("banbot_connects_total", "Successful websocket connections", lambda: connection.connects, "counter"),
+            ("banbot_disconnects_total", "Websocket connections lost", lambda: connection.disconnects, "counter"),
+            ("banbot_connect_failures_total", "Connection attempts that never subscribed",
+             lambda: connection.failed_attempts, "counter"),
+            ("banbot_health_timeouts_total", "Connections closed for a missing pong",
+             lambda: connection.health_timeouts, "counter"),
+            ("banbot_last_resume_seconds", "Time from losing the connection to resubscribing, last reconnect",
+             lambda: connection.last_resume, "gauge"),
+            ("banbot_pong_latency_seconds", "Smoothed pusher:ping round trip", lambda: connection.avg_pong_latency, "gauge"),
+            ("banbot_catch_up_messages_total", "Messages recovered from history after reconnects",
+             lambda: self.recovered, "counter"),
+            ("banbot_bubble_cache_hits_total", "bubble.info cache hits", lambda: cache.hits, "counter"),
+            ("banbot_bubble_cache_misses_total", "bubble.info cache misses", lambda: cache.misses, "counter"),
+            ("banbot_moderation_batches_total", "Kick/add batches sent", lambda: shared.moderation.batches, "counter"),
+            ("banbot_moderation_users_total", "Users kicked or added in batches", lambda: shared.moderation.users, "counter"),
+            ("banbot_moderation_errors_total", "Failed kick/add batches", lambda: shared.moderation.errors, "counter"),
+            ("banbot_reactions_sent_total", "Reactions accepted", lambda: shared.reactions.sent, "counter"),
+            ("banbot_reactions_failed_total", "Reactions not sent", lambda: shared.reactions.failed, "counter"),
+            ("banbot_reaction_retries_total", "Reactions resent in their other emoji form",
+             lambda: shared.reactions.retries, "counter"),
+            ("banbot_poll_tally_hits_total", "Poll results served from live tallies", lambda: shared.polls.hits, "counter"),
+            ("banbot_poll_tally_misses_total", "Poll results fetched from history", lambda: shared.polls.misses, "counter"),
+            ("banbot_poll_updates_total", "Pushed reaction summaries applied to polls",
+             lambda: shared.polls.updates, "counter"),
+            ("pronto_api_sent_total", "Requests let through the scheduler", lambda: scheduler.sent, "counter"),
+            ("pronto_api_throttled_total", "429 responses", lambda: scheduler.throttled, "counter"),
+            ("pronto_api_shed_total", "Low-priority requests dropped by the scheduler", lambda: scheduler.dropped, "counter"),
+            ("pronto_api_waiting", "Requests waiting for a token",
+             lambda: sum(sum(lanes.values()) for lanes in scheduler.depth().values()), "gauge"),
+        ]:
+            metrics.collect(name, help, read, kind)
+        if log_pipeline is not None:
+            metrics.collect("banbot_log_records_suppressed_total", "Repeated warning/error lines held back",
+                            lambda: log_pipeline.suppressed, "counter")
+            metrics.collect("banbot_log_records_dropped_total", "Log records dropped on a full log queue",
+                            lambda: log_pipeline.dropped, "counter")
+        metrics.collect("pronto_api_scheduler_wait_seconds_total", "Time requests waited for a token, by priority",
+                        lambda: {(priority,): lane[1] for priority, lane in scheduler.lane_waits.items()},
+                        "counter", ("priority",))
+        metrics.collect("pronto_api_scheduled_total", "Requests through the scheduler, by priority",
+                        lambda: {(priority,): lane[0] for priority, lane in scheduler.lane_waits.items()},
+                        "counter", ("priority",))
+
+    async def subscribe_bubble(self, websocket, bubble_id, socket_id):
+        """Subscribe to a bubble's private channel using its current channelcode."""
+        bubble_sid = await self.bubble_cache.channelcode(bubble_id)
+        data = {
+            "event": "pusher:subscribe",
+            "data": {
+                "channel": f"private-bubble.{bubble_id}.{bubble_sid}",
+                "auth": await self.shared.client.chat_auth(bubble_id, bubble_sid, socket_id)
+            }
+        }
+        await websocket.send(json.dumps(data))
+        self.channels[bubble_id] = bubble_sid
+
+    async def unsubscribe_bubble(self, websocket, bubble_id):
+        bubble_sid = self.channels.pop(bubble_id, None)
+        if bubble_sid is None:
+            return
+        unsub = {
+            "event": "pusher:unsubscribe",
+            "data": {"channel": f"private-bubble.{bubble_id}.{bubble_sid}"}
+        }
+        await websocket.send(json.dumps(unsub))
 
-    async def connect_and_listen(self, bubble_id, bubble_sid):
-        """Connect to the websocket and listen for messages."""
-        uri = "wss://ws-mt1.pusher.com/app/f44139496d9b75f37d27?protocol=7&client=js&version=8.3.0&flash=false"
+    async def resubscribe_bubble(self, websocket, bubble_id, socket_id):
+        """Move to a bubble's new channel after a BubbleChanged event."""
+        await self.unsubscribe_bubble(websocket, bubble_id)
+        await self.subscribe_bubble(websocket, bubble_id, socket_id)
+        logger.info(f"Re-subscribed to bubble {bubble_id}")
+
+    def bot_for(self, frame, bubble_id=None):
+        """Find the MainBot an event belongs to, from its channel or payload."""
+        channel = frame.channel or ""
+        if channel.startswith("private-bubble."):
+            bubble_id = channel.split(".")[1]
+        if bubble_id is None:
+            bubble_id = frame.data.get("bubble_id")
         try:
-            async with websockets.connect(uri) as websocket:
-                response = await websocket.recv()
-                logger.info(f"Received: {response}")
-
-                # Start keep-alive in the background
-
-                asyncio.create_task(keep_alive(websocket))
-                data = json.loads(response)
-                if "data" in data:
-                    inner_data = json.loads(data["data"])
-                    socket_id = inner_data.get("socket_id", None)
-
-                    data = {
-                        "event": "pusher:subscribe",
-                        "data": {
-                            "channel": f"private-bubble.{bubble_id}.{bubble_sid}",
-                            "auth": self.main_bot.client.chat_auth(bubble_id, bubble_sid, socket_id)
-                        }
-                    }
-                    await websocket.send(json.dumps(data))
-                    user_sub = {
-                        "event": "pusher:subscribe",
-                        "data": {
-                            "channel": f"private-user.{INT_USER_ID}",
-                            "auth": self.main_bot.client.user_auth(socket_id)
-                        }
-                    }
-                    logger.info("Subscribing to USER channel.")
-                    await websocket.send(json.dumps(user_sub))
-                    if socket_id:
-                        logger.info(f"Socket ID: {socket_id}")
-                    else:
-                        logger.warning("Socket ID not found in response")
+            return self.bots.get(int(bubble_id))
+        except (TypeError, ValueError):
+            return None
+
+    async def subscribe_user(self, websocket, socket_id):
+        user_sub = {
+            "event": "pusher:subscribe",
+            "data": {
+                "channel": f"private-user.{INT_USER_ID}",
+                "auth": await self.shared.client.user_auth(socket_id)
+            }
+        }
+        logger.info("Subscribing to USER channel.")
+        await websocket.send(json.dumps(user_sub))
+
+    async def dispatch_message(self, main_bot, msg):
+        """Queue a message for its bubble's bot, unless it was already dispatched."""
+        if not self.tracker.claim(main_bot.bubble_id, msg.get("id")):
+            return False
+        text = msg.get("message", "")
+        # Keyed by bubble so a bubble's messages stay in order; only chatter may be shed
+        await self.event_pool.submit(
+            main_bot.bubble_id,
+            main_bot.process_message,
+            text,
+            msg.get("user", {}).get("firstname", "Unknown"),
+            msg.get("user", {}).get("lastname", "User"),
+            parse_timestamp(msg.get("created_at", "")),
+            msg.get("messagemedia", []),
+            msg.get("user", {}).get("id", "User"),
+            msg.get("id", ""),
+            droppable=not text.startswith(commands.prefix)
+        )
+        return True
+
+    async def catch_up(self, cursors):
+        """Replay messages sent while the websocket was down, oldest first.
+
+        `cursors` holds each bubble's last dispatched message ID from before
+        resubscribing. Runs alongside the live listener; the tracker drops
+        whichever copy of a message comes second.
+        """
+        async def catch_up_bubble(main_bot):
+            after_id = cursors.get(main_bot.bubble_id)
+            if after_id is None:
+                # Nothing dispatched yet, so there is no gap to fill
+                return
+            missed = await fetch_since(self.access_token, main_bot.bubble_id, after_id, CATCH_UP_MAX_PAGES)
+            replayed = 0
+            for msg in missed:
+                if await self.dispatch_message(main_bot, msg):
+                    replayed += 1
+            self.recovered += replayed
+            if replayed:
+                logger.info(f"Replayed {replayed} missed message(s) in bubble {main_bot.bubble_id}")
+
+        results = await asyncio.gather(*(catch_up_bubble(main_bot) for main_bot in self.bots.values()),
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Catch-up failed: {result}")
+
+    async def handle_frame(self, websocket, message, socket_id):
+        """Decode one raw websocket frame and route it to its handler."""
+        started = time.perf_counter()
+        event_name = "skipped"
+        try:
+            frame = self.decoder.decode(message)
+            if frame is None:
+                return
+            event_name = frame.event
+            if event_name == "pusher:ping":
+                await websocket.send(json.dumps({"event": "pusher:pong", "data": {}}))
+            elif event_name == "pusher:pong":
+                self.health.pong()
+            if event_name == "App\\Events\\BubbleChanged":
+                change_data = frame.data
 
+                bubble_obj = change_data.get("bubble", {})
+                bubble_id_from = bubble_obj.get("id")
+                if not bubble_id_from:
+                    logger.warning("No bubble.id in event data")
+                    return
+                self.bubble_cache.apply_change(change_data)
+                bubble_id_from = int(bubble_id_from)
+                if bubble_id_from in self.bots:
+                    logger.info(f"BubbleChanged event – resubscribing to bubble {bubble_id_from}.")
+                    # bubble.info and pusher.auth round trips; keep them off the reader
+                    await self.event_pool.submit(bubble_id_from, self.resubscribe_bubble,
+                                                 websocket, bubble_id_from, socket_id)
+            elif event_name == "App\\Events\\MessageAdded":
+                msg = frame.data.get("message", {})
+                main_bot = self.bot_for(frame, msg.get("bubble_id"))
+                if main_bot is None:
+                    return
+                await self.dispatch_message(main_bot, msg)
+            elif event_name == "App\\Events\\MessageUpdated":
+                # Cheap enough to apply inline: a set lookup and, for polls, a dict update
+                self.shared.polls.apply_update(frame.data.get("message") or {})
+            if event_name == "App\\Events\\MarkUpdated":
+                user_id = frame.data.get("user_id")
+                # Bubbles this process doesn't moderate belong to another shard (or nobody)
+                main_bot = self.bot_for(frame)
+                if main_bot is None:
+                    return
+                if user_id is not None:
+                    await self.event_pool.submit(user_id, main_bot.check_for_banned, user_id)
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            if e == "Failed to authenticate chat: 403 Client Error: Forbidden for url: https://stanfordohs.pronto.io/api/v1/pusher.auth":
+                int("a")
+        finally:
+            # App\Events\MessageAdded -> MessageAdded
+            FRAME_LATENCY.observe(time.perf_counter() - started, event_name.rpartition("\\")[2])
+
+    async def connect_and_listen(self):
+        """Connect, subscribe to every channel and listen until the connection drops.
+
+        Connection errors are left to the ConnectionSupervisor, which reconnects.
+        """
+        async with websockets.connect(PUSHER_URI) as websocket:
+            response = await websocket.recv()
+            logger.debug(f"Received: {response}")
+            data = json.loads(response)
+            socket_id = json.loads(data.get("data") or "{}").get("socket_id")
+            if not socket_id:
+                raise ConnectionError(f"Socket ID not found in response: {response}")
+            logger.info(f"Socket ID: {socket_id}")
+
+            # Where each bubble's catch-up starts; live messages will move these once subscribed
+            cursors = {bubble_id: self.tracker.last(bubble_id) for bubble_id in self.bots}
+            # Authenticate all channels at once rather than one round trip after another
+            self.channels = {}
+            await asyncio.gather(
+                self.subscribe_user(websocket, socket_id),
+                *(self.subscribe_bubble(websocket, bubble_id, socket_id) for bubble_id in self.bots)
+            )
+            self.supervisor.connected()
+            if self.catch_up_task is not None:
+                self.catch_up_task.cancel()
+            self.catch_up_task = asyncio.create_task(self.catch_up(cursors))
+
+            health = asyncio.create_task(self.health.run(websocket))
+            try:
                 # Listen for incoming messages
                 async for message in websocket:
+                    if self.recorder is not None:
+                        self.recorder.write(message)
                     if message == "ping":
                         await websocket.send("pong")
                     else:
-                        try:
-                            msg_data = json.loads(message)
-                            event_name = msg_data.get("event", "")
-                            if event_name == "pusher:ping":
-                                await websocket.send(json.dumps({"event": "pusher:pong", "data": {}}))
-                            if event_name == "App\\Events\\BubbleChanged":
-                                logger.info("BubbleChanged event – resubscribing.")
-                                raw_data = msg_data.get("data")
-                                # parse only if it's a string
-                                if isinstance(raw_data, str):
-                                    try:
-                                        change_data = json.loads(raw_data)
-                                    except json.JSONDecodeError:
-                                        logger.error("Invalid JSON in BubbleChanged data")
-                                        continue
-                                else:
-                                    change_data = raw_data
-
-                                bubble_obj = change_data.get("bubble", {})
-                                bubble_id_from = bubble_obj.get("id")
-                                if not bubble_id_from:
-                                    logger.warning("No bubble.id in event data")
-                                    continue
-                                if bubble_id == bubble_id_from:
-                                    # unsubscribe
-                                    unsub = {
-                                        "event": "pusher:unsubscribe",
-                                        "data": {"channel": f"private-bubble.{bubble_id}.{bubble_sid}"}
-                                    }
-                                    await websocket.send(json.dumps(unsub))
-
-                                    bubble_info = get_bubble_info(self.access_token, int(MAIN_BUBBLE_ID))
-                                    bubble_sid = bubble_info["bubble"]["channelcode"]
-                                    # subscribe again
-                                    authstr = self.main_bot.client.chat_auth(bubble_id, bubble_sid, socket_id)
-                                    sub = {
-                                        "event": "pusher:subscribe",
-                                        "data": {
-                                            "channel": f"private-bubble.{bubble_id}.{bubble_sid}",
-                                            "auth": authstr
-                                        }
-                                    }
-
-                                    await websocket.send(json.dumps(sub))
-                                    logger.info(f"Re-subscribed to bubble {bubble_id}")
-                            elif event_name == "App\\Events\\MessageAdded":
-                                msg_content = json.loads(msg_data.get("data", "{}"))
-                                msg = msg_content.get("message", {})
-
-                                await self.main_bot.process_message(
-                                    msg.get("message", ""),
-                                    msg.get("user", {}).get("firstname", "Unknown"),
-                                    msg.get("user", {}).get("lastname", "User"),
-                                    datetime.strptime(msg.get("created_at", ""), "%Y-%m-%d %H:%M:%S"),
-                                    msg.get("messagemedia", []),
-                                    msg.get("user", {}).get("id", "User"),
-                                    msg.get("id", "")
-                                )
-                            if event_name == "App\\Events\\MarkUpdated":
-                                msg_content = json.loads(msg_data.get("data", "{}"))
-                                asyncio.create_task(self.main_bot.check_for_banned(
-                                    msg_content.get("user_id", {})
-                                ))
-                        except Exception as e:
-                            logger.error(f"Error processing message: {e}")
-                            if e == "Failed to authenticate chat: 403 Client Error: Forbidden for url: https://stanfordohs.pronto.io/api/v1/pusher.auth":
-                                int("a")
-        except Exception as e:
-            logger.error(f"WebSocket error: {e}")
-            # Allow the main loop to handle reconnection
+                        await self.handle_frame(websocket, message, socket_id)
+            finally:
+                health.cancel()
 
-async def main_loop():
-    # Delete Invites
-    invitedata = await getInvites(accesstoken, int(MAIN_BUBBLE_ID))
-    for invite in invitedata['data']:
-        await deleteInvite(accesstoken, invite['code'])
+async def main_loop(bubbles=None):
+    # Create and initialize the bot
+    bot = BanBot(bubbles)
+
+    # Delete Invites in every moderated bubble
+    async def purge_bubble(bubble_id):
+        invitedata = await getInvites(accesstoken, bubble_id)
+        await purgeInvites(accesstoken, [invite['code'] for invite in invitedata['data']],
+                           INVITE_PURGE_CONCURRENCY, INVITE_PURGE_TIMEOUT)
+    await asyncio.gather(*(purge_bubble(bubble_id) for bubble_id in bot.bots))
 
     # Get the PORT from environment variables or default to 8080
 
-    # Create and initialize the bot
-    bot = BanBot()
     # Get bubble info and owners
-    bubble_info = get_bubble_info(bot.access_token, int(MAIN_BUBBLE_ID))
-
-    bot.bubble_owners = [row["user_id"] for row in bubble_info["bubble"]["memberships"] if row["role"] == "owner"]
+    bot.bubble_owners = await bot.bubble_cache.owners(bot.main_bot.bubble_id)
 
     if USER_ID in bot.bubble_owners:
         bot.is_bot_owner = True
 
-    bubble_sid = bubble_info["bubble"]["channelcode"]
-    logger.info(f"Connecting to bubble with SID: {bubble_sid}")
+    logger.info(f"Connecting to {len(bot.bots)} bubble(s): {list(bot.bots)}")
 
-    tries = 0
+    bot.event_pool.start()
+    metrics_server = None
+    if METRICS_PORT:
+        metrics_server = await serve_metrics(metrics, port=METRICS_PORT, attempts=max(1, SHARDS))
+    summaries = asyncio.create_task(log_summaries(metrics, METRICS_SUMMARY_INTERVAL))
     # Run the WebSocket logic with automatic reconnection
-    while True:
-        if tries < 3:
-            try:
-                await bot.connect_and_listen(int(MAIN_BUBBLE_ID), bubble_sid)
-            except Exception as e:
-                logger.error(f"Connection error: {e}")
-                tries += 1
-                # Wait before reconnecting
-                await asyncio.sleep(5)
-        else:
-            break
+    try:
+        await bot.supervisor.run()
+    finally:
+        summaries.cancel()
+        if metrics_server is not None:
+            metrics_server.close()
+        await bot.event_pool.stop()
+        await bot.shared.close()
+        if bot.recorder is not None:
+            bot.recorder.close()
+
+
+async def run_until_signalled():
+    """Run main_loop() until SIGTERM or SIGINT, then let it shut down cleanly.
+
+    Cancelling main_loop() runs its cleanup: the event pool drains, queued
+    kicks and inviter counts are flushed and the state store is closed.
+    """
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, task.cancel)
+    try:
+        await main_loop()
+    except asyncio.CancelledError:
+        logger.info("BanBot stopped by signal.")
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main_loop())
+        if SHARDS > 0:
+            Coordinator(BUBBLES, main_loop, SHARDS).run_forever()
+        else:
+            asyncio.run(run_until_signalled())
     except KeyboardInterrupt:
         logger.info("BanBot stopped by user.")
 
@@ -1,30 +1,42 @@
 # Standard library imports
 import re
 import uuid
+import tempfile
 from datetime import timezone, datetime
 from pronto import *
 from accesstoken import *
+from banstore import BanStore
+from statestore import StateStore
+from inviters import InviterCounts
+from bubblecache import BubbleInfoCache
+from userdirectory import UserDirectory
+from moderation import ModerationBatcher
+from reactions import ReactionService
+from polls import PollTallies
+from commands import CommandRegistry, OWNER, EVERYONE, mention, choice
+from ratelimit import priority, URGENT, HIGH
+from metrics import metrics
+from stats import stats_report
+from profiler import profile
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Constants
-API_BASE_URL = "https://stanfordohs.pronto.io/"
+API_BASE_URL = os.getenv("PRONTO_API_BASE_URL", "https://stanfordohs.pronto.io/")
+# Uploads go to the shared API host, not the org's; overridable for the fake server
+FILES_URL = os.getenv("PRONTO_FILES_URL", "https://api.pronto.io/api/files")
 USER_ID = "5301889"
 INT_USER_ID = 5301889
 MAIN_BUBBLE_ID = "3832006"
 admin_bubble_id = "4206470"
 ORG_ID = 2245
-
-def try_send_emoji(emoji, msg_id):
-    responce = send_reaction(accesstoken, emoji, msg_id)
-    print(responce)
-    if responce['message'] == 'The given data was invalid.':
-        emoji = emoji.strip("\n")
-        emoji = emoji + '️'
-        responce = send_reaction(accesstoken, emoji, msg_id)
-        if responce['message'] == 'The given data was invalid.':
-            logger.error(responce)
+INVITE_PURGE_CONCURRENCY = 10
+INVITE_PURGE_TIMEOUT = 5.0
+# !profile windows are clamped to this many seconds
+MAX_PROFILE_SECONDS = 120
+# Hot functions listed in the !profile message; the uploaded file has more
+PROFILE_MESSAGE_TOP = 10
+PROFILE_FILE_TOP = 50
 
 class ProntoClient:
     """Handles communication with the Pronto API."""
@@ -32,13 +44,13 @@ class ProntoClient:
     def __init__(self, api_base_url, access_token):
         self.api_base_url = api_base_url
         self.access_token = access_token
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {access_token}",
-        }
         self.stored_dms = []
 
-    def send_message(self, message, bubble_id, media):
+    async def post(self, path, data):
+        """POST JSON to the Pronto API on the shared connection pool."""
+        return await acall_api(ApiRequest("POST", f"{self.api_base_url}{path}", self.access_token, data, check_status=True))
+
+    async def send_message(self, message, bubble_id, media):
         """Send a message to a specific bubble."""
         if media is None:
             media = []
@@ -54,151 +66,192 @@ class ProntoClient:
             "user_id": USER_ID,
             "attachment_file_keys": media
         }
-        url = f"{self.api_base_url}api/v1/message.create"
 
         try:
-            response = requests.post(url, headers=self.headers, json=data)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return await self.post("api/v1/message.create", data)
+        except BackendError as e:
             logger.error(f"Error sending message: {e}")
             raise BackendError(f"Failed to send message: {e}")
 
-    def get_dm_or_create(self, user_id):
+    async def get_dm_or_create(self, user_id):
         """Get an existing DM or create a new one with the specified user."""
         matches = [row for row in self.stored_dms if row[0] == user_id]
         if not matches:
-            dm_info = createDM(self.access_token, user_id, ORG_ID)
+            dm_info = await aio.createDM(self.access_token, user_id, ORG_ID)
             data = [user_id, dm_info]
             self.stored_dms.append(data)
             matches = [data]
         return matches[0][1]
-    def user_auth(self, socket_id: str) -> str:
-        session = requests.Session()
-        session.headers.update({
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {accesstoken}",
-        })
-        resp = session.post(
-            f"{API_BASE_URL}api/v1/pusher.auth",
-            json={
-                "socket_id": socket_id,
-                "channel_name": f"private-user.{INT_USER_ID}"
-            },
-        )
-        resp.raise_for_status()
-        return resp.json().get("auth", "")
-    def chat_auth(self, bubble_id, bubble_sid, socket_id):
+    async def user_auth(self, socket_id: str) -> str:
+        data = {
+            "socket_id": socket_id,
+            "channel_name": f"private-user.{INT_USER_ID}"
+        }
+        return (await self.post("api/v1/pusher.auth", data)).get("auth", "")
+    async def chat_auth(self, bubble_id, bubble_sid, socket_id):
         """Authenticate for chat websocket connection."""
-        url = f"{self.api_base_url}api/v1/pusher.auth"
         data = {
             "socket_id": socket_id,
             "channel_name": f"private-bubble.{bubble_id}.{bubble_sid}"
         }
         try:
-            response = requests.post(url, headers=self.headers, json=data)
-            response.raise_for_status()
-            bubble_auth = response.json().get("auth")
+            bubble_auth = (await self.post("api/v1/pusher.auth", data)).get("auth")
             logger.info("Bubble Connection Established.")
             return bubble_auth
         except Exception as e:
             logger.error(f"Error authenticating chat: {e}")
             raise BackendError(f"Failed to authenticate chat: {e}")
-    def org_auth(self, bubble_id, bubble_sid, socket_id):
+    async def org_auth(self, bubble_id, bubble_sid, socket_id):
         """Authenticate for chat websocket connection."""
-        url = f"{self.api_base_url}api/v1/pusher.auth"
         data = {
             "socket_id": socket_id,
             "channel_name": "private-user.5301889"
         }
         try:
-            response = requests.post(url, headers=self.headers, json=data)
-            response.raise_for_status()
-            bubble_auth = response.json().get("auth")
+            bubble_auth = (await self.post("api/v1/pusher.auth", data)).get("auth")
             logger.info("Bubble Connection Established.")
             return bubble_auth
         except Exception as e:
             logger.error(f"Error authenticating chat: {e}")
             raise BackendError(f"Failed to authenticate chat: {e}")
-    def upload_file_and_get_key(self, file_path, filename):
+    async def upload_file_and_get_key(self, file_path, filename):
         """Upload a file to Pronto and get the file key."""
-        url = "https://api.pronto.io/api/files"
         try:
-            # Open the file and prepare headers
             with open(file_path, 'rb') as file:
                 file_content = file.read()
 
-            headers = {
-                "Accept": "application/json",
-                "Authorization": f"Bearer {self.access_token}",
-                "Content-Length": str(len(file_content)),
-                "Content-Disposition": f'attachment; filename="{filename}"',
-                "Content-Type": "application/octet-stream"
-            }
-
-            # Send the PUT request
-            response = requests.put(url, headers=headers, data=file_content)
-
-            # Check if the request was successful
-            if response.status_code == 200:
-                response_data = response.json()
-                file_key = response_data['data']['key']
-                return file_key
-            else:
-                logger.error(f"Failed to upload file: {response.status_code}, {response.text}")
-                return None
+            headers = [
+                "Accept: application/json",
+                f"Authorization: Bearer {self.access_token}",
+                f'Content-Disposition: attachment; filename="{filename}"',
+                "Content-Type: application/octet-stream"
+            ]
+            # Through the scheduler like every other call, so it is paced and timed
+            response = await acall_api(ApiRequest("PUT", FILES_URL, headers=headers,
+                                                  data=file_content, check_status=True))
+            return response['data']['key']
         except Exception as e:
             logger.error(f"Error uploading file: {e}")
             return None
+# Chat commands; MainBot registers its handlers here
+commands = CommandRegistry()
+
+class SharedState:
+    """Everything the per-bubble MainBots share: the API client, the state store,
+    the ban set, inviter counts, the bubble.info cache, the user directory, the
+    batched kick/add queue, the reaction sender and the poll tallies."""
+
+    def __init__(self, access_token, bubble_cache=None):
+        self.client = ProntoClient(API_BASE_URL, access_token)
+        # Bans, inviter counts and polls live in state.db (imported once from the old files
+        # next to it); BANBOT_STATE_DB moves it, e.g. for load tests
+        db_path = os.getenv("BANBOT_STATE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "state.db"))
+        self.state = StateStore(db_path)
+        self.state.migrate_files(os.path.dirname(os.path.abspath(db_path)))
+        self.bans = BanStore(self.state)
+        self.inviters = InviterCounts(self.state)
+        self.bubble_cache = bubble_cache or BubbleInfoCache(access_token)
+        self.users = UserDirectory(self.state, access_token)
+        self.moderation = ModerationBatcher(access_token)
+        self.reactions = ReactionService(self.state, access_token)
+        self.polls = PollTallies(self.state, access_token)
+        # The running !profile, if any; one at a time across bubbles
+        self.profile_task = None
+        # Follow-up work started off the event workers (invite sweeps), finished by close()
+        self._tasks = set()
+
+    def spawn(self, coro):
+        """Run a coroutine in the background; close() waits for it."""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def close(self, timeout=10.0):
+        """Send queued kicks/adds and reactions, flush pending state writes and close the store; call on shutdown."""
+        if self._tasks:
+            # Background work may still queue kicks, so it goes first
+            await asyncio.wait(self._tasks, timeout=timeout)
+        await self.moderation.close()
+        await self.reactions.close()
+        self.inviters.close()
+        self.state.close()
+
 class MainBot:
-    """Main bot class"""
+    """Main bot class, one per moderated bubble"""
 
-    def __init__(self, main_bubble):
+    def __init__(self, main_bubble, shared=None, admin_bubble=admin_bubble_id):
         self.access_token = getAccesstoken()
-        self.client = ProntoClient(API_BASE_URL, self.access_token)
-        global MAIN_BUBBLE_ID
-        MAIN_BUBBLE_ID = main_bubble
-        self.inviters = []
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        file_path = os.path.join(script_dir, "inviters.json")
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                self.inviters = json.load(f)
-        except Exception as e:
-            logger.error(e)
-
-        self.chat_info = get_bubble_info(accesstoken, int(MAIN_BUBBLE_ID))
-        self.bubble_owners = [row["user_id"] for row in self.chat_info["bubble"]["memberships"] if row["role"] == "owner"]
-        self.bans = []
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        file_path = os.path.join(script_dir, "bans.txt")
-        try:
-            with open(file_path, "r", encoding="utf-8") as openfile:
-                # Reading from json file
-                self.bans = [int(line) for line in openfile]
-        except Exception as e:
-            print(e)
+        self.bubble_id = int(main_bubble)
+        self.admin_bubble_id = int(admin_bubble)
+        self.shared = shared or SharedState(self.access_token)
+        self.client = self.shared.client
+        self.state = self.shared.state
+        self.bans = self.shared.bans
+        self.inviters = self.shared.inviters
+        # Owners, channelcode and pinned message come from the shared bubble.info cache
+        self.bubble_cache = self.shared.bubble_cache
+        self.users = self.shared.users
+        self.moderation = self.shared.moderation
+        self.reactions = self.shared.reactions
+        self.polls = self.shared.polls
         self.process_messages = True
+        # The running invite sweep, and whether another rejoin asked for one meanwhile
+        self._invite_sweep = None
+        self._sweep_again = False
 
     def is_seven_digit_number(self, s):
         """Check if a string is a seven-digit number."""
         return bool(re.match(r'^\d{7}$', s))
 
     async def check_for_banned(self, user_id):
-        tempinviters = []
-
+        # Kicks and invite purges jump every other queued API call
+        with priority(URGENT):
+            await self._check_for_banned(user_id)
 
+    async def _check_for_banned(self, user_id):
         if user_id not in self.bans:
             return
 
-        await kickUserFromBubble(accesstoken, int(MAIN_BUBBLE_ID), [user_id])
-        invitedata = await getInvites(accesstoken, int(MAIN_BUBBLE_ID))
+        await self.moderation.kick(self.bubble_id, user_id)
+        logger.info(f"Kicked banned user {user_id} from bubble {self.bubble_id}")
+        # The invite sweep runs on its own task so this event worker is free for the next rejoin
+        self.schedule_invite_sweep()
 
-        processed_users = set()
+    def schedule_invite_sweep(self):
+        """Start an invite sweep, or queue one more if a sweep is already running.
 
-        for invite in invitedata.get('data', []):
-            await deleteInvite(accesstoken, invite['code'])
+        One sweep at a time per bubble, so concurrent sweeps can't count the
+        same invite against its creator twice.
+        """
+        if self._invite_sweep is not None and not self._invite_sweep.done():
+            self._sweep_again = True
+            return
+        self._invite_sweep = self.shared.spawn(self._run_invite_sweeps())
+
+    async def _run_invite_sweeps(self):
+        while True:
+            self._sweep_again = False
+            try:
+                await self.sweep_invites()
+            except Exception as e:
+                logger.error(f"Invite sweep failed in bubble {self.bubble_id}: {e}")
+            if not self._sweep_again:
+                return
+
+    async def sweep_invites(self):
+        """Delete every invite link, count them against their creators and ban repeat inviters."""
+        tempinviters = []
+        invitedata = await getInvites(accesstoken, self.bubble_id)
+        invites = invitedata.get('data', [])
+        # Delete every invite link concurrently before counting who made them
+        await purgeInvites(accesstoken, [invite['code'] for invite in invites],
+                           INVITE_PURGE_CONCURRENCY, INVITE_PURGE_TIMEOUT)
 
+        processed_users = set()
+        newly_banned = []
+
+        for invite in invites:
             user_id = invite['user_id']
 
             if user_id in processed_users:
@@ -208,271 +261,200 @@ class MainBot:
             if user_id not in tempinviters:
                 tempinviters.append(user_id)
 
-            # Check if user is already tracked
-            for inviter in self.inviters:
-                if inviter['user_id'] == user_id:
-                    inviter['count'] += 1
-                    script_dir = os.path.dirname(os.path.abspath(__file__))
-                    file_path = os.path.join(script_dir, "inviters.json")
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        json.dump(self.inviters, f, indent=2)
-                    if inviter['count'] >= 5:
-                        self.bans.append(user_id)
-                        script_dir = os.path.dirname(os.path.abspath(__file__))
-                        file_path = os.path.join(script_dir, "bans.txt")
-                        with open(file_path, 'w', encoding='utf-8') as f:
-                            f.writelines(f"{item}\n" for item in self.bans)
-                        await kickUserFromBubble(accesstoken, int(MAIN_BUBBLE_ID), [user_id])
-                        self.client.send_message(
-                            f"<@{user_id}> has made invite links after a banned user rejoined 5 times, so they are now banned.",
-                            int(admin_bubble_id),
-                            None
-                        )
-                    break
-            else:
-                # Not found in inviters, add with count 1
-                self.inviters.append({'user_id': user_id, 'count': 1})
-
-                # Save inviters to inviters.txt
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                inviters_file_path = os.path.join(script_dir, "inviters.json")
-                with open(inviters_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.inviters, f, indent=2)
+            # Count the invite against its creator
+            if self.inviters.increment(user_id) >= 5:
+                self.bans.add(user_id)
+                newly_banned.append(user_id)
+
+        # Kicked together, so they go out as one bubble.kick
+        await asyncio.gather(*(self.moderation.kick(self.bubble_id, user_id) for user_id in newly_banned))
+        with priority(HIGH):
+            for user_id in newly_banned:
+                await self.client.send_message(
+                    f"<@{user_id}> has made invite links after a banned user rejoined 5 times, so they are now banned.",
+                    self.admin_bubble_id,
+                    None
+                )
 
 
     async def process_message(self, msg_text, user_firstname, user_lastname, timestamp, msg_media, user_id, msg_id):
         """Process an incoming message."""
-        # Check for bot toggling command
-        if msg_text.startswith("!bot"):
-            command = msg_text[1:].split()
-            print(command)
-            if len(command) > 1 and user_id in self.bubble_owners:
-                if command[1] == "on":
-                    self.process_messages = True
-                    logger.info(f"Bot enabled by {user_id}")
-                    send_reaction(accesstoken, '💡', msg_id)
-                elif command[1] == "off":
-                    self.process_messages = False
-                    logger.info(f"Bot disabled by {user_id}")
-                    send_reaction(accesstoken, '📴', msg_id)
-
-        if not self.process_messages:
+        # Ordinary chatter, which is most traffic, stops at this one prefix check
+        if not msg_text.startswith(commands.prefix):
             return
-
         await self.check_for_commands(msg_text, user_id, msg_id)
 
-
-    async def check_for_commands(self, msg_text_tall, user_id, msg_id):
+    async def check_for_commands(self, msg_text, user_id, msg_id):
         """Check for commands in the message and handle them."""
+        await commands.dispatch(self, msg_text, user_id, msg_id, enabled=self.process_messages)
+
+    async def permission_level(self, user_id):
+        if user_id in await self.bubble_cache.owners(self.bubble_id):
+            return OWNER
+        return EVERYONE
+
+    # Check for bot toggling command
+    @commands.command("bot", choice("on", "off"), always=True)
+    async def cmd_bot(self, user_id, msg_id, state):
+        if state == "on":
+            self.process_messages = True
+            logger.info(f"Bot enabled by {user_id}")
+            self.reactions.react('💡', msg_id)
+        else:
+            self.process_messages = False
+            logger.info(f"Bot disabled by {user_id}")
+            self.reactions.react('📴', msg_id)
+
+    async def update_pin(self, msg_id, message, append):
+        chat_info = await self.bubble_cache.get(self.bubble_id)
+        pinned_message = chat_info['bubble']['pinned_message']
+        self.reactions.react("📌", msg_id)
+        if pinned_message['user_id'] != INT_USER_ID:
+            pinned_message = await self.client.send_message(message, self.bubble_id, [])
+            await aio.pinMessage(accesstoken, pinned_message['message']['id'], "2031-11-11 11:11:11")
+            self.bubble_cache.invalidate(self.bubble_id)
+        elif append:
+            newmessage = pinned_message['message'] + "\n" + message
+            await aio.editMessage(accesstoken, newmessage, pinned_message['id'])
+        else:
+            await aio.editMessage(accesstoken, message, pinned_message['id'])
+
+    @commands.command("pin", rest=True)
+    async def cmd_pin(self, user_id, msg_id, message):
+        await self.update_pin(msg_id, message, append=False)
+
+    @commands.command("atpin", rest=True)
+    async def cmd_atpin(self, user_id, msg_id, message):
+        await self.update_pin(msg_id, message, append=True)
+
+    @commands.command("ban", mention, priority=URGENT)
+    async def cmd_ban(self, user_id, msg_id, target_user):
+        if self.bans.add(target_user):
+            await self.moderation.kick(self.bubble_id, target_user)
+
+    @commands.command("unban", mention, priority=URGENT)
+    async def cmd_unban(self, user_id, msg_id, target_user):
+        if self.bans.discard(target_user):
+            await self.moderation.add(self.bubble_id, target_user)
+
+    @commands.command("poll", rest=True)
+    async def cmd_poll(self, user_id, msg_id, message):
+        poll_id = self.state.next_poll_id()
+        message_to_send = f"Poll #{poll_id}:\n" + message
+        poll_message = await self.client.send_message(message_to_send, self.bubble_id, [])
+        self.state.add_poll(poll_id, self.bubble_id, message, poll_message['message']['id'], 1)
+        self.polls.track(poll_message['message']['id'])
+        # Awaited in turn so the options appear in order. Reactions go out at LOW priority
+        # and may be shed under load; the poll itself has been posted either way
+        try:
+            await self.reactions.send('✅️', poll_message['message']['id'])
+            await self.reactions.send('❌️', poll_message['message']['id'])
+        except BackendError as e:
+            logger.warning(f"Poll #{poll_id} options not added: {e}")
+
+    @commands.command("advpoll", rest=True)
+    async def cmd_advpoll(self, user_id, msg_id, message):
+        poll_id = self.state.next_poll_id()
+        message_to_send = f"Poll #{poll_id}:\n" + message
+        poll_message = await self.client.send_message(message_to_send, self.bubble_id, [])
+        self.state.add_poll(poll_id, self.bubble_id, message, poll_message['message']['id'], 2)
+        self.polls.track(poll_message['message']['id'])
+
+    @commands.command("getpoll", int)
+    async def cmd_getpoll(self, user_id, msg_id, target_poll_id):
+        poll = self.state.get_poll(target_poll_id, self.bubble_id)
+        if poll is None:
+            return
 
-        msg_text = msg_text_tall.lower()
-        command = msg_text[1:].split()
-        if user_id in self.bubble_owners:
-
-            if msg_text.lower().startswith("!pin "):
-                message = msg_text[5::]
-                self.chat_info = get_bubble_info(accesstoken, int(MAIN_BUBBLE_ID))
-                pinned_message = self.chat_info['bubble']['pinned_message']
-                try_send_emoji("📌", msg_id)
-                if pinned_message['user_id'] != INT_USER_ID:
-                    pinned_message = await self.client.send_message(message, int(MAIN_BUBBLE_ID), [])
-                    pinMessage(accesstoken, pinned_message['message']['id'], "2031-11-11 11:11:11")
-                else:
-                    editMessage(accesstoken, message, pinned_message['id'])
-
-            if msg_text.lower().startswith("!atpin "):
-                message = msg_text[7::]
-                self.chat_info = get_bubble_info(accesstoken, int(MAIN_BUBBLE_ID))
-                pinned_message = self.chat_info['bubble']['pinned_message']
-                try_send_emoji("📌", msg_id)
-                if pinned_message['user_id'] != INT_USER_ID:
-                    pinned_message = await self.client.send_message(message, int(MAIN_BUBBLE_ID), [])
-                    pinMessage(accesstoken, pinned_message['message']['id'], "2031-11-11 11:11:11")
-                else:
-                    newmessage = pinned_message['message'] + "\n" + message
-                    editMessage(accesstoken, newmessage, pinned_message['id'])
-
-            if msg_text.startswith("!ban"):
-                target_match = re.search(r"<@(\d+)>", command[1])
-                if target_match:
-                    target_user = int(target_match.group(1))
-                    if target_user not in self.bans:
-                        self.bans.append(target_user)
-                        script_dir = os.path.dirname(os.path.abspath(__file__))
-                        file_path = os.path.join(script_dir, "bans.txt")
-                        with open(file_path, 'w', encoding="utf-8") as openfile:
-                            for item in self.bans:
-                                openfile.write(str(item) + '\n')
-                        await kickUserFromBubble(accesstoken, int(MAIN_BUBBLE_ID), [target_user])
-
-            if msg_text.startswith("!unban"):
-                target_match = re.search(r"<@(\d+)>", command[1])
-                if target_match:
-                    target_user = int(target_match.group(1))
-                    if target_user in self.bans:
-                        self.bans.remove(target_user)
-                        script_dir = os.path.dirname(os.path.abspath(__file__))
-                        file_path = os.path.join(script_dir, "bans.txt")
-                        with open(file_path, 'w', encoding="utf-8") as openfile:
-                            for item in self.bans:
-                                openfile.write(str(item) + '\n')
-                        await addMemberToBubble(accesstoken, int(MAIN_BUBBLE_ID), [target_user])
-            if msg_text.startswith("!poll "):
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                file_path = os.path.join(script_dir, "pollinfo.json")
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        all_poll_info = json.load(f)
-                except Exception as e:
-                    logger.error(e)
-                    all_poll_info = []
-                message = msg_text_tall[6::]
-                message_to_send = f"Poll #{all_poll_info.__len__()+1}:\n" + message
-                poll_message = self.client.send_message(message_to_send, int(MAIN_BUBBLE_ID), [])
-                send_reaction(accesstoken, '✅️', poll_message['message']['id'])
-                send_reaction(accesstoken, '❌️', poll_message['message']['id'])
-                all_poll_info.append(
-                    {
-                        "message": message,
-                        "message_id": poll_message['message']['id'],
-                        "poll_id": all_poll_info.__len__()+1,
-                        "poll_type": 1
-                    }
-                )
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                file_path = os.path.join(script_dir, "pollinfo.json")
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(all_poll_info, f, indent=4)
-            if msg_text.startswith("!advpoll "):
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                file_path = os.path.join(script_dir, "pollinfo.json")
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        all_poll_info = json.load(f)
-                except Exception as e:
-                    logger.error(e)
-                    all_poll_info = []
-                message = msg_text_tall[9::]
-                message_to_send = f"Poll #{all_poll_info.__len__()+1}:\n" + message
-                poll_message = self.client.send_message(message_to_send, int(MAIN_BUBBLE_ID), [])
-                all_poll_info.append(
-                    {
-                        "message": message,
-                        "message_id": poll_message['message']['id'],
-                        "poll_id": all_poll_info.__len__()+1,
-                        "poll_type": 2
-                    }
-                )
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                file_path = os.path.join(script_dir, "pollinfo.json")
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(all_poll_info, f, indent=4)
-
-            if msg_text.startswith("!getpoll "):
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                file_path = os.path.join(script_dir, "pollinfo.json")
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        all_poll_info = json.load(f)
-                except Exception as e:
-                    logger.error(e)
-                    all_poll_info = []
-
-                if command.__len__() != 2:
-                    return
-                try:
-                    target_poll_id = int(command[1])
-                except Exception as e:
-                    return
-
-                if target_poll_id > all_poll_info.__len__() or target_poll_id < 1:
-                    return
-
-                message_id_of_poll = all_poll_info[target_poll_id - 1]['message_id']
-                unique_uuid = str(uuid.uuid4())
-                message_created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-                send_message_to_bubble(accesstoken, int(MAIN_BUBBLE_ID), message_created_at, "Check out the poll here!", INT_USER_ID, unique_uuid, message_id_of_poll)
-            if msg_text.startswith("!checkpoll "):
-
-                if command.__len__() != 2:
-                    return
-
-                try:
-                    target_poll_id = int(command[1])
-                except Exception as e:
-                    return
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                file_path = os.path.join(script_dir, "pollinfo.json")
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        all_poll_info = json.load(f)
-                except Exception as e:
-                    logger.error(e)
-                    all_poll_info = []
-                if target_poll_id > all_poll_info.__len__() or target_poll_id < 1:
-                    return
-                message_id_of_poll = all_poll_info[target_poll_id - 1]['message_id']
-                info = get_bubble_thread(accesstoken, int(MAIN_BUBBLE_ID), message_id_of_poll)
-                if info['parentmessages'].__len__() == 1:
-                    poll_message = info['parentmessages'][0]
-                elif info['parentmessages'].__len__() == 0:
-                    if info['messages'].__len__() == 0:
-                        return
-                    poll_message = info['messages'][info['messages'].__len__() - 1]
-                else:
-                    return
-                if poll_message['id'] != message_id_of_poll:
-                    return
-                reactions = poll_message['reactionsummary']
-                if all_poll_info[target_poll_id - 1]['poll_type'] == 1:
-                    yescount = 0
-                    nocount = 0
-                    for reactionData in reactions:
-                        if reactionData['emoji'] == '✅️':
-                            yescount = reactionData['count'] - 1
-                        if reactionData['emoji'] == '❌️':
-                            nocount = reactionData['count'] - 1
-                    if yescount > nocount:
-                        win_message = "The majority voted yes!"
-                    elif nocount > yescount:
-                        win_message = "The majority voted no!"
-                    else:
-                        win_message = "It's a tie!"
-                    unique_uuid = str(uuid.uuid4())
-                    message_created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-                    send_message_to_bubble(accesstoken, int(MAIN_BUBBLE_ID), message_created_at,
-                                           f"The results for poll #{target_poll_id} are:\n✅ {yescount} people said yes!\n❌ {nocount} people said no!\n{win_message}",
-                                           INT_USER_ID, unique_uuid, message_id_of_poll)
-                if all_poll_info[target_poll_id - 1]['poll_type'] == 2:
-                    to_send_message = f"The results for poll #{target_poll_id} are:\n"
-                    most_common_responses = []
-                    max_count = 0
-
-                    for reactionData in reactions:
-                        count = reactionData['count']
-                        emoji = reactionData['emoji']
-                        people = "person" if count == 1 else "people"
-                        to_send_message += f"{count} {people} said {emoji}!\n"
-
-                        # Track most common responses
-                        if count > max_count:
-                            max_count = count
-                            most_common_responses = [emoji]
-                        elif count == max_count:
-                            most_common_responses.append(emoji)
-
-                    if max_count > 0 and most_common_responses:
-                        common_str = ', '.join(most_common_responses)
-                        to_send_message += f"\nMost common response(s): {common_str} with {max_count} vote(s)."
-
-                    unique_uuid = str(uuid.uuid4())
-                    message_created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-                    send_message_to_bubble(
-                        accesstoken,
-                        int(MAIN_BUBBLE_ID),
-                        message_created_at,
-                        to_send_message,
-                        INT_USER_ID,
-                        unique_uuid,
-                        message_id_of_poll
-                    )
\ No newline at end of file
+        message_id_of_poll = poll['message_id']
+        unique_uuid = str(uuid.uuid4())
+        message_created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        await aio.send_message_to_bubble(accesstoken, self.bubble_id, message_created_at, "Check out the poll here!", INT_USER_ID, unique_uuid, message_id_of_poll)
+
+    @commands.command("stats", always=True, priority=HIGH)
+    async def cmd_stats(self, user_id, msg_id):
+        await self.client.send_message(stats_report(metrics), self.admin_bubble_id, None)
+
+    @commands.command("profile", int, always=True, priority=HIGH)
+    async def cmd_profile(self, user_id, msg_id, seconds):
+        running = self.shared.profile_task
+        if running is not None and not running.done():
+            self.reactions.react('⏳', msg_id)
+            return
+        self.reactions.react('⏱', msg_id)
+        # In the background, so this bubble's event queue keeps moving while it samples
+        self.shared.profile_task = asyncio.create_task(self.run_profile(max(1, min(seconds, MAX_PROFILE_SECONDS))))
+
+    async def run_profile(self, seconds):
+        """Sample the event loop for `seconds`, then post the hottest functions to the admin bubble."""
+        try:
+            profiler = await profile(seconds)
+            # The full report goes up as a file; the message carries the top of it
+            with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as file:
+                file.write(profiler.report(PROFILE_FILE_TOP))
+            try:
+                file_key = await self.client.upload_file_and_get_key(
+                    file.name, f"profile-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.txt")
+            finally:
+                os.remove(file.name)
+            await self.client.send_message(f"Profile of the last {seconds}s:\n{profiler.report(PROFILE_MESSAGE_TOP)}",
+                                           self.admin_bubble_id, [file_key] if file_key else None)
+        except Exception as e:
+            logger.error(f"Profiling failed: {e}")
+
+    @commands.command("checkpoll", int)
+    async def cmd_checkpoll(self, user_id, msg_id, target_poll_id):
+        poll = self.state.get_poll(target_poll_id, self.bubble_id)
+        if poll is None:
+            return
+        message_id_of_poll = poll['message_id']
+        # Live counts from reaction events; fetched once if the poll isn't cached
+        counts = await self.polls.counts(self.bubble_id, message_id_of_poll)
+        if counts is None:
+            return
+        if poll['poll_type'] == 1:
+            # Minus the bot's own reaction
+            yescount = counts['✅️'] - 1 if '✅️' in counts else 0
+            nocount = counts['❌️'] - 1 if '❌️' in counts else 0
+            if yescount > nocount:
+                win_message = "The majority voted yes!"
+            elif nocount > yescount:
+                win_message = "The majority voted no!"
+            else:
+                win_message = "It's a tie!"
+            unique_uuid = str(uuid.uuid4())
+            message_created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            await aio.send_message_to_bubble(accesstoken, self.bubble_id, message_created_at,
+                                   f"The results for poll #{target_poll_id} are:\n✅ {yescount} people said yes!\n❌ {nocount} people said no!\n{win_message}",
+                                   INT_USER_ID, unique_uuid, message_id_of_poll)
+        if poll['poll_type'] == 2:
+            to_send_message = f"The results for poll #{target_poll_id} are:\n"
+            most_common_responses = []
+            max_count = 0
+
+            for emoji, count in counts.items():
+                people = "person" if count == 1 else "people"
+                to_send_message += f"{count} {people} said {emoji}!\n"
+
+                # Track most common responses
+                if count > max_count:
+                    max_count = count
+                    most_common_responses = [emoji]
+                elif count == max_count:
+                    most_common_responses.append(emoji)
+
+            if max_count > 0 and most_common_responses:
+                common_str = ', '.join(most_common_responses)
+                to_send_message += f"\nMost common response(s): {common_str} with {max_count} vote(s)."
+
+            unique_uuid = str(uuid.uuid4())
+            message_created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            await aio.send_message_to_bubble(
+                accesstoken,
+                self.bubble_id,
+                message_created_at,
+                to_send_message,
+                INT_USER_ID,
+                unique_uuid,
+                message_id_of_poll
+            )
\ No newline at end of file
@@ -0,0 +1,241 @@
+# Standard library imports
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from a cached decode to a slow API call
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket and a last one for values above every bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket. None without observations."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):
+                    # Above the last bound; all we know is that it's more than that
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class HistogramFamily:
+    """Histograms of one metric, one per combination of label values."""
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = buckets
+        self.children = {}
+
+    def observe(self, value, *label_values):
+        child = self.children.get(label_values)
+        if child is None:
+            child = self.children[label_values] = Histogram(self.buckets)
+        child.observe(value)
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def total(self):
+        """Every child merged into one histogram."""
+        merged = Histogram(self.buckets)
+        for child in self.children.values():
+            merged.merge(child)
+        return merged
+
+
+class Collected:
+    """A counter or gauge whose value is read from existing state at scrape time.
+
+    `read` returns a number, or {label values tuple: number} when `labels` is given.
+    """
+
+    def __init__(self, name, help, read, kind="gauge", labels=()):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.kind = kind
+        self.labels = tuple(labels)
+
+    def samples(self):
+        value = self.read()
+        if not self.labels:
+            return [((), value)] if value is not None else []
+        return [(key, value) for key, value in value.items() if value is not None]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Histograms the code observes into, and counters read from the objects that keep them.
+
+    The hot paths only touch histograms (a bisect and three additions per
+    observation). The counters the bot already keeps (scheduler, event pool,
+    caches, ...) are registered as callbacks and only read when rendered.
+    Registering a name again replaces the earlier metric.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        family = self.metrics.get(name)
+        if not isinstance(family, HistogramFamily):
+            family = self.metrics[name] = HistogramFamily(name, help, labels, buckets)
+        return family
+
+    def collect(self, name, help, read, kind="gauge", labels=()):
+        self.metrics[name] = Collected(name, help, read, kind, labels)
+
+    def value(self, name, default=0):
+        """Current value of a collected counter or gauge, or `default` if it isn't registered."""
+        metric = self.metrics.get(name)
+        if not isinstance(metric, Collected):
+            return default
+        value = metric.read()
+        return default if value is None else value
+
+    def render(self):
+        """The Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics.values():
+            if isinstance(metric, HistogramFamily):
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} histogram")
+                for values, child in sorted(metric.children.items(), key=lambda item: tuple(map(str, item[0]))):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, child.counts):
+                        cumulative += count
+                        labels = _label_text(metric.labels, values, f'le="{bound}"')
+                        lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                    labels = _label_text(metric.labels, values, 'le="+Inf"')
+                    lines.append(f"{metric.name}_bucket{labels} {child.count}")
+                    labels = _label_text(metric.labels, values)
+                    lines.append(f"{metric.name}_sum{labels} {_number(child.sum)}")
+                    lines.append(f"{metric.name}_count{labels} {child.count}")
+                continue
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.warning(f"Could not read metric {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for values, value in samples:
+                lines.append(f"{metric.name}{_label_text(metric.labels, values)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """One line: count and p50/p99 of every histogram, and every unlabelled counter or gauge."""
+        parts = []
+        for metric in self.metrics.values():
+            if isinstance(metric, HistogramFamily):
+                total = metric.total()
+                if total.count:
+                    parts.append(f"{metric.name} n={total.count} p50={total.quantile(0.5) * 1000:.1f}ms "
+                                 f"p99={total.quantile(0.99) * 1000:.1f}ms")
+            elif not metric.labels:
+                try:
+                    value = metric.read()
+                except Exception:
+                    continue
+                if value is not None:
+                    parts.append(f"{metric.name}={value:.3g}" if isinstance(value, float) else f"{metric.name}={value}")
+        return "; ".join(parts)
+
+
+# The registry every module records into
+metrics = MetricsRegistry()
+
+
+async def serve_metrics(registry, host="127.0.0.1", port=9108, attempts=1):
+    """Serve registry.render() over HTTP on the first free port of port..port+attempts-1.
+
+    Returns the asyncio server, or None if every port was taken.
+    """
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            if request_line.split(b" ")[1:2] in ([b"/metrics"], [b"/"]):
+                status, body = "200 OK", registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    for offset in range(attempts):
+        try:
+            server = await asyncio.start_server(handle, host, port + offset)
+        except OSError as e:
+            logger.warning(f"Metrics port {port + offset} unavailable: {e}")
+            continue
+        logger.info(f"Serving metrics on http://{host}:{port + offset}/metrics")
+        return server
+    return None
+
+
+async def log_summaries(registry, interval=60.0):
+    """Log registry.summary() every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        summary = registry.summary()
+        if summary:
+            logger.info(f"Metrics: {summary}")
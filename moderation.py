@@ -0,0 +1,115 @@
+# Standard library imports
+import asyncio
+import logging
+# Local imports
+from pronto import kickUserFromBubble, addMemberToBubble
+
+logger = logging.getLogger(__name__)
+
+KICK = "kick"
+ADD = "add"
+
+
+class ModerationBatcher:
+    """Coalesces kicks and adds into one bubble.kick / memberships/batch call per bubble.
+
+    kick() and add() return a future for that user. When no call for that
+    bubble and action is in flight, the request goes out on the next pass of
+    the event loop, so a lone kick isn't held back; requests made in the same
+    pass (e.g. a gather of kicks) share the call. While a call is in flight,
+    new requests wait and all go out together as soon as it returns (or once
+    `max_batch` users are waiting). If a batch of several users fails, each
+    user is retried on their own so every future gets its own result or error.
+    """
+
+    def __init__(self, access_token, max_batch=50):
+        self.access_token = access_token
+        self.max_batch = max_batch
+        # (action, bubble_id) -> {user_id: [futures]}
+        self._pending = {}
+        # (action, bubble_id) -> call_soon handle of a flush not yet run
+        self._scheduled = {}
+        # (action, bubble_id) -> calls in flight
+        self._in_flight = {}
+        self._sending = set()
+        self.batches = 0
+        self.users = 0
+        self.errors = 0
+
+    def kick(self, bubble_id, user_id):
+        return self._queue(KICK, int(bubble_id), user_id)
+
+    def add(self, bubble_id, user_id):
+        return self._queue(ADD, int(bubble_id), user_id)
+
+    def _queue(self, action, bubble_id, user_id):
+        loop = asyncio.get_running_loop()
+        key = (action, bubble_id)
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, {})
+        pending.setdefault(user_id, []).append(future)
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+        elif key not in self._in_flight and key not in self._scheduled:
+            self._scheduled[key] = loop.call_soon(self._flush, key)
+        return future
+
+    def _flush(self, key):
+        handle = self._scheduled.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+        batch = self._pending.pop(key, None)
+        if not batch:
+            return
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        task = asyncio.get_running_loop().create_task(self._run(key, batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _run(self, key, batch):
+        try:
+            await self._send(key, batch)
+        finally:
+            self._in_flight[key] -= 1
+            if not self._in_flight[key]:
+                del self._in_flight[key]
+            # Whatever queued up meanwhile goes out as the next batch
+            if self._pending.get(key) and key not in self._scheduled:
+                self._flush(key)
+
+    async def _call(self, action, bubble_id, user_ids):
+        call = kickUserFromBubble if action == KICK else addMemberToBubble
+        self.batches += 1
+        self.users += len(user_ids)
+        return await call(self.access_token, bubble_id, user_ids)
+
+    async def _send(self, key, batch):
+        action, bubble_id = key
+        try:
+            result = await self._call(action, bubble_id, list(batch))
+        except Exception as e:
+            if len(batch) > 1:
+                logger.warning(f"Batched {action} of {len(batch)} users in bubble {bubble_id} failed ({e}); retrying one by one")
+                await asyncio.gather(*(self._send(key, {user_id: futures}) for user_id, futures in batch.items()))
+                return
+            self.errors += 1
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for futures in batch.values():
+            for future in futures:
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self):
+        """Send everything still queued and wait for in-flight batches."""
+        for key in list(self._pending):
+            self._flush(key)
+        # A finishing batch may start the next one, so wait until nothing is left running
+        while True:
+            sending = [task for task in self._sending if not task.done()]
+            if not sending:
+                return
+            await asyncio.gather(*sending, return_exceptions=True)
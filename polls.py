@@ -0,0 +1,88 @@
+# Standard library imports
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+# Local imports
+from pronto import aio
+
+logger = logging.getLogger(__name__)
+
+
+class PollTallies:
+    """Live reaction counts for poll messages, kept in memory.
+
+    Reaction summaries pushed over the websocket (MessageUpdated payloads
+    carrying reactionsummary) replace a poll's counts as they arrive, so a
+    result query is a dict lookup. A poll with no counts yet, or none newer
+    than `max_age` seconds, is fetched once with bubble.history for its
+    thread; concurrent queries for it share that fetch. At most `max_polls`
+    polls are kept, least recently used first out.
+    """
+
+    def __init__(self, state, access_token, max_age=300, max_polls=1000):
+        self.state = state
+        self.access_token = access_token
+        self.max_age = max_age
+        self.max_polls = max_polls
+        # Message IDs of every known poll, so updates to other messages are ignored cheaply
+        self.poll_messages = state.poll_message_ids()
+        # message_id -> (updated at, {emoji: count})
+        self._tallies = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+
+    def track(self, message_id):
+        """Start following a newly created poll."""
+        self.poll_messages.add(int(message_id))
+
+    def _store(self, message_id, summary):
+        counts = {row["emoji"]: row["count"] for row in summary}
+        self._tallies[message_id] = (time.monotonic(), counts)
+        self._tallies.move_to_end(message_id)
+        while len(self._tallies) > self.max_polls:
+            self._tallies.popitem(last=False)
+        return counts
+
+    def apply_update(self, message):
+        """Take the reaction summary from a pushed message. Returns True if it was a poll."""
+        message_id = message.get("id")
+        summary = message.get("reactionsummary")
+        if message_id is None or summary is None:
+            return False
+        message_id = int(message_id)
+        if message_id not in self.poll_messages:
+            return False
+        self._store(message_id, summary)
+        self.updates += 1
+        return True
+
+    async def counts(self, bubble_id, message_id):
+        """{emoji: count} for a poll message in reaction order, or None if it can't be found."""
+        message_id = int(message_id)
+        entry = self._tallies.get(message_id)
+        if entry is not None and time.monotonic() - entry[0] < self.max_age:
+            self.hits += 1
+            self._tallies.move_to_end(message_id)
+            return entry[1]
+        self.misses += 1
+        pending = self._inflight.get(message_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fetch(bubble_id, message_id))
+            self._inflight[message_id] = pending
+        return await asyncio.shield(pending)
+
+    async def _fetch(self, bubble_id, message_id):
+        try:
+            info = await aio.get_bubble_thread(self.access_token, bubble_id, message_id)
+        finally:
+            del self._inflight[message_id]
+        # The poll is the thread's parent message, or the only message if it has no replies yet
+        candidates = info.get("parentmessages") or info.get("messages", [])[-1:]
+        for message in candidates:
+            if int(message["id"]) == message_id:
+                self.track(message_id)
+                return self._store(message_id, message.get("reactionsummary") or [])
+        return None
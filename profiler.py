@@ -0,0 +1,115 @@
+# Standard library imports
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Frames of the event loop machinery sit under every sample, so they are left out of inclusive counts
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+
+
+class SamplingProfiler:
+    """Samples the event loop thread's Python stack from a background thread.
+
+    Every `interval` seconds the sampler reads the loop thread's current frame
+    with sys._current_frames() and credits the time since the last sample to
+    the function on top (own time) and every function on the stack
+    (inclusive time). Nothing is hooked into the
+    loop itself, so the cost is one stack walk per sample on another thread.
+    Samples taken while the loop waits in select() are counted as idle, and
+    asyncio's own frames are left out of the inclusive counts.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = 0
+        # Seconds of samples with the loop waiting in select() and running code
+        self.idle = 0.0
+        self.busy = 0.0
+        self.own = Counter()
+        self.inclusive = Counter()
+        self.elapsed = 0.0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def start(self):
+        """Start sampling; the thread calling this (the event loop) is profiled unless thread_id was given."""
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.elapsed += time.monotonic() - self._started
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            # Weighted by the time since the last sample: while the loop thread holds the
+            # GIL this thread wakes late, and an unweighted count would under-report busy time
+            now = time.perf_counter()
+            weight, last = now - last, now
+            if frame is None:
+                continue
+            self.samples += 1
+            code = frame.f_code
+            if code.co_name == "select" and code.co_filename.endswith("selectors.py"):
+                self.idle += weight
+                continue
+            self.busy += weight
+            self.own[self._label(code)] += weight
+            seen = set()
+            while frame is not None:
+                code = frame.f_code
+                if code not in seen and not code.co_filename.startswith(_ASYNCIO_DIR) and code.co_name != "<module>":
+                    seen.add(code)
+                    self.inclusive[self._label(code)] += weight
+                frame = frame.f_back
+
+    def report(self, top=15):
+        """Text summary: busy share of the loop, then the hottest functions by own and inclusive samples."""
+        if not self.samples:
+            return "No samples taken"
+        busy = self.busy
+        lines = [f"{self.samples} samples over {self.elapsed:.1f}s (every {self.interval * 1000:g}ms); "
+                 f"event loop busy {busy / (busy + self.idle):.0%} of the time"]
+        if not busy:
+            return lines[0]
+        for title, seconds in (("own time", self.own), ("inclusive time", self.inclusive)):
+            lines.append(f"Top functions by {title} (share of busy time):")
+            for label, spent in seconds.most_common(top):
+                lines.append(f"{spent / busy:6.1%}  {label}")
+        return "\n".join(lines)
+
+
+async def profile(seconds, interval=0.005):
+    """Profile the running event loop for `seconds` and return the finished profiler."""
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+    logger.info(f"Profiled {profiler.samples} samples over {profiler.elapsed:.1f}s")
+    return profiler
@@ -2,16 +2,29 @@
 #Email: paul257@ohs.stanford.edu
 #URL: https://github.com/Society451/Better-Pronto
 
-import requests, logging
+import os
+import logging
 import pycurl
+import re
 import json
+import time
+import asyncio
+import functools
+import threading
 from io import BytesIO
+from types import SimpleNamespace
 from dataclasses import dataclass, asdict
+from ratelimit import RequestScheduler, RateLimited, Dropped, parse_retry_after, parse_limits
+from metrics import metrics
 
 
-API_BASE_URL = "https://stanfordohs.pronto.io/"
+# PRONTO_API_BASE_URL points the bot at another server, e.g. fakepronto.py for load tests
+API_BASE_URL = os.getenv("PRONTO_API_BASE_URL", "https://stanfordohs.pronto.io/")
 class BackendError(Exception):
-    pass
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        # HTTP status of a rejected request (check_status=True), else None
+        self.status = status
 # Dataclass for device information
 @dataclass
 class DeviceInfo:
@@ -19,40 +32,350 @@ class DeviceInfo:
     browserversion: str
     osname: str
     type: str
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+
 logger = logging.getLogger(__name__)
 
 
-#AUTHENTICATION FUNCTIONS
-# Function to verify user email
-def requestVerificationEmail(email):
-    url = "https://accounts.pronto.io/api/v1/user.verify"
-    payload = json.dumps({"email": email})
-    buffer = BytesIO()
-    curl = pycurl.Curl()
+#HTTP TRANSPORT
+# Every API function below describes its request as an ApiRequest and hands it to the
+# shared CurlPool. The pooled handles keep their keep-alive connections open and share
+# one CurlShare (DNS cache, TLS sessions, connection cache), so a sweep of dozens of
+# calls to stanfordohs.pronto.io only pays for the TCP/TLS handshake once.
+@dataclass
+class HTTPResponse:
+    status: int
+    body: bytes
+    # Lower-cased header name -> value
+    headers: dict = None
 
-    try:
+@dataclass
+class ApiRequest:
+    method: str
+    url: str
+    access_token: str = None
+    payload: dict = None
+    headers: list = None
+    # DELETE-style endpoints answer with an empty body on success
+    empty_ok: bool = False
+    # Raise BackendError on 4xx/5xx instead of parsing the error body
+    check_status: bool = False
+    # Lane in the request scheduler (see ratelimit.py); None uses the endpoint family's default
+    priority: int = None
+    # Raw request body (e.g. a file upload), sent instead of the JSON payload
+    data: bytes = None
+
+    def header_list(self):
+        if self.headers is not None:
+            return self.headers
+        headers = ["Content-Type: application/json"]
+        if self.access_token is not None:
+            headers.append(f"Authorization: Bearer {self.access_token}")
+        return headers
+
+    def body(self):
+        if self.data is not None:
+            return self.data
+        return json.dumps(self.payload) if self.payload is not None else None
+
+
+class CurlPool:
+    """Pool of persistent pycurl handles sharing DNS, TLS session and connection caches."""
+
+    def __init__(self, max_idle=8, connect_timeout=10, timeout=30):
+        self.share = pycurl.CurlShare()
+        self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+        # Connection cache sharing needs libcurl >= 7.57
+        if hasattr(pycurl, "LOCK_DATA_CONNECT"):
+            self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_CONNECT)
+        self.max_idle = max_idle
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a warm handle from the pool, or make a new one if none are idle."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        curl = pycurl.Curl()
+        # pycurl keeps the share attached across reset(), so it is only set once
+        curl.setopt(pycurl.SHARE, self.share)
+        return curl
+
+    def release(self, curl):
+        """Return a handle to the pool. reset() keeps its connection and DNS caches."""
+        curl.reset()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(curl)
+                return
+        curl.close()
+
+    def prepare(self, curl, method, url, headers, body, buffer, response_headers):
+        """Set the options for one request on a (reset) handle."""
         curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, ["Content-Type: application/json"])
-        curl.setopt(pycurl.POSTFIELDS, payload)
+        curl.setopt(pycurl.HTTPHEADER, headers)
         curl.setopt(pycurl.WRITEDATA, buffer)
+        curl.setopt(pycurl.HEADERFUNCTION, functools.partial(collect_header, response_headers))
+        curl.setopt(pycurl.NOSIGNAL, 1)
+        curl.setopt(pycurl.TCP_KEEPALIVE, 1)
+        curl.setopt(pycurl.CONNECTTIMEOUT, self.connect_timeout)
+        curl.setopt(pycurl.TIMEOUT, self.timeout)
+        if method == "POST":
+            curl.setopt(pycurl.POST, 1)
+            curl.setopt(pycurl.POSTFIELDS, body if body is not None else "")
+        elif method != "GET":
+            curl.setopt(pycurl.CUSTOMREQUEST, method)
+            if body is not None:
+                curl.setopt(pycurl.POSTFIELDS, body)
+
+    def perform(self, method, url, headers, body=None):
+        """Run one blocking request on a pooled handle."""
+        buffer = BytesIO()
+        response_headers = {}
+        curl = self.acquire()
+        try:
+            self.prepare(curl, method, url, headers, body, buffer, response_headers)
+            curl.perform()
+            status = curl.getinfo(pycurl.RESPONSE_CODE)
+        finally:
+            self.release(curl)
+        return HTTPResponse(status, buffer.getvalue(), response_headers)
+
+
+def collect_header(headers, line):
+    """pycurl HEADERFUNCTION: gather the final response's headers into a dict."""
+    line = line.decode("iso-8859-1").strip()
+    if line.startswith("HTTP/"):
+        # A new response (after a redirect or 100 Continue) starts over
+        headers.clear()
+    elif ":" in line:
+        name, value = line.split(":", 1)
+        headers[name.strip().lower()] = value.strip()
+
+
+class AsyncCurlMulti:
+    """Runs pooled curl handles on the asyncio event loop through CurlMulti's socket API.
+
+    libcurl tells us which sockets to watch (M_SOCKETFUNCTION) and when its next
+    timeout is due (M_TIMERFUNCTION); the loop's add_reader/add_writer and call_later
+    call back into socket_action, so no request ever blocks the loop.
+    """
+
+    def __init__(self, pool, loop):
+        self.pool = pool
+        self.loop = loop
+        self.multi = pycurl.CurlMulti()
+        self.multi.setopt(pycurl.M_SOCKETFUNCTION, self._on_socket)
+        self.multi.setopt(pycurl.M_TIMERFUNCTION, self._on_timer)
+        self._pending = {}
+        self._watched = {}
+        self._timer = None
+
+    def _on_socket(self, what, fd, multi, socketp):
+        reading, writing = self._watched.pop(fd, (False, False))
+        if reading:
+            self.loop.remove_reader(fd)
+        if writing:
+            self.loop.remove_writer(fd)
+        if what == pycurl.POLL_REMOVE:
+            return
+        reading = what in (pycurl.POLL_IN, pycurl.POLL_INOUT)
+        writing = what in (pycurl.POLL_OUT, pycurl.POLL_INOUT)
+        if reading:
+            self.loop.add_reader(fd, self._on_action, fd, pycurl.CSELECT_IN)
+        if writing:
+            self.loop.add_writer(fd, self._on_action, fd, pycurl.CSELECT_OUT)
+        self._watched[fd] = (reading, writing)
+
+    def _on_timer(self, timeout_ms):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if timeout_ms >= 0:
+            self._timer = self.loop.call_later(timeout_ms / 1000, self._on_action, pycurl.SOCKET_TIMEOUT, 0)
+
+    def _on_action(self, fd, event):
+        if fd == pycurl.SOCKET_TIMEOUT:
+            self._timer = None
+        while True:
+            ret, running = self.multi.socket_action(fd, event)
+            if ret != pycurl.E_CALL_MULTI_PERFORM:
+                break
+        self._collect()
+
+    def _collect(self):
+        while True:
+            queued, finished, failed = self.multi.info_read()
+            for curl in finished:
+                self._finish(curl, None)
+            for curl, errno, errmsg in failed:
+                self._finish(curl, pycurl.error(errno, errmsg))
+            if not queued:
+                break
+
+    def _finish(self, curl, error):
+        self.multi.remove_handle(curl)
+        future, buffer, response_headers = self._pending.pop(curl)
+        if not future.done():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(HTTPResponse(curl.getinfo(pycurl.RESPONSE_CODE), buffer.getvalue(), response_headers))
+        self.pool.release(curl)
+
+    async def perform(self, method, url, headers, body=None):
+        """Run one request without blocking the event loop."""
+        buffer = BytesIO()
+        response_headers = {}
+        curl = self.pool.acquire()
+        try:
+            self.pool.prepare(curl, method, url, headers, body, buffer, response_headers)
+        except Exception:
+            self.pool.release(curl)
+            raise
+        future = self.loop.create_future()
+        self._pending[curl] = (future, buffer, response_headers)
+        self.multi.add_handle(curl)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Abort the transfer if it is still in flight
+            if curl in self._pending:
+                del self._pending[curl]
+                self.multi.remove_handle(curl)
+                self.pool.release(curl)
+            raise
+
+
+# The one pool used by this module and by ProntoClient in mainbot.py
+http_pool = CurlPool()
+# Paces every async API call: priority lanes and 429 backoff per endpoint family. Families are
+# unlimited unless PRONTO_RATE_LIMITS caps them (e.g. "messages=5:10"); a 429 lowers the rate
+scheduler = RequestScheduler(parse_limits(os.getenv("PRONTO_RATE_LIMITS")))
+_async_multi = None
+# Time on the wire for every request (429s included, scheduler waits not)
+API_LATENCY = metrics.histogram("pronto_api_request_seconds", "Pronto API request latency by endpoint and HTTP status",
+                                ("endpoint", "status"))
+# Invite codes are random strings; every other segment with a digit in it (other than
+# an API version like v1) is an ID. Folding them keeps one histogram per endpoint
+_CODE_SEGMENT_RE = re.compile(r"(?<=/invites)/[^/]+")
+_ID_SEGMENT_RE = re.compile(r"/(?!v\d+(?:/|$))[^/]*\d[^/]*(?=/|$)")
+
+
+@functools.lru_cache(maxsize=1024)
+def _endpoint_path(path):
+    return _ID_SEGMENT_RE.sub("/:id", _CODE_SEGMENT_RE.sub("/:code", path))
+
+def endpoint_label(url):
+    """The URL path with IDs folded, e.g. /api/clients/messages/:id/reactions or /api/clients/invites/:code."""
+    path = url.split("://", 1)[-1]
+    path = path[path.find("/"):] if "/" in path else "/"
+    return _endpoint_path(path.split("?", 1)[0])
+
+def async_transport():
+    """Return the CurlMulti driver for the running event loop."""
+    global _async_multi
+    loop = asyncio.get_running_loop()
+    if _async_multi is None or _async_multi.loop is not loop:
+        _async_multi = AsyncCurlMulti(http_pool, loop)
+    return _async_multi
+
+
+def parse_response(request, response):
+    """Decode a response the way every API function expects it."""
+    if response.status == 429:
+        retry_after = parse_retry_after((response.headers or {}).get("retry-after"))
+        raise RateLimited(f"HTTP 429 for {request.url} (retry after {retry_after:.1f}s)", retry_after)
+    if request.check_status and response.status >= 400:
+        raise BackendError(f"HTTP error occurred: {response.status} - Response: {response.body[:200]!r}",
+                           response.status)
+    response_data = response.body.decode("utf-8")
+    if request.empty_ok and not response_data:
+        return {"status": "Success"}
+    return json.loads(response_data)
+
+def api_error(err):
+    """Log a failed call and turn it into the BackendError callers expect."""
+    if isinstance(err, json.JSONDecodeError):
+        logger.error("Failed to parse JSON response")
+        return BackendError("Failed to parse JSON response")
+    if isinstance(err, BackendError):
+        logger.error(err)
+        return err
+    if isinstance(err, Dropped):
+        logger.info(err)
+        return BackendError(str(err))
+    if isinstance(err, RateLimited):
+        logger.error(f"Still rate limited after retrying: {err}")
+        return BackendError(str(err))
+    logger.error(f"An unexpected error occurred: {err}")
+    return BackendError(f"An unexpected error occurred: {err}")
+
+def call_api(request):
+    """Perform an ApiRequest on the shared pool and return the decoded JSON."""
+    started = time.perf_counter()
+    status = "error"
+    try:
+        response = http_pool.perform(request.method, request.url, request.header_list(), request.body())
+        status = str(response.status)
+        return parse_response(request, response)
+    except Exception as err:
+        raise api_error(err)
+    finally:
+        API_LATENCY.observe(time.perf_counter() - started, endpoint_label(request.url), status)
+
+async def acall_api(request):
+    """Non-blocking call_api, for use inside the event loop. Goes through the scheduler."""
+    async def send():
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await async_transport().perform(request.method, request.url, request.header_list(), request.body())
+            status = str(response.status)
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, endpoint_label(request.url), status)
+        return parse_response(request, response)
+    try:
+        return await scheduler.run(request.url, send, request.priority)
+    except Exception as err:
+        raise api_error(err)
 
-        curl.perform()
-        curl.close()
+# The asyncio-native client: aio.<name> is the awaitable variant of every endpoint
+aio = SimpleNamespace()
 
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
+# Decorators turning a function that describes a request into one that performs it.
+# The sync function blocks on the pool, its .aio twin runs on the event loop.
+def endpoint(build):
+    @functools.wraps(build)
+    def wrapper(*args, **kwargs):
+        return call_api(build(*args, **kwargs))
 
-    except json.JSONDecodeError:
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        raise BackendError(f"An error occurred: {err}")
+    @functools.wraps(build)
+    async def async_wrapper(*args, **kwargs):
+        return await acall_api(build(*args, **kwargs))
+
+    wrapper.aio = async_wrapper
+    async_wrapper.sync = wrapper
+    setattr(aio, build.__name__, async_wrapper)
+    return wrapper
+
+# For the endpoints callers always await; the blocking variant stays reachable as .sync
+def async_endpoint(build):
+    return endpoint(build).aio
+
+
+#AUTHENTICATION FUNCTIONS
+# Function to verify user email
+@endpoint
+def requestVerificationEmail(email):
+    return ApiRequest("POST", "https://accounts.pronto.io/api/v1/user.verify", payload={"email": email})
 
 # Function to log in using email and verification code
+@endpoint
 def verification_code_to_login_token(email, verification_code):
-    url = "https://accounts.pronto.io/api/v3/user.login"
     device_info = DeviceInfo(
         browsername="Firefox",
         browserversion="130.0.0",
@@ -64,409 +387,91 @@ def verification_code_to_login_token(email, verification_code):
         "code": verification_code,
         "device": asdict(device_info)
     }
-    headers = {
-        "Content-Type": "application/json"
-    }
-    try:
-        response = requests.post(url, json=request_payload, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.HTTPError as http_err:
-        logger.error(f"HTTP error occurred: {http_err} - Response: {response.text}")
-        raise BackendError(f"HTTP error occurred: {http_err}")
-    except requests.exceptions.RequestException as req_err:
-        logger.error(f"Request exception occurred: {req_err}")
-        raise BackendError(f"Request exception occurred: {req_err}")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", "https://accounts.pronto.io/api/v3/user.login",
+                      payload=request_payload, check_status=True)
 
+@endpoint
 def get_bubble_thread(access_token, bubbleID, threadID):
-    url = f"{API_BASE_URL}api/v1/bubble.history"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
     request_payload = {"bubble_id": bubbleID}
     if threadID is not None:
         request_payload["thread_id"] = threadID
-    payload_json = json.dumps(request_payload)
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, payload_json)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/bubble.history", access_token, request_payload)
 #BUBBLE FUNCTIONS
 # Function to get all user's bubbles
+@endpoint
 def getUsersBubbles(access_token):
-    url = f"{API_BASE_URL}api/v3/bubble.list"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"  # Ensure 'Bearer' is included
-    ]
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", f"{API_BASE_URL}api/v3/bubble.list", access_token)
 
 # Function to get last 50 messages in a bubble, given bubble ID
 # and an optional argument of latest message ID, which will return a list of 50 messages sent before that message
+@endpoint
 def get_bubble_messages(access_token, bubbleID, latestMessageID=None):
-    url = f"{API_BASE_URL}api/v1/bubble.history"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
     request_payload = {"bubble_id": bubbleID}
     if latestMessageID is not None:
         request_payload["latest"] = latestMessageID
-    payload_json = json.dumps(request_payload)
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, payload_json)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/bubble.history", access_token, request_payload)
 
+@endpoint
 def send_reaction(access_token, reaction, message_id):
-    url = f"{API_BASE_URL}api/clients/messages/{message_id}/reactions"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-    request_payload = json.dumps({"emoji": reaction})
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", f"{API_BASE_URL}api/clients/messages/{message_id}/reactions", access_token,
+                      {"emoji": reaction}, check_status=True)
 #Function to get information about a bubble
-
-
-
+@endpoint
 def get_bubble_info(access_token, bubbleID):
-    url = f"{API_BASE_URL}api/v2/bubble.info"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({"bubble_id": bubbleID})
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", f"{API_BASE_URL}api/v2/bubble.info", access_token, {"bubble_id": bubbleID})
 
 #Function to mark a bubble as read
+@endpoint
 def markBubble(access_token, bubbleID, message_id=None):
-    url = f"{API_BASE_URL}api/v1/bubble.mark"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
     request_payload = {"bubble_id": bubbleID}
     if message_id is not None:
         request_payload["message_id"] = message_id
-    payload_json = json.dumps(request_payload)
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, payload_json)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
-
-
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/bubble.mark", access_token, request_payload)
 
+@endpoint
 def membershipUpdate(access_token, bubbleID, marked_unread=False):
-    url = f"{API_BASE_URL}api/v1/membership.update"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({
+    request_payload = {
         "bubble_id": bubbleID,
         "marked_unread": marked_unread
-    })
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    }
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/membership.update", access_token, request_payload)
 #Function to create DM
+@endpoint
 def createDM(access_token, user_id, orgID):
-    url = f"{API_BASE_URL}api/v1/dm.create"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({
+    request_payload = {
         "organization_id": orgID,
         "user_id": user_id
-    })
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    }
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/dm.create", access_token, request_payload)
 
 #Function to create a bubble/group
+@endpoint
 def createBubble(access_token, orgID, title, category_id=None):
-    url = f"{API_BASE_URL}api/v1/bubble.create"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
     request_payload = {
         "organization_id": orgID,
         "title": title
     }
     if category_id is not None:
         request_payload["category_id"] = category_id
-    payload_json = json.dumps(request_payload)
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, payload_json)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/bubble.create", access_token, request_payload)
 
 
 #Function to add a member to a bubble
 #people is a list of user IDs, in the form of [5302519, 5302367]
-
-
-async def addMemberToBubble(access_token, bubbleID, people):
-    url = f"{API_BASE_URL}api/clients/chats/{bubbleID}/memberships/batch"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({"user_ids": people})
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+@async_endpoint
+def addMemberToBubble(access_token, bubbleID, people):
+    return ApiRequest("POST", f"{API_BASE_URL}api/clients/chats/{bubbleID}/memberships/batch", access_token,
+                      {"user_ids": people})
 
 #Function to kick user from a bubble
 #users is a list of user IDs, in the form of [5302519]
-async def kickUserFromBubble(access_token, bubbleID, users):
-    url = f"{API_BASE_URL}api/v1/bubble.kick"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({
+@async_endpoint
+def kickUserFromBubble(access_token, bubbleID, users):
+    request_payload = {
         "bubble_id": bubbleID,
         "users": users
-    })
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    }
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/bubble.kick", access_token, request_payload)
 
 
 #Function to update a bubble
@@ -484,15 +489,10 @@ async def kickUserFromBubble(access_token, bubbleID, users):
 #videosessionrecordcloud = allow "owner" or "member" to record a video session in the cloud
 #create_announcement = allow "owner" or "member" to create an announcement in the bubble
 
+@endpoint
 def updateBubble(access_token, bubbleID, title=None, category_id=None, changetitle=None, addmember=None,
                  leavegroup=None, create_message=None, assign_task=None, pin_message=None, changecategory=None,
                  removemember=None, create_videosession=None, videosessionrecordcloud=None, create_announcement=None):
-    url = f"{API_BASE_URL}api/v1/bubble.update"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
     request_payload = {"bubble_id": bubbleID}
 
     # Add optional parameters to the payload
@@ -506,70 +506,21 @@ def updateBubble(access_token, bubbleID, title=None, category_id=None, changetit
         if value is not None:
             request_payload[key] = value
 
-    payload_json = json.dumps(request_payload)
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, payload_json)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/bubble.update", access_token, request_payload)
 
 #Function to pin message to bubble
 #Example {bubble_id: 3955365, pinned_message_id: 96930584, pinned_message_expires_at: "2025-01-18 23:12:18"}
 # or send pinned_messageid: "null" to unpin the message
+@endpoint
 def pinMessage(access_token, pinned_message_id, pinned_message_expires_at):
-    url = f"{API_BASE_URL}api/v1/bubble.update"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({
+    request_payload = {
         "pinned_message_id": pinned_message_id,
         "pinned_message_expires_at": pinned_message_expires_at
-    })
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    }
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/bubble.update", access_token, request_payload)
 
 
+@endpoint
 def getUsers(access_token, cursor):
     url = f"{API_BASE_URL}api/clients/users/search?page[size]=100&filter[relation]=all"
     if cursor is not None:
@@ -579,149 +530,93 @@ def getUsers(access_token, cursor):
         "Accept: application/json",
         "Authorization: Bearer " + access_token
     ]
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("GET", url, headers=headers)
 
 
-def getAllUsers(access_token):
+#Function to walk every user in the org, one getUsers page (100 users) at a time
+#Yields users lazily, so callers that scan the org never hold all of it in memory
+def iterUsers(access_token):
     cursor = None
-    users = []
-
     while True:
         data = getUsers(access_token, cursor)
-        users.extend(data.get('data', []))
+        yield from data.get('data', [])
         cursor = data.get('cursors', {}).get('next')
         if cursor is None:
             break
 
-    return users
-
-async def getInvites(access_token, bubbleID):
-    url = f"{API_BASE_URL}api/clients/groups/{bubbleID}/invites"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
+#Async version of iterUsers; the next page is fetched while the caller works through the current one
+async def _iterUsers(access_token):
+    pending = asyncio.ensure_future(aio.getUsers(access_token, None))
     try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
-async def deleteInvite(access_token, code):
-    url = f"{API_BASE_URL}api/clients/invites/{code}"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.CUSTOMREQUEST, "DELETE")
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.WRITEDATA, buffer)
+        while pending is not None:
+            data = await pending
+            cursor = data.get('cursors', {}).get('next')
+            pending = asyncio.ensure_future(aio.getUsers(access_token, cursor)) if cursor is not None else None
+            for user in data.get('data', []):
+                yield user
+    finally:
+        if pending is not None:
+            pending.cancel()
+aio.iterUsers = _iterUsers
 
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data) if response_data else {"status": "Success"}
+def getAllUsers(access_token):
+    return list(iterUsers(access_token))
+
+async def _getAllUsers(access_token):
+    return [user async for user in aio.iterUsers(access_token)]
+aio.getAllUsers = _getAllUsers
+
+@async_endpoint
+def getInvites(access_token, bubbleID):
+    return ApiRequest("GET", f"{API_BASE_URL}api/clients/groups/{bubbleID}/invites", access_token)
+@async_endpoint
+def deleteInvite(access_token, code):
+    return ApiRequest("DELETE", f"{API_BASE_URL}api/clients/invites/{code}", access_token, empty_ok=True,
+                      check_status=True)
+#Function to delete many invite links at once
+#codes is a list of invite codes; up to `concurrency` deletes run at the same time and each
+#one is abandoned after `timeout` seconds
+#Returns a report in the form of {code: {"ok": True, "error": None}, ...}
+async def purgeInvites(access_token, codes, concurrency=10, timeout=5.0):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def purge(code):
+        async with semaphore:
+            try:
+                await asyncio.wait_for(deleteInvite(access_token, code), timeout)
+                return code, {"ok": True, "error": None}
+            except asyncio.TimeoutError:
+                return code, {"ok": False, "error": f"timed out after {timeout}s"}
+            except BackendError as err:
+                return code, {"ok": False, "error": str(err)}
+
+    report = dict(await asyncio.gather(*(purge(code) for code in codes)))
+    failed = [code for code, result in report.items() if not result["ok"]]
+    if failed:
+        logger.warning(f"Failed to delete {len(failed)} of {len(report)} invites: {failed}")
+    return report
+aio.purgeInvites = purgeInvites
 
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
 #Function to create invite link
 #access is the access level of the invite, expiration is the expiration date of the invite
 #access example: access: "internal"
 #^this allows for only users with the link and who are a part of the org to join
 #expiration example: expires: "2024-12-09T16:08:34.332Z"
 
+@endpoint
 def createInvite(bubbleID, access, expires, access_token):
-    url = f"{API_BASE_URL}api/clients/groups/{bubbleID}/invites"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({
+    request_payload = {
         "access": access,
         "expires": expires
-    })
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    }
+    return ApiRequest("POST", f"{API_BASE_URL}api/clients/groups/{bubbleID}/invites", access_token, request_payload)
 
 
 
 #MESSAGE FUNCTIONS
 # Function to send a message to a bubble
+@endpoint
 def send_message_to_bubble(access_token, bubbleID, created_at, message, userID, uuid, parentmessage_id=None):
-    url = f"{API_BASE_URL}api/v1/message.create"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
     request_payload = {
         "bubble_id": bubbleID,
         "created_at": created_at,
@@ -735,250 +630,57 @@ def send_message_to_bubble(access_token, bubbleID, created_at, message, userID,
     if parentmessage_id is not None:
         request_payload["parentmessage_id"] = parentmessage_id
 
-    payload_json = json.dumps(request_payload)
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, payload_json)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/message.create", access_token, request_payload)
 
 # Function to add a reaction to a message [DEPRECATED?]
+@endpoint
 def addReaction(access_token, messageID, reactiontype_id):
-    url = f"{API_BASE_URL}api/v1/message.addreaction"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({
+    request_payload = {
         "message_id": messageID,
         "reactiontype_id": reactiontype_id
-    })
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    }
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/message.addreaction", access_token, request_payload)
 
 # Function to remove a reaction from a message
+@endpoint
 def removeReaction(access_token, messageID, reactiontype_id):
-    url = f"{API_BASE_URL}api/v1/message.removereaction"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({
+    request_payload = {
         "message_id": messageID,
         "reactiontype_id": reactiontype_id
-    })
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    }
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/message.removereaction", access_token, request_payload)
 
 # Function to edit a message
+@endpoint
 def editMessage(access_token, newMessage, messageID):
-    url = f"{API_BASE_URL}api/v1/message.edit"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({
+    request_payload = {
         "message": newMessage,
         "message_id": messageID
-    })
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    }
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/message.edit", access_token, request_payload)
 
 # Function to delete a message
+@endpoint
 def deleteMessage(access_token, messageID):
-    url = f"{API_BASE_URL}api/v1/message.delete"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({
-        "message_id": messageID
-    })
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data) if response_data else {"status": "Success"}
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/message.delete", access_token, {"message_id": messageID},
+                      empty_ok=True)
 
 
 #USER INFO FUNCTIONS
 # Function to get user information
+@endpoint
 def userInfo(access_token, user_id):
-    url = f"{API_BASE_URL}api/v1/user.info"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({"id": user_id})
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/user.info", access_token, {"id": user_id})
 
 # Function to get a user's mutual groups
+@endpoint
 def mutualGroups(access_token, user_id):
-    url = f"{API_BASE_URL}api/v1/user.mutualgroups"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({"id": user_id})
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/user.mutualgroups", access_token, {"id": user_id})
 
 # Function to set online/offline status
+@endpoint
 def setStatus(access_token, userID, isonline, lastpresencetime):
-    url = f"{API_BASE_URL}api/clients/users/presence"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
-    request_payload = json.dumps({
+    request_payload = {
         "data": [
             {
                 "user_id": userID,
@@ -986,42 +688,15 @@ def setStatus(access_token, userID, isonline, lastpresencetime):
                 "lastpresencetime": lastpresencetime
             }
         ]
-    })
-
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, request_payload)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    }
+    return ApiRequest("POST", f"{API_BASE_URL}api/clients/users/presence", access_token, request_payload)
 
 #OTHER Functions
 # Search for message function
 #EXAMPLE: {search_type: "files", size: 25, from: 0, orderby: "newest", query: "hello there", user_ids: [5302419]}
 
+@endpoint
 def searchMessage(access_token, query, bubbleIDs=None, user_ids=None, start_date=None, end_date=None, fromnum=0, orderby=None, size=10):
-    url = f"{API_BASE_URL}api/v1/message.search"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
     request_payload = {
         "search_type": "messages",
         "size": size,
@@ -1037,38 +712,11 @@ def searchMessage(access_token, query, bubbleIDs=None, user_ids=None, start_date
         if value is not None:
             request_payload[key] = value
 
-    payload_json = json.dumps(request_payload)
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, payload_json)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
+    return ApiRequest("POST", f"{API_BASE_URL}api/v1/message.search", access_token, request_payload)
 
 #{"orderby":["firstname","lastname"],"includeself":true,"bubble_id":"3640189","page":1}
+@endpoint
 def bubbleMembershipSearch(access_token, bubble_id, orderby=["firstname", "lastname"], includeself=True, page=None):
-    url = f"{API_BASE_URL}/api/v1/bubble.membershipsearch"
-    headers = [
-        "Content-Type: application/json",
-        f"Authorization: Bearer {access_token}"
-    ]
-
     request_payload = {
         "orderby": orderby,
         "includeself": includeself,
@@ -1077,26 +725,4 @@ def bubbleMembershipSearch(access_token, bubble_id, orderby=["firstname", "lastn
     if page is not None:
         request_payload["page"] = page
 
-    payload_json = json.dumps(request_payload)
-    buffer = BytesIO()
-    curl = pycurl.Curl()
-
-    try:
-        curl.setopt(pycurl.URL, url)
-        curl.setopt(pycurl.POST, 1)
-        curl.setopt(pycurl.HTTPHEADER, headers)
-        curl.setopt(pycurl.POSTFIELDS, payload_json)
-        curl.setopt(pycurl.WRITEDATA, buffer)
-
-        curl.perform()
-        curl.close()
-
-        response_data = buffer.getvalue().decode("utf-8")
-        return json.loads(response_data)
-
-    except json.JSONDecodeError:
-        logger.error("Failed to parse JSON response")
-        raise BackendError("Failed to parse JSON response")
-    except Exception as err:
-        logger.error(f"An unexpected error occurred: {err}")
-        raise BackendError(f"An unexpected error occurred: {err}")
\ No newline at end of file
+    return ApiRequest("POST", f"{API_BASE_URL}/api/v1/bubble.membershipsearch", access_token, request_payload)
@@ -0,0 +1,326 @@
+# Standard library imports
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+import contextvars
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Priorities, most urgent first
+URGENT = 0  # kicks, invite purges, websocket auth
+HIGH = 1  # admin notifications
+NORMAL = 2  # command replies and everything else
+LOW = 3  # reactions, poll messages, pin edits; may be dropped under pressure
+
+# Priority for API calls made in the current task; see priority()
+current_priority = contextvars.ContextVar("current_priority", default=None)
+
+
+@contextmanager
+def priority(level):
+    """Run the API calls made inside the block at `level`."""
+    token = current_priority.set(level)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+# Endpoint families, matched in order against the request URL
+FAMILIES = (
+    ("reactions", ("/reactions", "message.addreaction", "message.removereaction")),
+    ("memberships", ("bubble.kick", "/memberships", "membership.update")),
+    ("invites", ("/invites",)),
+    ("messages", ("message.", "bubble.history")),
+    ("auth", ("pusher.auth",)),
+)
+
+# Adaptive limits: a 429 halves the family's rate (never below MIN_RATE); after
+# RECOVER_AFTER seconds without another one it grows by RECOVER_FACTOR, until it
+# is back at the rate that was throttled and the family's configured limit returns
+THROTTLE_FACTOR = 0.5
+MIN_RATE = 0.5
+RECOVER_AFTER = 30.0
+RECOVER_FACTOR = 1.5
+
+# Priority used when the caller doesn't give one
+DEFAULT_PRIORITIES = {
+    "memberships": URGENT,
+    "invites": URGENT,
+    "auth": URGENT,
+    "reactions": LOW,
+}
+
+
+def parse_limits(spec):
+    """"messages=5:10,invites=10" -> {"messages": (5.0, 10), "invites": (10.0, 10)}.
+
+    Each entry is family=rate[:burst] in requests per second; the burst defaults
+    to the rate. Families left out are unlimited.
+    """
+    limits = {}
+    for entry in (spec or "").split(","):
+        if not entry.strip():
+            continue
+        name, _, value = entry.partition("=")
+        rate, _, burst = value.partition(":")
+        rate = float(rate)
+        limits[name.strip()] = (rate, int(burst) if burst else max(1, int(rate)))
+    return limits
+
+
+def family_of(url):
+    for family, patterns in FAMILIES:
+        if any(pattern in url for pattern in patterns):
+            return family
+    return "other"
+
+
+class RateLimited(Exception):
+    """An HTTP 429 from the API; retry_after is in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Dropped(Exception):
+    """A low-priority request shed because its family was backed up or throttled."""
+
+
+def parse_retry_after(value, default=1.0):
+    """Retry-After as seconds; the header may be a number or an HTTP date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """Take a token and return 0, or return the seconds until one is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Family:
+    def __init__(self, name, limit=None):
+        self.name = name
+        # Configured (rate, burst), or None for no limit until the API pushes back
+        self.limit = limit
+        self.bucket = TokenBucket(*limit) if limit else None
+        # Heap of (priority, sequence, future) for requests waiting on a token
+        self.waiters = []
+        self.paused_until = 0.0
+        self.timer = None
+        # Requests sent in the current one-second window, and the rate over the last full one
+        self.window_start = time.monotonic()
+        self.window_sent = 0
+        self.observed_rate = 0.0
+        # While throttled: the rate that drew the 429 and when the rate last changed
+        self.ceiling = None
+        self.adjusted_at = None
+
+    def take(self, now):
+        return 0.0 if self.bucket is None else self.bucket.take(now)
+
+    def record_send(self, now):
+        if now - self.window_start >= 1.0:
+            self.observed_rate = self.window_sent / (now - self.window_start)
+            self.window_start = now
+            self.window_sent = 0
+        self.window_sent += 1
+        if self.adjusted_at is not None and now - self.adjusted_at >= RECOVER_AFTER:
+            self._set_rate(self.bucket.rate * RECOVER_FACTOR, now)
+
+    def throttle(self, now):
+        """Cut the rate after a 429, from the current limit or, if unlimited, the rate actually sent."""
+        if self.bucket is not None:
+            current = self.bucket.rate
+        else:
+            current = max(self.observed_rate, self.window_sent, 2 * MIN_RATE)
+        if self.ceiling is None:
+            self.ceiling = current
+        self._set_rate(current * THROTTLE_FACTOR, now)
+
+    def _set_rate(self, rate, now):
+        rate = max(MIN_RATE, rate)
+        if rate >= self.ceiling:
+            # Recovered: back to the configured limit (or none)
+            self.bucket = TokenBucket(*self.limit) if self.limit else None
+            self.ceiling = None
+            self.adjusted_at = None
+            logger.info(f"{self.name} requests back to their normal rate")
+            return
+        bucket = TokenBucket(rate, max(1, int(rate)))
+        if self.bucket is not None:
+            bucket.tokens = min(bucket.capacity, self.bucket.tokens)
+        self.bucket = bucket
+        self.adjusted_at = now
+        logger.info(f"{self.name} requests limited to {rate:.1f}/s")
+
+
+class RequestScheduler:
+    """Token-bucket limits per endpoint family, with priority lanes and 429 handling.
+
+    Each family (messages, reactions, memberships, invites, ...) is unlimited
+    unless `limits` gives it a (rate, burst). A 429 lowers the family's rate
+    adaptively (see THROTTLE_FACTOR) and it climbs back once the API stops
+    pushing back. Requests that find it empty wait in a heap ordered by priority and
+    then arrival, so a queued kick always goes before a queued reaction. A 429
+    pauses the whole family for its Retry-After and the request is retried
+    (up to `max_retries` times) at the front of its lane.
+
+    Requests at `shed_priority` or below are dropped (raising Dropped) rather
+    than queued when their family is paused or already has `shed_depth`
+    waiters, and when they have waited `shed_after` seconds.
+    """
+
+    def __init__(self, limits=None, max_retries=3, shed_priority=LOW, shed_depth=20, shed_after=10.0):
+        self.limits = dict(limits or {})
+        self.max_retries = max_retries
+        self.shed_priority = shed_priority
+        self.shed_depth = shed_depth
+        self.shed_after = shed_after
+        self.families = {}
+        self._sequence = itertools.count()
+        self.sent = 0
+        self.throttled = 0
+        self.queued = 0
+        self.dropped = 0
+        self.wait_time = 0.0
+        # priority -> [requests, total wait, longest wait] in seconds
+        self.lane_waits = {}
+
+    def _family(self, name):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = _Family(name, self.limits.get(name))
+        return family
+
+    def configure(self, name, rate, burst):
+        self.limits[name] = (rate, burst)
+        self.families.pop(name, None)
+
+    def depth(self):
+        """Waiting requests: {family: {priority: count}}."""
+        report = {}
+        for name, family in self.families.items():
+            lanes = {}
+            for priority, _, future in family.waiters:
+                if not future.done():
+                    lanes[priority] = lanes.get(priority, 0) + 1
+            if lanes:
+                report[name] = lanes
+        return report
+
+    def pause(self, name, seconds):
+        family = self._family(name)
+        family.paused_until = max(family.paused_until, time.monotonic() + seconds)
+        self._pump(family)
+
+    def _record_wait(self, priority, waited):
+        lane = self.lane_waits.setdefault(priority, [0, 0.0, 0.0])
+        lane[0] += 1
+        lane[1] += waited
+        lane[2] = max(lane[2], waited)
+        self.wait_time += waited
+
+    def _drop(self, name, priority, reason):
+        self.dropped += 1
+        raise Dropped(f"Dropped priority {priority} {name} request: {reason}")
+
+    async def acquire(self, name, priority=NORMAL, sequence=None):
+        """Wait for a token in a family. Raises Dropped for shed low-priority requests."""
+        family = self._family(name)
+        now = time.monotonic()
+        if not family.waiters and now >= family.paused_until and family.take(now) == 0:
+            self._record_wait(priority, 0.0)
+            return
+        sheddable = priority >= self.shed_priority
+        if sheddable and now < family.paused_until:
+            self._drop(name, priority, "family is rate limited")
+        if sheddable and len(family.waiters) >= self.shed_depth:
+            self._drop(name, priority, f"{len(family.waiters)} requests already waiting")
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(family.waiters, (priority, next(self._sequence) if sequence is None else sequence, future))
+        self.queued += 1
+        self._pump(family)
+        try:
+            if sheddable:
+                try:
+                    await asyncio.wait_for(future, self.shed_after)
+                except asyncio.TimeoutError:
+                    self._drop(name, priority, f"waited {self.shed_after}s")
+            else:
+                await future
+        finally:
+            self._record_wait(priority, time.monotonic() - now)
+
+    def _pump(self, family):
+        """Hand out tokens to waiters in priority order, or sleep until the next one."""
+        if family.timer is not None:
+            family.timer.cancel()
+            family.timer = None
+        while family.waiters:
+            if family.waiters[0][2].done():
+                # Cancelled while waiting
+                heapq.heappop(family.waiters)
+                continue
+            now = time.monotonic()
+            delay = family.paused_until - now
+            if delay <= 0:
+                delay = family.take(now)
+            if delay > 0:
+                family.timer = asyncio.get_running_loop().call_later(delay, self._pump, family)
+                return
+            heapq.heappop(family.waiters)[2].set_result(None)
+
+    async def run(self, url, send, priority=None):
+        """Call send() once the URL's family has a token, retrying after 429s.
+
+        The priority is the one given, else the one set with priority(), else
+        the family's default.
+        """
+        name = family_of(url)
+        if priority is None:
+            priority = current_priority.get()
+        if priority is None:
+            priority = DEFAULT_PRIORITIES.get(name, NORMAL)
+        # Retries keep their original place in the lane
+        sequence = next(self._sequence)
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(name, priority, sequence)
+            try:
+                result = await send()
+            except RateLimited as e:
+                self.throttled += 1
+                logger.warning(f"Rate limited on {name}; pausing it for {e.retry_after:.1f}s")
+                self._family(name).throttle(time.monotonic())
+                self.pause(name, e.retry_after)
+                if attempt == self.max_retries:
+                    raise
+                continue
+            self.sent += 1
+            self._family(name).record_send(time.monotonic())
+            return result
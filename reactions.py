@@ -0,0 +1,92 @@
+# Standard library imports
+import asyncio
+import logging
+# Local imports
+from pronto import aio, BackendError
+from ratelimit import priority, LOW
+
+logger = logging.getLogger(__name__)
+
+VARIATION_SELECTOR = "\ufe0f"
+INVALID = "The given data was invalid."
+# Pronto's answer to an emoji form it doesn't accept (a validation error)
+INVALID_STATUS = 422
+
+
+def variants(emoji):
+    """The emoji as given, then with the U+FE0F variation selector toggled."""
+    base = emoji.strip("\n")
+    other = base[:-1] if base.endswith(VARIATION_SELECTOR) else base + VARIATION_SELECTOR
+    return [emoji, other] if other != emoji else [emoji]
+
+
+class ReactionService:
+    """Sends reactions, remembering which codepoint form of each emoji Pronto accepts.
+
+    Some emoji are only accepted with a trailing U+FE0F and some only without.
+    The first send of an emoji may need a second try; the form that worked is
+    stored in the StateStore, so every later send (and restart) goes straight
+    to it. react() sends in the background at the lowest priority and only
+    counts failures, so acknowledgements never hold up a command.
+    """
+
+    def __init__(self, state, access_token):
+        self.state = state
+        self.access_token = access_token
+        self.forms = state.load_emoji_forms()
+        self._tasks = set()
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+
+    async def send(self, emoji, msg_id):
+        """Send a reaction and wait for it. Returns False if no form was accepted.
+
+        Any other failure raises BackendError, and the form isn't remembered.
+        """
+        known = self.forms.get(emoji)
+        candidates = [known] if known is not None else variants(emoji)
+        with priority(LOW):
+            for attempt, form in enumerate(candidates):
+                if attempt:
+                    self.retries += 1
+                try:
+                    response = await aio.send_reaction(self.access_token, form, msg_id)
+                except BackendError as e:
+                    if e.status == INVALID_STATUS:
+                        continue
+                    # Auth, server or transport trouble says nothing about the form
+                    raise
+                if response.get("message") == INVALID:
+                    continue
+                self.sent += 1
+                if known is None:
+                    self.forms[emoji] = form
+                    self.state.save_emoji_form(emoji, form)
+                return True
+        if known is not None:
+            # The remembered form stopped working; learn it again next time
+            del self.forms[emoji]
+            self.state.delete_emoji_form(emoji)
+        logger.error(f"Reaction {emoji!r} rejected on message {msg_id}")
+        return False
+
+    def react(self, emoji, msg_id):
+        """Send a reaction in the background."""
+        task = asyncio.get_running_loop().create_task(self._react(emoji, msg_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _react(self, emoji, msg_id):
+        try:
+            if not await self.send(emoji, msg_id):
+                self.failed += 1
+        except BackendError as e:
+            # Includes reactions shed by the scheduler under load
+            self.failed += 1
+            logger.warning(f"Reaction {emoji!r} on {msg_id} not sent: {e}")
+
+    async def close(self, timeout=5.0):
+        """Give background reactions a moment to finish."""
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=timeout)
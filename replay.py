@@ -0,0 +1,175 @@
+# Replay harness: feeds a recording made with BANBOT_RECORD back through the bot and
+# reports throughput and per-stage latency.
+#
+# Usage: python replay.py frames.log.gz [--speed 1|N|max] [--owner USER_ID] [--latency 0.02]
+#
+# Frames go through the same BanBot.handle_frame path as live traffic: decode, dispatch
+# onto the event pool and MainBot.process_message / check_for_banned. API calls are
+# answered by an in-process fakepronto.py, so nothing reaches the real Pronto.
+# --owner should be the bubble owner's user ID in the recording for owner commands to run.
+#
+# Stages reported:
+#   decode    FrameDecoder.decode on the websocket reader
+#   frame     the whole of handle_frame, including the decode and the enqueue
+#   queued    time an event waited on the event pool before a worker took it
+#   <handler> time each handler ran once a worker took it
+
+# Standard library imports
+import os
+import re
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+from collections import defaultdict
+# Local imports
+from fakepronto import add_server_arguments, server_from_arguments
+from framerecorder import read_frames
+from logpipeline import setup_logging
+
+logger = logging.getLogger(__name__)
+
+_BUBBLE_CHANNEL_RE = re.compile(r"private-bubble\.(\d+)\.")
+
+
+def recorded_bubbles(path):
+    """Bubble IDs that frames in the recording were sent to."""
+    bubbles = []
+    for _, raw in read_frames(path):
+        for bubble_id in _BUBBLE_CHANNEL_RE.findall(raw):
+            if int(bubble_id) not in bubbles:
+                bubbles.append(int(bubble_id))
+    return bubbles
+
+
+class StubWebsocket:
+    """Stands in for the Pusher connection; pongs and resubscribes go nowhere."""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, data):
+        self.sent += 1
+
+
+class TimedDecoder:
+    """Wraps a FrameDecoder and records how long each decode takes."""
+
+    def __init__(self, decoder, samples):
+        self.decoder = decoder
+        self.samples = samples
+
+    def decode(self, raw):
+        started = time.perf_counter()
+        try:
+            return self.decoder.decode(raw)
+        finally:
+            self.samples.append(time.perf_counter() - started)
+
+
+async def replay(bot, path, speed):
+    """Feed every recorded frame to the bot. Returns (frames, seconds) once all events are handled."""
+    stages = bot.stages
+    websocket = StubWebsocket()
+    frames = 0
+    started = time.monotonic()
+    for offset, raw in read_frames(path):
+        if speed is not None:
+            delay = started + offset / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        frame_started = time.perf_counter()
+        if raw == "ping":
+            await websocket.send("pong")
+        else:
+            await bot.handle_frame(websocket, raw, "replay.1")
+        stages["frame"].append(time.perf_counter() - frame_started)
+        frames += 1
+    await bot.event_pool.join()
+    return frames, time.monotonic() - started
+
+
+def summary(samples):
+    """Percentiles in milliseconds, finely enough for decodes far below one."""
+    if not samples:
+        return "no samples"
+    ordered = sorted(samples)
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+    return (f"n={len(ordered)} p50={at(0.5):.3f}ms p90={at(0.9):.3f}ms "
+            f"p99={at(0.99):.3f}ms max={ordered[-1] * 1000:.3f}ms")
+
+
+def report(bot, frames, elapsed):
+    pool = bot.event_pool
+    lines = [
+        f"frames: {frames} in {elapsed:.2f}s ({frames / elapsed if elapsed else 0:.0f} frames/s); "
+        f"decoded {bot.decoder.decoder.decoded}, skipped {bot.decoder.decoder.skipped}",
+        f"events handled: {pool.processed} ({pool.processed / elapsed if elapsed else 0:.0f}/s), "
+        f"dropped {pool.dropped}, errors {pool.errors}",
+    ]
+    width = max(len(name) for name in bot.stages)
+    for name, samples in bot.stages.items():
+        lines.append(f"{name.ljust(width)}  {summary(samples)}")
+    return "\n".join(lines)
+
+
+async def main(args):
+    server = server_from_arguments(args)
+    await server.start(args.host, args.http_port, args.ws_port)
+    # main.py and pronto.py read these when imported
+    os.environ.update({
+        "PRONTO_API_BASE_URL": f"http://{args.host}:{args.http_port}/",
+        "PRONTO_FILES_URL": f"http://{args.host}:{args.http_port}/api/files",
+        "PRONTO_PUSHER_URI": f"ws://{args.host}:{args.ws_port}/app/fake",
+        "BANBOT_STATE_DB": os.path.join(tempfile.mkdtemp(prefix="replay-"), "state.db"),
+        "accesstoken": "replay",
+    })
+    os.environ.pop("BANBOT_RECORD", None)
+    from main import BanBot
+    from mainbot import admin_bubble_id
+
+    bubbles = args.bubble or recorded_bubbles(args.log)
+    if not bubbles:
+        sys.exit(f"No bubble channels found in {args.log}; pass --bubble")
+    bot = BanBot({bubble_id: admin_bubble_id for bubble_id in bubbles})
+    bot.bubble_owners = await bot.bubble_cache.owners(bot.main_bot.bubble_id)
+    bot.stages = defaultdict(list, decode=[], frame=[], queued=[])
+    bot.decoder = TimedDecoder(bot.decoder, bot.stages["decode"])
+
+    def on_timing(handler, waited, ran):
+        bot.stages["queued"].append(waited)
+        bot.stages[handler].append(ran)
+        bot.observe_event(handler, waited, ran)
+    bot.event_pool.on_timing = on_timing
+    bot.event_pool.start()
+    logger.info(f"Replaying {args.log} into bubble(s) {bubbles} at "
+                f"{'max speed' if args.speed is None else f'{args.speed}x'}")
+    try:
+        frames, elapsed = await replay(bot, args.log, args.speed)
+        print(report(bot, frames, elapsed))
+    finally:
+        await bot.event_pool.stop()
+        await bot.shared.close()
+        await server.stop()
+
+
+def speed(value):
+    return None if value == "max" else float(value)
+
+
+if __name__ == "__main__":
+    # The bot's own queued pipeline, so replays measure the same logging cost as production
+    setup_logging(logging.WARNING, json_format=False)
+    parser = argparse.ArgumentParser(description="Replay a recorded websocket log through the bot")
+    parser.add_argument("log", help="gzip frame log written with BANBOT_RECORD")
+    parser.add_argument("--speed", type=speed, default=None,
+                        help="1 for real time, N for N times faster, max (default) for as fast as possible")
+    parser.add_argument("--bubble", type=int, action="append",
+                        help="bubble to moderate (default: every bubble seen in the log)")
+    add_server_arguments(parser)
+    # Out of the way of a fakepronto.py / loadgen.py run on the default ports
+    parser.set_defaults(http_port=8790, ws_port=8791)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,230 @@
+# Standard library imports
+import os
+import time
+import asyncio
+import signal
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+from dataclasses import dataclass, field
+# Local imports
+from statestore import StateStore
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 10.0
+
+
+def rebalance(bubbles, current):
+    """Spread bubbles over workers, moving as few as possible.
+
+    `current` maps worker ID -> the bubbles it runs now ({bubble: admin bubble}).
+    Bubbles stay where they are unless their worker is gone or the load is
+    uneven by more than one bubble; orphans go to the least loaded worker.
+    """
+    plan = {worker_id: {b: bubbles[b] for b in assigned if b in bubbles} for worker_id, assigned in current.items()}
+    if not plan:
+        return plan
+    placed = {b for assigned in plan.values() for b in assigned}
+    for bubble in sorted(set(bubbles) - placed, key=int):
+        worker_id = min(plan, key=lambda w: len(plan[w]))
+        plan[worker_id][bubble] = bubbles[bubble]
+    while True:
+        busiest = max(plan, key=lambda w: len(plan[w]))
+        idlest = min(plan, key=lambda w: len(plan[w]))
+        if len(plan[busiest]) - len(plan[idlest]) <= 1:
+            return plan
+        bubble = max(plan[busiest], key=int)
+        plan[idlest][bubble] = plan[busiest].pop(bubble)
+
+
+async def _run_worker(conn, run):
+    """Run `run(bubbles)` for the current assignment, restarting it when the coordinator reassigns."""
+    loop = asyncio.get_running_loop()
+    inbox = asyncio.Queue()
+
+    def on_readable():
+        try:
+            inbox.put_nowait(conn.recv())
+        except EOFError:
+            # The coordinator is gone
+            loop.remove_reader(conn.fileno())
+            inbox.put_nowait(("stop", None))
+    loop.add_reader(conn.fileno(), on_readable)
+    # A signal stops the worker like the coordinator's "stop", so the bot shuts down cleanly
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, inbox.put_nowait, ("stop", None))
+
+    async def heartbeat():
+        while True:
+            conn.send(("alive", None))
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+    beat = asyncio.create_task(heartbeat())
+
+    bubbles = None
+    task = None
+    try:
+        while True:
+            receive = asyncio.ensure_future(inbox.get())
+            waiting = {receive} if task is None else {receive, task}
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if task in done:
+                # The bot gave up reconnecting; exit so the coordinator restarts this worker
+                receive.cancel()
+                return 1
+            kind, payload = receive.result()
+            if kind == "stop":
+                return 0
+            if kind == "assign" and payload != bubbles:
+                if task is not None:
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    task = None
+                bubbles = payload
+                logger.info(f"Assigned bubbles {sorted(bubbles, key=int)}")
+                if bubbles:
+                    task = asyncio.create_task(run(bubbles))
+    finally:
+        beat.cancel()
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+def worker_main(worker_id, conn, run):
+    """Entry point of a shard worker process."""
+    multiprocessing.current_process().name = f"shard-{worker_id}"
+    try:
+        code = asyncio.run(_run_worker(conn, run))
+    except KeyboardInterrupt:
+        code = 0
+    raise SystemExit(code)
+
+
+@dataclass
+class Shard:
+    process: object
+    conn: object
+    bubbles: dict = field(default_factory=dict)
+    last_seen: float = field(default_factory=time.monotonic)
+
+
+class Coordinator:
+    """Runs the bot as several worker processes, each moderating a share of the bubbles.
+
+    Every worker has its own event loop and websocket connection, so busy
+    bubbles spread over the cores. Workers share bans, inviter counts and polls
+    through state.db. The coordinator talks to workers over a multiprocessing
+    Pipe: it sends ("assign", {bubble: admin bubble}) and ("stop", None), and
+    each worker sends a heartbeat every HEARTBEAT_INTERVAL seconds. When a
+    worker dies or stops sending heartbeats its bubbles move to the others at
+    once, and a replacement is started `restart_delay` seconds later.
+    """
+
+    def __init__(self, bubbles, run, workers=None, db_path=None, restart_delay=5.0, heartbeat_timeout=60.0):
+        self.bubbles = {str(bubble): admin for bubble, admin in bubbles.items()}
+        self.run = run
+        self.worker_count = max(1, min(workers or os.cpu_count() or 1, len(self.bubbles)))
+        self.db_path = db_path or os.getenv("BANBOT_STATE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "state.db"))
+        self.restart_delay = restart_delay
+        self.heartbeat_timeout = heartbeat_timeout
+        # spawn rather than fork: pycurl handles and event loops must not be inherited
+        self.ctx = multiprocessing.get_context("spawn")
+        self.shards = {}
+        self.restarts = 0
+
+    def start_worker(self, worker_id):
+        parent, child = self.ctx.Pipe()
+        process = self.ctx.Process(target=worker_main, args=(worker_id, child, self.run),
+                                   name=f"shard-{worker_id}", daemon=True)
+        process.start()
+        child.close()
+        self.shards[worker_id] = Shard(process, parent)
+        logger.info(f"Started shard {worker_id} (pid {process.pid})")
+
+    def assign(self):
+        """Rebalance bubbles over the live workers and tell the ones whose share changed."""
+        plan = rebalance(self.bubbles, {worker_id: shard.bubbles for worker_id, shard in self.shards.items()})
+        for worker_id, bubbles in plan.items():
+            shard = self.shards[worker_id]
+            if bubbles == shard.bubbles:
+                continue
+            shard.bubbles = bubbles
+            try:
+                shard.conn.send(("assign", bubbles))
+            except (BrokenPipeError, OSError):
+                continue
+            logger.info(f"Shard {worker_id} now moderates {sorted(bubbles, key=int)}")
+
+    def worker_died(self, worker_id):
+        shard = self.shards.pop(worker_id, None)
+        if shard is None:
+            return
+        shard.process.join(1.0)
+        shard.conn.close()
+        logger.warning(f"Shard {worker_id} exited (code {shard.process.exitcode}); moving "
+                       f"{len(shard.bubbles)} bubble(s) to the remaining workers")
+        self.restarts += 1
+        self.assign()
+
+    def run_forever(self):
+        # Import the old state files once here, not racily in every worker
+        state = StateStore(self.db_path)
+        state.migrate_files(os.path.dirname(self.db_path))
+        state.close()
+
+        for worker_id in range(self.worker_count):
+            self.start_worker(worker_id)
+        self.assign()
+
+        restart_at = {}
+        # SIGTERM stops the workers through stop() below, like Ctrl-C does
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            while True:
+                conns = {shard.conn: worker_id for worker_id, shard in self.shards.items()}
+                sentinels = {shard.process.sentinel: worker_id for worker_id, shard in self.shards.items()}
+                dead = set()
+                for ready in wait(list(conns) + list(sentinels), timeout=1.0):
+                    if ready in sentinels:
+                        dead.add(sentinels[ready])
+                        continue
+                    worker_id = conns[ready]
+                    try:
+                        kind, _ = ready.recv()
+                    except (EOFError, OSError):
+                        dead.add(worker_id)
+                        continue
+                    if kind == "alive":
+                        self.shards[worker_id].last_seen = time.monotonic()
+
+                now = time.monotonic()
+                for worker_id, shard in self.shards.items():
+                    if worker_id not in dead and now - shard.last_seen > self.heartbeat_timeout:
+                        logger.warning(f"Shard {worker_id} missed its heartbeat; killing it")
+                        shard.process.kill()
+                        dead.add(worker_id)
+                for worker_id in dead:
+                    self.worker_died(worker_id)
+                    restart_at[worker_id] = now + self.restart_delay
+
+                for worker_id, when in list(restart_at.items()):
+                    if when <= now:
+                        del restart_at[worker_id]
+                        self.start_worker(worker_id)
+                        self.assign()
+        finally:
+            self.stop()
+
+    def stop(self, timeout=10.0):
+        for shard in self.shards.values():
+            try:
+                shard.conn.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+        deadline = time.monotonic() + timeout
+        for shard in self.shards.values():
+            shard.process.join(max(0.0, deadline - time.monotonic()))
+            if shard.process.is_alive():
+                shard.process.terminate()
+        self.shards = {}
@@ -0,0 +1,253 @@
+# Standard library imports
+import os
+import json
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS bans (
+    user_id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS inviters (
+    user_id INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS polls (
+    poll_id INTEGER PRIMARY KEY,
+    message_id INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    poll_type INTEGER NOT NULL,
+    bubble_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS polls_message_id ON polls (message_id);
+CREATE TABLE IF NOT EXISTS emoji_forms (
+    emoji TEXT PRIMARY KEY,
+    accepted TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    fullname TEXT,
+    data TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+class StateStore:
+    """SQLite (WAL mode) persistence for bans, inviter counts, polls, emoji forms and the user directory.
+
+    Every operation is an indexed point query or a single-row write; WAL with
+    synchronous=FULL makes each write one fsync'd append to the log, and SQLite
+    checkpoints the log back into the database on its own.
+
+    Several worker processes may open the same database (see shards.py), so
+    writes that read-modify-write take the write lock up front (BEGIN IMMEDIATE)
+    and inviter counts are stored as increments rather than totals.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path, isolation_level=None, timeout=10)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=FULL")
+        self.db.executescript(SCHEMA)
+        self._upgrade_schema()
+
+    def close(self):
+        self.db.close()
+
+    def data_version(self):
+        """Changes whenever another connection commits to the database."""
+        return self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _upgrade_schema(self):
+        # Polls gained a bubble_id when the bot started moderating several bubbles;
+        # older rows keep NULL, which means "any bubble".
+        columns = {row["name"] for row in self.db.execute("PRAGMA table_info(polls)")}
+        if "bubble_id" not in columns:
+            self.db.execute("ALTER TABLE polls ADD COLUMN bubble_id INTEGER")
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row is not None else default
+
+    def set_meta(self, key, value):
+        self.db.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, str(value))
+        )
+
+    # Migration
+    def migrate_files(self, script_dir):
+        """Import bans.txt, inviters.json and pollinfo.json once."""
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'files_migrated'").fetchone()
+        if row is not None:
+            return
+
+        bans = set()
+        try:
+            with open(os.path.join(script_dir, "bans.txt"), "r", encoding="utf-8") as f:
+                bans = {int(line) for line in f if line.strip()}
+        except FileNotFoundError:
+            pass
+
+        inviters = self._load_json(os.path.join(script_dir, "inviters.json"))
+        polls = self._load_json(os.path.join(script_dir, "pollinfo.json"))
+
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            # Another process may have migrated while the files were being read
+            if self.db.execute("SELECT value FROM meta WHERE key = 'files_migrated'").fetchone() is not None:
+                return
+            self.db.executemany("INSERT OR IGNORE INTO bans (user_id) VALUES (?)", [(b,) for b in bans])
+            self.db.executemany(
+                "INSERT OR REPLACE INTO inviters (user_id, count) VALUES (?, ?)",
+                [(row["user_id"], row["count"]) for row in inviters]
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO polls (poll_id, message_id, message, poll_type) VALUES (?, ?, ?, ?)",
+                [(row["poll_id"], row["message_id"], row["message"], row["poll_type"]) for row in polls]
+            )
+            self.db.execute("INSERT INTO meta (key, value) VALUES ('files_migrated', '1')")
+        logger.info(f"Migrated {len(bans)} bans, {len(inviters)} inviters and {len(polls)} polls into {self.db_path}")
+
+    @staticmethod
+    def _load_json(file_path):
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.error(e)
+            return []
+
+    # Bans
+    def load_bans(self):
+        return {row["user_id"] for row in self.db.execute("SELECT user_id FROM bans")}
+
+    def add_ban(self, user_id):
+        self.db.execute("INSERT OR IGNORE INTO bans (user_id) VALUES (?)", (user_id,))
+
+    def remove_ban(self, user_id):
+        self.db.execute("DELETE FROM bans WHERE user_id = ?", (user_id,))
+
+    # Inviters
+    def load_inviters(self):
+        return {row["user_id"]: row["count"] for row in self.db.execute("SELECT user_id, count FROM inviters")}
+
+    def add_inviters(self, increments):
+        """Add a batch of {user_id: increment} in one transaction and return the new totals."""
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.executemany(
+                "INSERT INTO inviters (user_id, count) VALUES (?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET count = count + excluded.count",
+                list(increments.items())
+            )
+            placeholders = ", ".join("?" * len(increments))
+            rows = self.db.execute(
+                f"SELECT user_id, count FROM inviters WHERE user_id IN ({placeholders})",
+                list(increments)
+            ).fetchall()
+        return {row["user_id"]: row["count"] for row in rows}
+
+    # Polls
+    def next_poll_id(self):
+        """Reserve a poll ID. IDs are handed out from a counter in meta, so two
+        processes creating polls at once never get the same one."""
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            row = self.db.execute(
+                "SELECT MAX(last) AS last FROM ("
+                "SELECT MAX(poll_id) AS last FROM polls "
+                "UNION ALL SELECT CAST(value AS INTEGER) FROM meta WHERE key = 'poll_seq')"
+            ).fetchone()
+            poll_id = (row["last"] or 0) + 1
+            self.db.execute(
+                "INSERT INTO meta (key, value) VALUES ('poll_seq', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (str(poll_id),)
+            )
+        return poll_id
+
+    def add_poll(self, poll_id, bubble_id, message, message_id, poll_type):
+        self.db.execute(
+            "INSERT INTO polls (poll_id, bubble_id, message_id, message, poll_type) VALUES (?, ?, ?, ?, ?)",
+            (poll_id, bubble_id, message_id, message, poll_type)
+        )
+
+    def poll_message_ids(self):
+        return {row["message_id"] for row in self.db.execute("SELECT message_id FROM polls")}
+
+    def get_poll(self, poll_id, bubble_id=None):
+        """Return the poll as a dict (same keys as pollinfo.json), or None.
+
+        With bubble_id, polls created in other bubbles are not returned.
+        """
+        row = self.db.execute(
+            "SELECT poll_id, message_id, message, poll_type FROM polls "
+            "WHERE poll_id = ? AND (? IS NULL OR bubble_id IS NULL OR bubble_id = ?)",
+            (poll_id, bubble_id, bubble_id)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    # Emoji forms
+    def load_emoji_forms(self):
+        return {row["emoji"]: row["accepted"] for row in self.db.execute("SELECT emoji, accepted FROM emoji_forms")}
+
+    def save_emoji_form(self, emoji, accepted):
+        self.db.execute(
+            "INSERT INTO emoji_forms (emoji, accepted) VALUES (?, ?) "
+            "ON CONFLICT (emoji) DO UPDATE SET accepted = excluded.accepted",
+            (emoji, accepted)
+        )
+
+    def delete_emoji_form(self, emoji):
+        self.db.execute("DELETE FROM emoji_forms WHERE emoji = ?", (emoji,))
+
+    # Users
+    def upsert_users(self, users, synced_at):
+        """Store a batch of user objects (as returned by the users API) in one transaction."""
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.executemany(
+                "INSERT INTO users (user_id, fullname, data, synced_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET fullname = excluded.fullname, "
+                "data = excluded.data, synced_at = excluded.synced_at",
+                [(user["id"], user_fullname(user), json.dumps(user), synced_at) for user in users]
+            )
+
+    def get_user(self, user_id):
+        """Return (user, synced_at) for a cached user, or None."""
+        row = self.db.execute("SELECT data, synced_at FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return (json.loads(row["data"]), row["synced_at"]) if row is not None else None
+
+    def iter_users(self, batch_size=500):
+        """Yield every cached user, reading `batch_size` rows at a time."""
+        cursor = self.db.execute("SELECT data FROM users ORDER BY user_id")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield json.loads(row["data"])
+
+    def user_count(self):
+        return self.db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def delete_users_before(self, synced_at):
+        """Drop users a full sync didn't see (they left the org)."""
+        return self.db.execute("DELETE FROM users WHERE synced_at < ?", (synced_at,)).rowcount
+
+
+def user_fullname(user):
+    return user.get("fullname") or f"{user.get('firstname', '')} {user.get('lastname', '')}".strip()
@@ -0,0 +1,63 @@
+# Local imports
+from metrics import HistogramFamily
+
+# Histograms shown by !stats: metric name -> label in the report
+LATENCIES = [
+    ("pronto_api_request_seconds", "API calls"),
+    ("banbot_frame_seconds", "Websocket frames"),
+    ("banbot_event_queue_wait_seconds", "Event queue wait"),
+    ("banbot_event_handler_seconds", "Event handlers"),
+    ("banbot_command_seconds", "Commands"),
+]
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f}ms" if seconds is not None else "-"
+
+
+def _rate(part, whole):
+    return f"{part / whole:.0%}" if whole else "-"
+
+
+def stats_report(registry):
+    """Human-readable snapshot of the metrics registry for the admin bubble."""
+    value = registry.value
+    lines = ["Bot stats", "Latency (p50 / p90 / p99):"]
+    for name, title in LATENCIES:
+        family = registry.metrics.get(name)
+        if not isinstance(family, HistogramFamily):
+            continue
+        total = family.total()
+        if total.count:
+            lines.append(f"  {title}: {_ms(total.quantile(0.5))} / {_ms(total.quantile(0.9))} / "
+                         f"{_ms(total.quantile(0.99))} (n={total.count})")
+
+    lines.append(f"Queues: {value('banbot_event_queue_depth')} events waiting for a worker, "
+                 f"{value('pronto_api_waiting')} API requests waiting for a token")
+
+    bubble_hits, bubble_misses = value("banbot_bubble_cache_hits_total"), value("banbot_bubble_cache_misses_total")
+    poll_hits, poll_misses = value("banbot_poll_tally_hits_total"), value("banbot_poll_tally_misses_total")
+    lines.append(f"Cache hit rates: bubble info {_rate(bubble_hits, bubble_hits + bubble_misses)}, "
+                 f"poll tallies {_rate(poll_hits, poll_hits + poll_misses)}")
+
+    # Error rate per endpoint from the status label: transport errors and 4xx/5xx
+    api = registry.metrics.get("pronto_api_request_seconds")
+    calls, failures = {}, {}
+    if isinstance(api, HistogramFamily):
+        for (endpoint, status), histogram in api.children.items():
+            calls[endpoint] = calls.get(endpoint, 0) + histogram.count
+            if status == "error" or int(status) >= 400:
+                failures[endpoint] = failures.get(endpoint, 0) + histogram.count
+    total_calls, total_failures = sum(calls.values()), sum(failures.values())
+    lines.append(f"API errors: {total_failures} of {total_calls} calls ({_rate(total_failures, total_calls)}); "
+                 f"429s: {value('pronto_api_throttled_total')}, shed: {value('pronto_api_shed_total')}")
+    for endpoint in sorted(failures, key=lambda endpoint: failures[endpoint] / calls[endpoint], reverse=True)[:3]:
+        lines.append(f"  {endpoint}: {failures[endpoint]} of {calls[endpoint]} ({_rate(failures[endpoint], calls[endpoint])})")
+
+    lines.append(f"Events: {value('banbot_events_submitted_total')} queued, {value('banbot_events_dropped_total')} "
+                 f"dropped, {value('banbot_event_errors_total')} failed; reactions failed: "
+                 f"{value('banbot_reactions_failed_total')}; kick/add batches failed: {value('banbot_moderation_errors_total')}")
+    lines.append(f"Connection: {value('banbot_connects_total')} connects, {value('banbot_disconnects_total')} drops, "
+                 f"{value('banbot_health_timeouts_total')} health timeouts, "
+                 f"pong {_ms(value('banbot_pong_latency_seconds', None))}")
+    return "\n".join(lines)
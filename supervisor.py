@@ -0,0 +1,159 @@
+# Standard library imports
+import json
+import time
+import random
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Backoff:
+    """Exponential backoff with full jitter: the nth retry waits uniform(0, min(cap, base * 2**n))."""
+
+    def __init__(self, base=0.25, cap=30.0):
+        self.base = base
+        self.cap = cap
+        self.attempt = 0
+
+    def next_delay(self):
+        delay = random.uniform(0, min(self.cap, self.base * 2 ** self.attempt))
+        self.attempt += 1
+        return delay
+
+    def reset(self):
+        self.attempt = 0
+
+
+class ConnectionMetrics:
+    """Reconnect and health counters for the websocket connection."""
+
+    def __init__(self):
+        self.connects = 0
+        self.disconnects = 0
+        self.failed_attempts = 0
+        self.health_timeouts = 0
+        # Time from losing the connection to being subscribed again
+        self.last_resume = None
+        self.max_resume = 0.0
+        self.total_resume = 0.0
+        self.resumes = 0
+        # pusher:ping -> pusher:pong round trip (seconds)
+        self.last_pong_latency = None
+        self.avg_pong_latency = None
+
+    def record_resume(self, seconds):
+        self.last_resume = seconds
+        self.max_resume = max(self.max_resume, seconds)
+        self.total_resume += seconds
+        self.resumes += 1
+
+    def record_pong(self, seconds):
+        self.last_pong_latency = seconds
+        if self.avg_pong_latency is None:
+            self.avg_pong_latency = seconds
+        else:
+            self.avg_pong_latency += 0.2 * (seconds - self.avg_pong_latency)
+
+    @property
+    def mean_resume(self):
+        return self.total_resume / self.resumes if self.resumes else None
+
+
+class HealthCheck:
+    """Sends pusher:ping every `interval` seconds and expects a pusher:pong within `timeout`.
+
+    The listener calls pong() when the reply arrives. A missing pong closes the
+    websocket, so the supervisor reconnects instead of waiting for TCP to notice.
+    """
+
+    def __init__(self, metrics, interval=15.0, timeout=5.0):
+        self.metrics = metrics
+        self.interval = interval
+        self.timeout = timeout
+        self._waiter = None
+
+    def pong(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(time.monotonic())
+
+    async def run(self, websocket):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            self._waiter = loop.create_future()
+            sent_at = time.monotonic()
+            await websocket.send(json.dumps({"event": "pusher:ping", "data": {}}))
+            try:
+                received_at = await asyncio.wait_for(self._waiter, self.timeout)
+            except asyncio.TimeoutError:
+                self.metrics.health_timeouts += 1
+                logger.warning(f"No pusher:pong within {self.timeout}s; dropping the connection")
+                await websocket.close()
+                return
+            finally:
+                self._waiter = None
+            self.metrics.record_pong(received_at - sent_at)
+
+
+class ConnectionSupervisor:
+    """Keeps the websocket connection up.
+
+    `connect` is a coroutine function that connects, subscribes, calls
+    supervisor.connected() once subscribed, and then listens until the
+    connection drops (returning or raising). The supervisor reconnects with
+    jittered exponential backoff; the first retry after a healthy connection
+    comes within `backoff.base` seconds. A connection that stays up for
+    `stable_after` seconds resets the backoff. With max_failures set, it gives
+    up after that many consecutive attempts that never got subscribed.
+    """
+
+    def __init__(self, connect, backoff=None, metrics=None, stable_after=10.0, max_failures=None):
+        self.connect = connect
+        self.backoff = backoff or Backoff()
+        self.metrics = metrics or ConnectionMetrics()
+        self.stable_after = stable_after
+        self.max_failures = max_failures
+        self._down_since = None
+        self._connected_at = None
+
+    def connected(self):
+        """Called by `connect` once every channel is subscribed."""
+        now = time.monotonic()
+        self._connected_at = now
+        self.metrics.connects += 1
+        if self._down_since is not None:
+            resume = now - self._down_since
+            self.metrics.record_resume(resume)
+            logger.info(f"Moderation resumed {resume:.2f}s after the connection dropped "
+                        f"(mean {self.metrics.mean_resume:.2f}s over {self.metrics.resumes} reconnects)")
+        self._down_since = None
+
+    async def run(self):
+        failures = 0
+        while True:
+            self._connected_at = None
+            try:
+                await self.connect()
+                logger.warning("WebSocket connection closed")
+            except Exception as e:
+                logger.error(f"WebSocket error: {e}")
+
+            now = time.monotonic()
+            if self._connected_at is not None:
+                self.metrics.disconnects += 1
+                failures = 0
+                if now - self._connected_at >= self.stable_after:
+                    self.backoff.reset()
+            else:
+                self.metrics.failed_attempts += 1
+                failures += 1
+                if self.max_failures is not None and failures >= self.max_failures:
+                    logger.error(f"Giving up after {failures} failed connection attempts")
+                    return
+            if self._down_since is None:
+                self._down_since = now
+
+            delay = self.backoff.next_delay()
+            logger.info(f"Reconnecting in {delay:.2f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,62 @@
+# Third party imports
+import pytest
+# Local imports
+from banstore import BanStore
+from statestore import StateStore
+
+
+@pytest.fixture
+def stores(tmp_path):
+    path = str(tmp_path / "state.db")
+    ours, theirs = StateStore(path), StateStore(path)
+    yield ours, theirs
+    ours.close()
+    theirs.close()
+
+
+def test_add_and_discard_write_through(stores):
+    state, _ = stores
+    bans = BanStore(state)
+    assert bans.add(1)
+    assert not bans.add(1)
+    assert state.load_bans() == {1}
+    assert bans.discard(1)
+    assert not bans.discard(1)
+    assert state.load_bans() == set()
+
+
+def test_loads_existing_bans(stores):
+    state, _ = stores
+    state.add_ban(3)
+    state.add_ban(4)
+    bans = BanStore(state)
+    assert 3 in bans and 4 in bans
+    assert sorted(bans) == [3, 4]
+    assert len(bans) == 2
+
+
+def test_picks_up_bans_from_another_connection(stores):
+    state, other = stores
+    bans = BanStore(state, refresh_interval=0)
+    other.add_ban(9)
+    assert 9 in bans
+    other.remove_ban(9)
+    assert 9 not in bans
+
+
+def test_refresh_waits_for_the_interval_unless_forced(stores):
+    state, other = stores
+    bans = BanStore(state, refresh_interval=60)
+    other.add_ban(9)
+    assert 9 not in bans
+    bans.refresh(force=True)
+    assert 9 in bans
+
+
+def test_own_writes_do_not_trigger_a_reload(stores):
+    state, _ = stores
+    bans = BanStore(state, refresh_interval=0)
+    bans.add(4)
+    reloaded = bans.bans
+    bans.refresh()
+    assert bans.bans is reloaded
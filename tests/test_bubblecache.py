@@ -0,0 +1,93 @@
+# Standard library imports
+import asyncio
+# Third party imports
+import pytest
+# Local imports
+import bubblecache
+from bubblecache import BubbleInfoCache
+
+
+def info(bubble_id, owners=(1,), channelcode="abc"):
+    return {"bubble": {"id": bubble_id, "channelcode": channelcode,
+                       "memberships": [{"user_id": user_id, "role": "owner"} for user_id in owners]
+                       + [{"user_id": 99, "role": "member"}]}}
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Bubble IDs passed to bubble.info; each call yields to the loop before answering."""
+    calls = []
+
+    async def get_bubble_info(access_token, bubble_id):
+        calls.append(bubble_id)
+        await asyncio.sleep(0)
+        return info(bubble_id)
+    monkeypatch.setattr(bubblecache.aio, "get_bubble_info", get_bubble_info, raising=False)
+    return calls
+
+
+def test_hits_within_the_ttl(fetches):
+    async def run():
+        cache = BubbleInfoCache("token")
+        await cache.get(1)
+        await cache.get("1")
+        assert await cache.owners(1) == [1]
+        assert await cache.channelcode(1) == "abc"
+        return cache
+    cache = asyncio.run(run())
+    assert fetches == [1]
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_refetches_when_expired_refreshed_or_invalidated(fetches):
+    async def run():
+        cache = BubbleInfoCache("token", ttl=0)
+        await cache.get(1)
+        await cache.get(1)
+        cache.ttl = 300
+        await cache.get(1, refresh=True)
+        cache.invalidate(1)
+        await cache.get(1)
+    asyncio.run(run())
+    assert fetches == [1, 1, 1, 1]
+
+
+def test_concurrent_misses_share_one_request(fetches):
+    async def run():
+        cache = BubbleInfoCache("token")
+        return await asyncio.gather(*(cache.get(1) for _ in range(5)))
+    results = asyncio.run(run())
+    assert fetches == [1]
+    assert all(result is results[0] for result in results)
+
+
+def test_complete_change_patches_the_entry(fetches):
+    async def run():
+        cache = BubbleInfoCache("token")
+        await cache.get(1)
+        cache.apply_change(info(1, owners=(2, 3), channelcode="xyz"))
+        assert await cache.owners(1) == [2, 3]
+        assert await cache.channelcode(1) == "xyz"
+    asyncio.run(run())
+    assert fetches == [1]
+
+
+def test_partial_change_expires_the_entry(fetches):
+    async def run():
+        cache = BubbleInfoCache("token")
+        await cache.get(1)
+        cache.apply_change({"bubble": {"id": 1, "title": "Renamed"}})
+        await cache.get(1)
+    asyncio.run(run())
+    assert fetches == [1, 1]
+
+
+def test_complete_change_fills_an_empty_cache(fetches):
+    async def run():
+        cache = BubbleInfoCache("token")
+        cache.apply_change(info(5, owners=(7,)))
+        cache.apply_change({"bubble": {"id": 6, "title": "Partial"}})
+        assert await cache.owners(5) == [7]
+        await cache.get(6)
+    asyncio.run(run())
+    assert fetches == [6]
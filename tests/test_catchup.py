@@ -0,0 +1,68 @@
+# Standard library imports
+import asyncio
+import logging
+# Local imports
+import catchup
+from catchup import MessageTracker, fetch_since
+
+
+def test_claim_drops_repeats():
+    tracker = MessageTracker()
+    assert tracker.claim(1, 10)
+    assert tracker.claim(1, "11")
+    assert not tracker.claim(1, "10")
+    # Each bubble is tracked separately
+    assert tracker.claim(2, 10)
+    assert tracker.last(1) == 11
+    assert tracker.last(3) is None
+
+
+def test_claim_passes_ids_it_cannot_parse():
+    tracker = MessageTracker()
+    assert tracker.claim(1, None)
+    assert tracker.claim(1, None)
+    assert tracker.last(1) is None
+
+
+def test_claim_forgets_ids_outside_the_window():
+    tracker = MessageTracker(window=2)
+    for message_id in (1, 2, 3):
+        tracker.claim(1, message_id)
+    assert tracker.claim(1, 1)
+    assert not tracker.claim(1, 3)
+    assert tracker.last(1) == 3
+
+
+def fake_history(monkeypatch, newest, page_size=50):
+    """Serve bubble.history pages of messages 1..newest, newest first."""
+    calls = []
+
+    async def get_bubble_messages(access_token, bubble_id, latest=None):
+        calls.append(latest)
+        top = newest if latest is None else latest - 1
+        ids = range(top, max(0, top - page_size), -1)
+        return {"messages": [{"id": message_id} for message_id in ids]}
+    monkeypatch.setattr(catchup.aio, "get_bubble_messages", get_bubble_messages, raising=False)
+    return calls
+
+
+def test_fetch_since_pages_back_to_the_cursor(monkeypatch):
+    calls = fake_history(monkeypatch, newest=120)
+    messages = asyncio.run(fetch_since("token", 1, after_id=30))
+    assert [message["id"] for message in messages] == list(range(31, 121))
+    assert calls == [None, 71]
+
+
+def test_fetch_since_stops_at_an_empty_page(monkeypatch):
+    calls = fake_history(monkeypatch, newest=60)
+    messages = asyncio.run(fetch_since("token", 1, after_id=0))
+    assert [message["id"] for message in messages] == list(range(1, 61))
+    assert calls == [None, 11, 1]
+
+
+def test_fetch_since_gives_up_after_max_pages(monkeypatch, caplog):
+    fake_history(monkeypatch, newest=200)
+    with caplog.at_level(logging.WARNING, logger="catchup"):
+        messages = asyncio.run(fetch_since("token", 1, after_id=0, max_pages=2))
+    assert [message["id"] for message in messages] == list(range(101, 201))
+    assert "stopped after 2 pages" in caplog.text
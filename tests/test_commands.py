@@ -0,0 +1,57 @@
+# Third party imports
+import pytest
+# Local imports
+from commands import CommandRegistry, mention, choice
+
+
+async def handler(bot, user_id, msg_id, *args):
+    pass
+
+
+@pytest.fixture
+def registry():
+    registry = CommandRegistry()
+    registry.command("ban", mention)(handler)
+    registry.command("bot", choice("on", "off"))(handler)
+    registry.command("say", rest=True)(handler)
+    registry.command("stats")(handler)
+    return registry
+
+
+def test_mention():
+    assert mention("<@5301889>") == 5301889
+    for token in ("5301889", "<@abc>", "<@5301889>x"):
+        with pytest.raises(ValueError):
+            mention(token)
+
+
+def test_choice_is_case_insensitive():
+    parse = choice("on", "off")
+    assert parse("ON") == "on"
+    with pytest.raises(ValueError):
+        parse("maybe")
+
+
+def test_parse_converts_arguments(registry):
+    command, values = registry.parse("!ban <@42> spamming")
+    assert command.name == "ban"
+    assert values == [42]
+    assert registry.parse("!BOT Off")[1] == ["off"]
+
+
+def test_parse_rejects_bad_or_missing_arguments(registry):
+    assert registry.parse("!ban someone") is None
+    assert registry.parse("!ban") is None
+    assert registry.parse("!bot maybe") is None
+
+
+def test_parse_passes_the_rest_in_its_original_case(registry):
+    assert registry.parse("!say Hello  World")[1] == ["Hello  World"]
+    assert registry.parse("!say") is None
+
+
+def test_parse_ignores_chatter_and_unknown_commands(registry):
+    assert registry.parse("hello !ban <@42>") is None
+    assert registry.parse("!") is None
+    assert registry.parse("!unknown") is None
+    assert registry.parse("!stats")[1] == []
@@ -0,0 +1,108 @@
+# Standard library imports
+import asyncio
+# Local imports
+from eventqueue import EventWorkerPool
+
+
+def test_events_with_one_key_run_in_order():
+    async def run():
+        pool = EventWorkerPool(workers=4)
+        pool.start()
+        handled = []
+
+        async def handle(key, n):
+            await asyncio.sleep(0.001 * (5 - n))
+            handled.append((key, n))
+        for n in range(5):
+            for key in ("a", "b"):
+                await pool.submit(key, handle, key, n)
+        await pool.stop()
+        return pool, handled
+    pool, handled = asyncio.run(run())
+    for key in ("a", "b"):
+        assert [n for k, n in handled if k == key] == list(range(5))
+    assert (pool.submitted, pool.processed) == (10, 10)
+
+
+def test_errors_are_counted_and_the_worker_carries_on():
+    async def run():
+        pool = EventWorkerPool(workers=1)
+        pool.start()
+        handled = []
+
+        async def fail():
+            raise ValueError("boom")
+
+        async def handle():
+            handled.append(True)
+        await pool.submit(1, fail)
+        await pool.submit(1, handle)
+        await pool.join()
+        await pool.stop()
+        return pool, handled
+    pool, handled = asyncio.run(run())
+    assert pool.errors == 1
+    assert handled == [True]
+
+
+def test_on_timing_reports_each_event():
+    async def run():
+        pool = EventWorkerPool(workers=1)
+        timings = []
+        pool.on_timing = lambda name, waited, ran: timings.append(name)
+        pool.start()
+
+        async def handle():
+            pass
+        await pool.submit(1, handle)
+        await pool.stop()
+        return timings
+    assert asyncio.run(run()) == ["handle"]
+
+
+def full_pool():
+    """A one-slot pool whose worker is stuck until the returned event is set."""
+    pool = EventWorkerPool(workers=1, maxsize=1, put_timeout=0.01)
+    pool.start()
+    release = asyncio.Event()
+
+    async def block():
+        await release.wait()
+    return pool, release, block
+
+
+def test_full_queue_drops_droppable_events():
+    async def run():
+        pool, release, block = full_pool()
+        await pool.submit(1, block)
+        await asyncio.sleep(0)
+        await pool.submit(1, block)
+        dropped = not await pool.submit(1, block, droppable=True)
+        release.set()
+        await pool.stop()
+        return pool, dropped
+    pool, dropped = asyncio.run(run())
+    assert dropped
+    assert pool.dropped == 1
+
+
+def test_full_queue_never_drops_other_events():
+    async def run():
+        pool, release, block = full_pool()
+        handled = []
+
+        async def check_for_banned(user_id):
+            handled.append(user_id)
+        await pool.submit(1, block)
+        await asyncio.sleep(0)
+        await pool.submit(1, block)
+        submit = asyncio.create_task(pool.submit(1, check_for_banned, 42))
+        await asyncio.sleep(0.05)
+        assert not submit.done()
+        release.set()
+        assert await submit
+        await pool.stop()
+        return pool, handled
+    pool, handled = asyncio.run(run())
+    assert handled == [42]
+    assert pool.dropped == 0
@@ -0,0 +1,20 @@
+# Standard library imports
+from datetime import datetime
+# Third party imports
+import pytest
+# Local imports
+from framedecoder import peek_event, parse_timestamp
+
+
+def test_peek_event():
+    assert peek_event('{"event":"pusher:ping","data":{}}') == "pusher:ping"
+    assert peek_event('{"data": "{}", "event" : "App\\\\Events\\\\MessageAdded"}') == "App\\Events\\MessageAdded"
+    assert peek_event('{"data":{}}') == ""
+
+
+def test_parse_timestamp():
+    assert parse_timestamp("2024-03-05 07:08:09") == datetime(2024, 3, 5, 7, 8, 9)
+    # Not zero-padded, so it misses the fast path
+    assert parse_timestamp("2024-3-5 7:08:09") == datetime(2024, 3, 5, 7, 8, 9)
+    with pytest.raises(ValueError):
+        parse_timestamp("yesterday")
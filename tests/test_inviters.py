@@ -0,0 +1,65 @@
+# Standard library imports
+import asyncio
+# Third party imports
+import pytest
+# Local imports
+from inviters import InviterCounts
+from statestore import StateStore
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = StateStore(str(tmp_path / "state.db"))
+    yield state
+    state.close()
+
+
+def test_counts_are_written_after_the_flush_delay(state):
+    async def run():
+        inviters = InviterCounts(state, flush_delay=0.01)
+        assert inviters.increment(7) == 1
+        assert inviters.increment(7) == 2
+        assert state.load_inviters() == {}
+        await asyncio.sleep(0.05)
+        return inviters
+    inviters = asyncio.run(run())
+    assert state.load_inviters() == {7: 2}
+    assert inviters[7] == 2
+    assert inviters[8] == 0
+
+
+def test_max_pending_users_flush_at_once(state):
+    async def run():
+        inviters = InviterCounts(state, flush_delay=60, max_pending=2)
+        inviters.increment(1)
+        assert state.load_inviters() == {}
+        inviters.increment(2)
+        assert state.load_inviters() == {1: 1, 2: 1}
+        inviters.close()
+    asyncio.run(run())
+
+
+def test_close_flushes_the_rest(state):
+    async def run():
+        inviters = InviterCounts(state, flush_delay=60)
+        inviters.increment(3)
+        inviters.close()
+    asyncio.run(run())
+    assert state.load_inviters() == {3: 1}
+
+
+def test_flushes_add_to_other_workers_counts(state, tmp_path):
+    other = StateStore(state.db_path)
+    try:
+        async def run():
+            ours = InviterCounts(state, flush_delay=60)
+            theirs = InviterCounts(other, flush_delay=60)
+            ours.increment(5)
+            theirs.increment(5)
+            theirs.close()
+            ours.close()
+            return ours
+        assert asyncio.run(run())[5] == 2
+        assert state.load_inviters() == {5: 2}
+    finally:
+        other.close()
@@ -0,0 +1,34 @@
+# Standard library imports
+import time
+import logging
+# Local imports
+from logpipeline import RateLimitFilter
+
+
+def record(level=logging.ERROR, lineno=10, msg="failed for user 1"):
+    return logging.LogRecord("mainbot", level, "mainbot.py", lineno, msg, None, None)
+
+
+def test_each_call_site_gets_its_burst():
+    limit = RateLimitFilter(burst=2, window=60)
+    assert [limit.filter(record(msg=f"failed for user {n}")) for n in range(4)] == [True, True, False, False]
+    assert limit.filter(record(lineno=11))
+    assert limit.suppressed == 2
+
+
+def test_records_below_the_level_always_pass():
+    limit = RateLimitFilter(burst=1, window=60, level=logging.WARNING)
+    assert all(limit.filter(record(level=logging.INFO)) for _ in range(10))
+    assert limit.suppressed == 0
+
+
+def test_next_window_reports_what_was_held_back():
+    limit = RateLimitFilter(burst=1, window=0.05)
+    for _ in range(3):
+        limit.filter(record())
+    time.sleep(0.06)
+    first = record()
+    assert limit.filter(first)
+    assert first.suppressed == 2
+    second = record()
+    assert not limit.filter(second)
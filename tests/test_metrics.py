@@ -0,0 +1,53 @@
+# Third party imports
+import pytest
+# Local imports
+from metrics import Histogram
+from pronto import endpoint_label
+
+
+def test_quantile_without_observations():
+    assert Histogram((1.0, 2.0)).quantile(0.5) is None
+
+
+def test_quantile_interpolates_inside_its_bucket():
+    histogram = Histogram((1.0, 2.0, 4.0))
+    for value in (0.5, 0.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.25) == pytest.approx(0.5)
+    assert histogram.quantile(0.5) == pytest.approx(1.0)
+    assert histogram.quantile(0.75) == pytest.approx(2.0)
+    assert histogram.quantile(1.0) == pytest.approx(4.0)
+
+
+def test_quantile_above_the_last_bound_is_the_last_bound():
+    histogram = Histogram((1.0, 2.0))
+    histogram.observe(50.0)
+    assert histogram.quantile(0.99) == 2.0
+
+
+def test_merge():
+    first, second = Histogram((1.0,)), Histogram((1.0,))
+    first.observe(0.5)
+    second.observe(5.0)
+    first.merge(second)
+    assert first.counts == [1, 1]
+    assert (first.count, first.sum) == (2, 5.5)
+
+
+@pytest.mark.parametrize("url, label", [
+    ("https://org.pronto.io/api/clients/messages/123/reactions", "/api/clients/messages/:id/reactions"),
+    ("https://org.pronto.io/api/clients/invites/Xk3pQ9zA", "/api/clients/invites/:code"),
+    ("https://org.pronto.io/api/clients/invites/abcdef", "/api/clients/invites/:code"),
+    ("https://org.pronto.io/api/clients/groups/42/invites", "/api/clients/groups/:id/invites"),
+    ("https://org.pronto.io/api/files/3f2a9c1e-7b1d-4e5f-9a0b-1c2d3e4f5a6b", "/api/files/:id"),
+    ("https://org.pronto.io/api/v1/bubble.kick", "/api/v1/bubble.kick"),
+    ("https://org.pronto.io/api/clients/users/search?page[size]=100", "/api/clients/users/search"),
+    ("https://org.pronto.io", "/"),
+])
+def test_endpoint_label_folds_ids(url, label):
+    assert endpoint_label(url) == label
+
+
+def test_endpoint_label_keeps_invite_deletes_to_one_label():
+    labels = {endpoint_label(f"https://org.pronto.io/api/clients/invites/code{n}") for n in range(100)}
+    assert labels == {"/api/clients/invites/:code"}
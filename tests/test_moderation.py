@@ -0,0 +1,114 @@
+# Standard library imports
+import asyncio
+# Third party imports
+import pytest
+# Local imports
+import moderation
+from moderation import ModerationBatcher
+
+
+class FakeApi:
+    """Records (action, bubble, user IDs) per call. Calls including a user in
+    `failing` fail, and while `hold` is set calls wait for release()."""
+
+    def __init__(self):
+        self.calls = []
+        self.failing = set()
+        self.hold = None
+
+    def endpoint(self, action):
+        async def call(access_token, bubble_id, user_ids):
+            self.calls.append((action, bubble_id, sorted(user_ids)))
+            if self.hold is not None:
+                await self.hold.wait()
+            if self.failing & set(user_ids):
+                raise ConnectionError("rejected")
+            return {"ok": True}
+        return call
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = FakeApi()
+    monkeypatch.setattr(moderation, "kickUserFromBubble", api.endpoint("kick"))
+    monkeypatch.setattr(moderation, "addMemberToBubble", api.endpoint("add"))
+    return api
+
+
+def test_a_lone_kick_goes_out_on_the_next_loop_pass(api):
+    async def run():
+        batcher = ModerationBatcher("token")
+        future = batcher.kick("10", 1)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert api.calls == [("kick", 10, [1])]
+        return await future
+    assert asyncio.run(run()) == {"ok": True}
+
+
+def test_requests_made_together_share_a_call(api):
+    async def run():
+        batcher = ModerationBatcher("token")
+        await asyncio.gather(batcher.kick(10, 1), batcher.kick(10, 2), batcher.kick(10, 2),
+                             batcher.add(10, 3), batcher.kick(11, 4))
+    asyncio.run(run())
+    assert sorted(api.calls) == [("add", 10, [3]), ("kick", 10, [1, 2]), ("kick", 11, [4])]
+
+
+def test_requests_wait_for_the_call_in_flight_then_go_together(api):
+    async def run():
+        batcher = ModerationBatcher("token")
+        api.hold = asyncio.Event()
+        first = batcher.kick(10, 1)
+        await asyncio.sleep(0.01)
+        later = [batcher.kick(10, user_id) for user_id in (2, 3, 4)]
+        await asyncio.sleep(0.01)
+        assert api.calls == [("kick", 10, [1])]
+        api.hold.set()
+        await asyncio.gather(first, *later)
+    asyncio.run(run())
+    assert api.calls == [("kick", 10, [1]), ("kick", 10, [2, 3, 4])]
+
+
+def test_max_batch_sends_without_waiting(api):
+    async def run():
+        batcher = ModerationBatcher("token", max_batch=2)
+        api.hold = asyncio.Event()
+        batcher.kick(10, 1)
+        await asyncio.sleep(0.01)
+        futures = [batcher.kick(10, user_id) for user_id in (2, 3, 4)]
+        await asyncio.sleep(0.01)
+        assert api.calls == [("kick", 10, [1]), ("kick", 10, [2, 3])]
+        api.hold.set()
+        await asyncio.gather(*futures)
+        await batcher.close()
+    asyncio.run(run())
+    assert api.calls[-1] == ("kick", 10, [4])
+
+
+def test_a_failed_batch_is_retried_one_by_one(api):
+    async def run():
+        batcher = ModerationBatcher("token")
+        api.failing = {2}
+        return await asyncio.gather(batcher.kick(10, 1), batcher.kick(10, 2), return_exceptions=True), batcher
+    (kicked, failed), batcher = asyncio.run(run())
+    assert kicked == {"ok": True}
+    assert isinstance(failed, ConnectionError)
+    assert api.calls == [("kick", 10, [1, 2]), ("kick", 10, [1]), ("kick", 10, [2])]
+    assert batcher.errors == 1
+
+
+def test_close_sends_everything_queued(api):
+    async def run():
+        batcher = ModerationBatcher("token")
+        api.hold = asyncio.Event()
+        batcher.kick(10, 1)
+        await asyncio.sleep(0.01)
+        queued = batcher.kick(10, 2)
+        asyncio.get_running_loop().call_later(0.01, api.hold.set)
+        await batcher.close()
+        assert queued.done()
+        return batcher
+    batcher = asyncio.run(run())
+    assert api.calls == [("kick", 10, [1]), ("kick", 10, [2])]
+    assert (batcher.batches, batcher.users) == (2, 2)
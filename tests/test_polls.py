@@ -0,0 +1,97 @@
+# Standard library imports
+import asyncio
+# Third party imports
+import pytest
+# Local imports
+import polls
+from polls import PollTallies
+from statestore import StateStore
+
+
+def summary(**counts):
+    return [{"emoji": emoji, "count": count} for emoji, count in counts.items()]
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = StateStore(str(tmp_path / "state.db"))
+    state.add_poll(1, 100, "Lunch?", 10, 0)
+    yield state
+    state.close()
+
+
+@pytest.fixture
+def threads(monkeypatch):
+    """bubble.history answers for poll threads: message_id -> reaction summary. Records every fetch."""
+    threads = {"summaries": {10: summary(a=1, b=2)}, "fetches": []}
+
+    async def get_bubble_thread(access_token, bubble_id, message_id):
+        threads["fetches"].append(message_id)
+        await asyncio.sleep(0)
+        if message_id not in threads["summaries"]:
+            return {"parentmessages": [], "messages": []}
+        return {"parentmessages": [{"id": message_id, "reactionsummary": threads["summaries"][message_id]}]}
+    monkeypatch.setattr(polls.aio, "get_bubble_thread", get_bubble_thread, raising=False)
+    return threads
+
+
+def test_pushed_summaries_answer_without_a_fetch(state, threads):
+    tallies = PollTallies(state, "token")
+    assert tallies.apply_update({"id": 10, "reactionsummary": summary(a=3)})
+    assert asyncio.run(tallies.counts(100, 10)) == {"a": 3}
+    assert threads["fetches"] == []
+    assert (tallies.hits, tallies.updates) == (1, 1)
+
+
+def test_updates_to_other_messages_are_ignored(state, threads):
+    tallies = PollTallies(state, "token")
+    assert not tallies.apply_update({"id": 11, "reactionsummary": summary(a=3)})
+    assert not tallies.apply_update({"id": 10})
+    assert tallies.updates == 0
+
+
+def test_a_miss_is_fetched_once_for_concurrent_queries(state, threads):
+    async def run():
+        tallies = PollTallies(state, "token")
+        results = await asyncio.gather(*(tallies.counts(100, 10) for _ in range(3)))
+        results.append(await tallies.counts(100, 10))
+        return tallies, results
+    tallies, results = asyncio.run(run())
+    assert results == [{"a": 1, "b": 2}] * 4
+    assert threads["fetches"] == [10]
+    assert (tallies.hits, tallies.misses) == (1, 3)
+
+
+def test_stale_counts_are_refetched(state, threads):
+    async def run():
+        tallies = PollTallies(state, "token", max_age=0)
+        await tallies.counts(100, 10)
+        threads["summaries"][10] = summary(a=5)
+        return await tallies.counts(100, 10)
+    assert asyncio.run(run()) == {"a": 5}
+    assert threads["fetches"] == [10, 10]
+
+
+def test_unknown_polls_are_none(state, threads):
+    assert asyncio.run(PollTallies(state, "token").counts(100, 99)) is None
+
+
+def test_a_fetched_poll_is_followed_from_then_on(state, threads):
+    async def run():
+        tallies = PollTallies(state, "token")
+        threads["summaries"][20] = summary(x=1)
+        await tallies.counts(100, 20)
+        return tallies
+    tallies = asyncio.run(run())
+    assert tallies.apply_update({"id": 20, "reactionsummary": summary(x=2)})
+
+
+def test_least_recently_used_polls_are_evicted(state, threads):
+    tallies = PollTallies(state, "token", max_polls=2)
+    for message_id in (10, 11, 12):
+        tallies.track(message_id)
+    tallies.apply_update({"id": 10, "reactionsummary": summary(a=1)})
+    tallies.apply_update({"id": 11, "reactionsummary": summary(a=1)})
+    assert asyncio.run(tallies.counts(100, 10)) == {"a": 1}
+    tallies.apply_update({"id": 12, "reactionsummary": summary(a=1)})
+    assert list(tallies._tallies) == [10, 12]
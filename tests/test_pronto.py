@@ -0,0 +1,68 @@
+# Standard library imports
+import json
+import asyncio
+# Third party imports
+import pytest
+# Local imports
+import pronto
+from pronto import HTTPResponse, purgeInvites
+
+
+class FakeTransport:
+    """Answers DELETE /invites/<code> from `replies`: code -> (status, body), default an empty 204.
+
+    Each request takes `delay` seconds; tracks how many run at once.
+    """
+
+    def __init__(self, replies=None, delay=0.0):
+        self.replies = replies or {}
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+        self.urls = []
+
+    async def perform(self, method, url, headers, body):
+        self.urls.append(url)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        status, payload = self.replies.get(url.rsplit("/", 1)[1], (204, None))
+        return HTTPResponse(status, json.dumps(payload).encode() if payload is not None else b"", {})
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    transport = FakeTransport()
+    monkeypatch.setattr(pronto, "async_transport", lambda: transport)
+    return transport
+
+
+def test_purge_reports_every_code(transport):
+    report = asyncio.run(purgeInvites("token", ["a", "b", "c"]))
+    assert report == {code: {"ok": True, "error": None} for code in "abc"}
+    assert sorted(url.rsplit("/", 1)[1] for url in transport.urls) == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize("status", [403, 404, 500])
+def test_rejected_deletes_are_reported_as_failed(transport, status):
+    transport.replies = {"gone": (status, {"message": "Not found."})}
+    report = asyncio.run(purgeInvites("token", ["gone", "ok"]))
+    assert report["ok"] == {"ok": True, "error": None}
+    assert not report["gone"]["ok"]
+    assert str(status) in report["gone"]["error"]
+
+
+def test_purge_runs_at_most_concurrency_deletes_at_once(transport):
+    transport.delay = 0.01
+    report = asyncio.run(purgeInvites("token", [f"code{n}" for n in range(10)], concurrency=3))
+    assert all(result["ok"] for result in report.values())
+    assert transport.peak == 3
+
+
+def test_slow_deletes_time_out(transport):
+    transport.delay = 1.0
+    report = asyncio.run(purgeInvites("token", ["slow"], timeout=0.01))
+    assert report == {"slow": {"ok": False, "error": "timed out after 0.01s"}}
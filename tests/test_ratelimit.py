@@ -0,0 +1,118 @@
+# Standard library imports
+import asyncio
+# Third party imports
+import pytest
+# Local imports
+from ratelimit import (RequestScheduler, TokenBucket, RateLimited, Dropped, parse_limits, _Family,
+                       MIN_RATE, RECOVER_AFTER, URGENT, NORMAL, LOW)
+
+
+def test_token_bucket_spends_its_burst_then_waits_for_the_rate():
+    bucket = TokenBucket(rate=2, burst=2)
+    now = bucket.updated
+    assert bucket.take(now) == 0
+    assert bucket.take(now) == 0
+    assert bucket.take(now) == pytest.approx(0.5)
+    assert bucket.take(now + 0.5) == 0
+
+
+def test_token_bucket_refills_no_further_than_its_burst():
+    bucket = TokenBucket(rate=10, burst=3)
+    now = bucket.updated + 60
+    for _ in range(3):
+        assert bucket.take(now) == 0
+    assert bucket.take(now) > 0
+
+
+def test_parse_limits():
+    assert parse_limits("messages=5:10, invites=10") == {"messages": (5.0, 10), "invites": (10.0, 10)}
+    assert parse_limits("reactions=0.5") == {"reactions": (0.5, 1)}
+    assert parse_limits("") == {}
+    assert parse_limits(None) == {}
+
+
+def test_families_are_unlimited_by_default():
+    async def run():
+        scheduler = RequestScheduler()
+        for _ in range(500):
+            await scheduler.acquire("memberships", URGENT)
+        return scheduler
+    scheduler = asyncio.run(run())
+    assert scheduler.families["memberships"].bucket is None
+    assert scheduler.depth() == {}
+
+
+def test_a_429_throttles_an_unlimited_family_and_retries():
+    async def run():
+        scheduler = RequestScheduler()
+        attempts = []
+
+        async def send():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RateLimited("429", retry_after=0)
+            return "sent"
+        result = await scheduler.run("https://example/api/v1/message.create", send)
+        return scheduler, result, len(attempts)
+    scheduler, result, attempts = asyncio.run(run())
+    assert (result, attempts, scheduler.throttled) == ("sent", 2, 1)
+    family = scheduler.families["messages"]
+    assert family.bucket is not None and family.bucket.rate == MIN_RATE
+
+
+def test_a_throttled_family_recovers_its_configured_limit():
+    family = _Family("messages", (10, 10))
+    family.throttle(now=0)
+    assert family.bucket.rate == 5
+    family.record_send(now=RECOVER_AFTER)
+    assert family.bucket.rate == 7.5
+    family.record_send(now=2 * RECOVER_AFTER)
+    assert (family.bucket.rate, family.bucket.capacity) == (10, 10)
+    assert family.ceiling is None
+
+
+def test_a_throttled_unlimited_family_recovers_to_no_limit():
+    family = _Family("invites")
+    family.throttle(now=0)
+    assert family.bucket.rate == MIN_RATE
+    for step in range(1, 4):
+        family.record_send(now=step * RECOVER_AFTER)
+    assert family.bucket is None
+
+
+def test_waiters_get_tokens_by_priority_then_arrival():
+    async def run():
+        scheduler = RequestScheduler({"messages": (100, 1)})
+        await scheduler.acquire("messages")
+        order = []
+
+        async def request(label, level):
+            await scheduler.acquire("messages", level)
+            order.append(label)
+        tasks = [asyncio.create_task(request(label, level)) for label, level in
+                 (("low", LOW), ("normal 1", NORMAL), ("urgent", URGENT), ("normal 2", NORMAL))]
+        await asyncio.gather(*tasks)
+        return order
+    assert asyncio.run(run()) == ["urgent", "normal 1", "normal 2", "low"]
+
+
+def test_low_priority_is_shed_when_the_family_is_backed_up():
+    async def run():
+        scheduler = RequestScheduler({"reactions": (1, 1)}, shed_depth=1)
+        await scheduler.acquire("reactions", LOW)
+        waiting = asyncio.create_task(scheduler.acquire("reactions", NORMAL))
+        await asyncio.sleep(0)
+        with pytest.raises(Dropped):
+            await scheduler.acquire("reactions", LOW)
+        waiting.cancel()
+        return scheduler
+    assert asyncio.run(run()).dropped == 1
+
+
+def test_low_priority_is_shed_while_the_family_is_paused():
+    async def run():
+        scheduler = RequestScheduler()
+        scheduler.pause("reactions", 5)
+        with pytest.raises(Dropped):
+            await scheduler.acquire("reactions", LOW)
+    asyncio.run(run())
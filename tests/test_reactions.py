@@ -0,0 +1,109 @@
+# Standard library imports
+import asyncio
+# Third party imports
+import pytest
+# Local imports
+import reactions
+from pronto import BackendError
+from reactions import ReactionService, variants, VARIATION_SELECTOR
+from statestore import StateStore
+
+HEART = "❤"
+HEART_FE0F = HEART + VARIATION_SELECTOR
+
+
+class FakeApi:
+    """send_reaction accepting only the forms in `accepted`; other forms get a 422.
+
+    `error` (a BackendError) is raised instead when set.
+    """
+
+    def __init__(self, accepted):
+        self.accepted = set(accepted)
+        self.error = None
+        self.sent = []
+
+    async def send_reaction(self, access_token, form, msg_id):
+        self.sent.append(form)
+        if self.error is not None:
+            raise self.error
+        if form not in self.accepted:
+            raise BackendError("HTTP error occurred: 422", 422)
+        return {"data": {"message_id": msg_id}}
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = StateStore(str(tmp_path / "state.db"))
+    yield state
+    state.close()
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = FakeApi([HEART_FE0F])
+    monkeypatch.setattr(reactions.aio, "send_reaction", api.send_reaction, raising=False)
+    return api
+
+
+def test_variants():
+    assert variants(HEART) == [HEART, HEART_FE0F]
+    assert variants(HEART_FE0F) == [HEART_FE0F, HEART]
+
+
+def test_learns_and_remembers_the_accepted_form(state, api):
+    async def run():
+        service = ReactionService(state, "token")
+        assert await service.send(HEART, 1)
+        assert await service.send(HEART, 2)
+        return service
+    service = asyncio.run(run())
+    assert api.sent == [HEART, HEART_FE0F, HEART_FE0F]
+    assert (service.sent, service.retries) == (2, 1)
+    assert state.load_emoji_forms() == {HEART: HEART_FE0F}
+    # A restart starts from the stored form
+    assert ReactionService(state, "token").forms == {HEART: HEART_FE0F}
+
+
+def test_invalid_body_counts_as_rejected(state, api, monkeypatch):
+    async def send_reaction(access_token, form, msg_id):
+        api.sent.append(form)
+        return {"message": "The given data was invalid."} if form == HEART else {"data": {}}
+    monkeypatch.setattr(reactions.aio, "send_reaction", send_reaction, raising=False)
+    assert asyncio.run(ReactionService(state, "token").send(HEART, 1))
+    assert state.load_emoji_forms() == {HEART: HEART_FE0F}
+
+
+@pytest.mark.parametrize("status", [401, 500, None])
+def test_other_errors_are_not_remembered(state, api, status):
+    async def run():
+        service = ReactionService(state, "token")
+        api.error = BackendError("Unauthenticated.", status)
+        with pytest.raises(BackendError):
+            await service.send(HEART, 1)
+        return service
+    service = asyncio.run(run())
+    assert api.sent == [HEART]
+    assert service.sent == 0
+    assert state.load_emoji_forms() == {}
+
+
+def test_a_form_that_stops_working_is_forgotten(state, api):
+    state.save_emoji_form(HEART, HEART)
+    service = ReactionService(state, "token")
+    assert not asyncio.run(service.send(HEART, 1))
+    assert state.load_emoji_forms() == {}
+    assert HEART not in service.forms
+
+
+def test_react_counts_failures_in_the_background(state, api):
+    async def run():
+        service = ReactionService(state, "token")
+        service.react(HEART, 1)
+        await service.close()
+        api.error = BackendError("Server Error", 500)
+        service.react(HEART, 2)
+        await service.close()
+        return service
+    service = asyncio.run(run())
+    assert (service.sent, service.failed) == (1, 1)
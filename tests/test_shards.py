@@ -0,0 +1,39 @@
+# Local imports
+from shards import rebalance
+
+ADMIN = 100
+
+
+def bubbles(*ids):
+    return {bubble_id: ADMIN for bubble_id in ids}
+
+
+def test_new_workers_share_the_bubbles_evenly():
+    plan = rebalance(bubbles(1, 2, 3, 4, 5), {0: {}, 1: {}})
+    assert sorted(len(assigned) for assigned in plan.values()) == [2, 3]
+    assert set(plan[0]) | set(plan[1]) == {1, 2, 3, 4, 5}
+
+
+def test_balanced_assignment_is_left_alone():
+    current = {0: bubbles(1, 2), 1: bubbles(3)}
+    assert rebalance(bubbles(1, 2, 3), current) == current
+
+
+def test_bubbles_of_a_dead_worker_go_to_the_least_loaded():
+    plan = rebalance(bubbles(1, 2, 3, 4), {0: bubbles(1, 2), 1: {}})
+    assert plan[0] == bubbles(1, 2)
+    assert plan[1] == bubbles(3, 4)
+
+
+def test_uneven_load_moves_as_few_bubbles_as_possible():
+    plan = rebalance(bubbles(1, 2, 3, 4), {0: bubbles(1, 2, 3, 4), 1: {}})
+    assert plan == {0: bubbles(1, 2), 1: bubbles(3, 4)}
+
+
+def test_removed_bubbles_are_dropped():
+    plan = rebalance(bubbles(1), {0: bubbles(1, 2)})
+    assert plan == {0: bubbles(1)}
+
+
+def test_no_workers():
+    assert rebalance(bubbles(1, 2), {}) == {}
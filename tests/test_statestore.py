@@ -0,0 +1,72 @@
+# Standard library imports
+import json
+# Third party imports
+import pytest
+# Local imports
+from statestore import StateStore
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = StateStore(str(tmp_path / "state.db"))
+    yield state
+    state.close()
+
+
+def test_migrate_files_imports_once(state, tmp_path):
+    (tmp_path / "bans.txt").write_text("1\n2\n\n")
+    (tmp_path / "inviters.json").write_text(json.dumps([{"user_id": 5, "count": 3}]))
+    (tmp_path / "pollinfo.json").write_text(json.dumps(
+        [{"poll_id": 1, "message_id": 10, "message": "Lunch?", "poll_type": 0}]))
+    state.migrate_files(str(tmp_path))
+    assert state.load_bans() == {1, 2}
+    assert state.load_inviters() == {5: 3}
+    assert state.get_poll(1)["message"] == "Lunch?"
+
+    (tmp_path / "bans.txt").write_text("7\n")
+    state.migrate_files(str(tmp_path))
+    assert state.load_bans() == {1, 2}
+
+
+def test_migrate_files_without_files(state, tmp_path):
+    state.migrate_files(str(tmp_path))
+    assert state.load_bans() == set()
+    assert state.get_meta("files_migrated") == "1"
+
+
+def test_add_inviters_adds_to_other_connections_counts(state):
+    other = StateStore(state.db_path)
+    try:
+        assert state.add_inviters({1: 2}) == {1: 2}
+        assert other.add_inviters({1: 1, 2: 1}) == {1: 3, 2: 1}
+        assert state.load_inviters() == {1: 3, 2: 1}
+    finally:
+        other.close()
+
+
+def test_poll_ids_are_unique_across_connections(state):
+    other = StateStore(state.db_path)
+    try:
+        ids = [state.next_poll_id(), other.next_poll_id(), state.next_poll_id()]
+        assert ids == [1, 2, 3]
+    finally:
+        other.close()
+
+
+def test_get_poll_filters_by_bubble(state):
+    state.add_poll(1, 100, "Lunch?", 10, 0)
+    assert state.get_poll(1, 100)["message_id"] == 10
+    assert state.get_poll(1, 200) is None
+    assert state.get_poll(2) is None
+
+
+def test_data_version_changes_on_another_connections_commit(state):
+    other = StateStore(state.db_path)
+    try:
+        version = state.data_version()
+        state.add_ban(1)
+        assert state.data_version() == version
+        other.add_ban(2)
+        assert state.data_version() != version
+    finally:
+        other.close()
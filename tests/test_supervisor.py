@@ -0,0 +1,107 @@
+# Standard library imports
+import asyncio
+# Local imports
+import supervisor
+from supervisor import Backoff, ConnectionMetrics, ConnectionSupervisor, HealthCheck
+
+
+def test_backoff_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(supervisor.random, "uniform", lambda low, high: high)
+    backoff = Backoff(base=0.25, cap=1.0)
+    assert [backoff.next_delay() for _ in range(4)] == [0.25, 0.5, 1.0, 1.0]
+    backoff.reset()
+    assert backoff.next_delay() == 0.25
+
+
+def test_backoff_is_jittered_below_the_bound():
+    backoff = Backoff(base=1.0, cap=4.0)
+    for bound in (1.0, 2.0, 4.0, 4.0):
+        assert 0 <= backoff.next_delay() <= bound
+
+
+def run_supervisor(outcomes, **kwargs):
+    """Run a supervisor whose connect() follows `outcomes`, then fails until it gives up.
+
+    Each outcome is "fail" (never connects), "drop" or "error" (connects, then
+    the connection ends). Returns the supervisor and (outcome, backoff attempt)
+    for every connect() call.
+    """
+    attempts = []
+
+    async def connect():
+        outcome = outcomes[len(attempts)] if len(attempts) < len(outcomes) else "fail"
+        attempts.append((outcome, sup.backoff.attempt))
+        if outcome == "fail":
+            raise ConnectionError("refused")
+        sup.connected()
+        if outcome == "error":
+            raise ConnectionError("reset")
+    sup = ConnectionSupervisor(connect, Backoff(base=0.001, cap=0.001), **kwargs)
+    asyncio.run(asyncio.wait_for(sup.run(), 5))
+    return sup, attempts
+
+
+def test_gives_up_after_max_failures_in_a_row():
+    sup, attempts = run_supervisor([], max_failures=3)
+    assert len(attempts) == 3
+    assert sup.metrics.failed_attempts == 3
+    assert sup.metrics.connects == 0
+
+
+def test_a_connection_resets_the_failure_count():
+    sup, attempts = run_supervisor(["fail", "fail", "drop", "fail", "error"], max_failures=3)
+    # Two failures, a connection, one failure, a connection, then three failures
+    assert len(attempts) == 8
+    assert (sup.metrics.connects, sup.metrics.disconnects, sup.metrics.failed_attempts) == (2, 2, 6)
+    # Resumed after the first failures and after the drop
+    assert sup.metrics.resumes == 2
+
+
+def test_a_stable_connection_resets_the_backoff():
+    _, attempts = run_supervisor(["fail", "fail", "drop"], max_failures=3, stable_after=0)
+    assert attempts[:4] == [("fail", 0), ("fail", 1), ("drop", 2), ("fail", 1)]
+
+
+def test_an_unstable_connection_keeps_backing_off():
+    _, attempts = run_supervisor(["fail", "fail", "drop"], max_failures=3, stable_after=60)
+    assert attempts[:4] == [("fail", 0), ("fail", 1), ("drop", 2), ("fail", 3)]
+
+
+class FakeWebsocket:
+    def __init__(self, health=None):
+        self.health = health
+        self.sent = []
+        self.closed = False
+
+    async def send(self, data):
+        self.sent.append(data)
+        if self.health is not None:
+            asyncio.get_running_loop().call_soon(self.health.pong)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_health_check_drops_a_connection_without_pongs():
+    metrics = ConnectionMetrics()
+    websocket = FakeWebsocket()
+    asyncio.run(HealthCheck(metrics, interval=0.001, timeout=0.01).run(websocket))
+    assert websocket.closed
+    assert len(websocket.sent) == 1
+    assert metrics.health_timeouts == 1
+
+
+def test_health_check_records_pong_latency():
+    async def run():
+        health = HealthCheck(metrics, interval=0.001, timeout=1.0)
+        websocket = FakeWebsocket(health)
+        task = asyncio.create_task(health.run(websocket))
+        while metrics.last_pong_latency is None:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        return websocket
+    metrics = ConnectionMetrics()
+    websocket = asyncio.run(run())
+    assert not websocket.closed
+    assert metrics.health_timeouts == 0
+    assert 0 <= metrics.last_pong_latency < 1.0
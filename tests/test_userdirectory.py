@@ -0,0 +1,121 @@
+# Standard library imports
+import asyncio
+# Third party imports
+import pytest
+# Local imports
+import pronto
+import userdirectory
+from statestore import StateStore
+from userdirectory import UserDirectory
+
+
+def user(user_id, name="Ada"):
+    return {"id": user_id, "firstname": name, "lastname": "Lovelace"}
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """getUsers serving three pages of two users; records the cursor of every call as it starts."""
+    calls = []
+    data = {None: ([user(1), user(2)], "b"), "b": ([user(3), user(4)], "c"), "c": ([user(5)], None)}
+
+    async def get_users(access_token, cursor):
+        calls.append(cursor)
+        users, next_cursor = data[cursor]
+        return {"data": users, "cursors": {"next": next_cursor}}
+    monkeypatch.setattr(pronto.aio, "getUsers", get_users, raising=False)
+    return calls
+
+
+def test_iter_users_prefetches_the_next_page(pages):
+    async def run():
+        users = pronto.aio.iterUsers("token")
+        first = await users.__anext__()
+        # The caller is still on page one; page two is already on its way
+        await asyncio.sleep(0)
+        seen = list(pages)
+        rest = [user["id"] async for user in users]
+        return first["id"], seen, rest
+    first, seen, rest = asyncio.run(run())
+    assert first == 1
+    assert seen == [None, "b"]
+    assert rest == [2, 3, 4, 5]
+    assert pages == [None, "b", "c"]
+
+
+def test_iter_users_cancels_the_prefetch_when_abandoned(pages):
+    async def run():
+        users = pronto.aio.iterUsers("token")
+        await users.__anext__()
+        await users.aclose()
+        await asyncio.sleep(0)
+    asyncio.run(run())
+    assert pages == [None]
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = StateStore(str(tmp_path / "state.db"))
+    yield state
+    state.close()
+
+
+@pytest.fixture
+def org(monkeypatch):
+    """The users iterUsers yields, and how many walks have started."""
+    org = {"users": [user(1), user(2)], "walks": 0, "fail": False}
+
+    async def iter_users(access_token):
+        org["walks"] += 1
+        await asyncio.sleep(0.01)
+        if org["fail"]:
+            raise ConnectionError("users API down")
+        for item in list(org["users"]):
+            yield item
+    monkeypatch.setattr(userdirectory.aio, "iterUsers", iter_users, raising=False)
+    return org
+
+
+def test_sync_if_stale_skips_a_fresh_directory(state, org):
+    async def run():
+        users = UserDirectory(state, "token", batch_size=1)
+        await users.sync_if_stale()
+        await users.sync_if_stale()
+        return users
+    users = asyncio.run(run())
+    assert org["walks"] == 1
+    assert [user["id"] for user in users.scan()] == [1, 2]
+
+
+def test_sync_if_stale_shares_a_running_sync(state, org):
+    async def run():
+        users = UserDirectory(state, "token", sync_interval=0)
+        await asyncio.gather(users.sync_if_stale(), users.sync_if_stale())
+    asyncio.run(run())
+    assert org["walks"] == 1
+    assert state.user_count() == 2
+
+
+def test_stale_sync_drops_users_who_left(state, org):
+    async def run():
+        users = UserDirectory(state, "token", sync_interval=0)
+        await users.sync_if_stale()
+        org["users"] = [user(2, "Grace")]
+        await users.sync_if_stale()
+        return await users.name(2)
+    assert asyncio.run(run()) == "Grace Lovelace"
+    assert org["walks"] == 2
+    assert state.get_user(1) is None
+
+
+def test_failed_sync_is_logged_and_retried(state, org, caplog):
+    async def run():
+        users = UserDirectory(state, "token")
+        org["fail"] = True
+        await users.sync_if_stale()
+        org["fail"] = False
+        await users.sync_if_stale()
+    asyncio.run(run())
+    assert "User directory sync failed" in caplog.text
+    assert org["walks"] == 2
+    assert state.user_count() == 2
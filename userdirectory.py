@@ -0,0 +1,86 @@
+# Standard library imports
+import time
+import asyncio
+import logging
+# Local imports
+from pronto import aio
+from statestore import user_fullname
+
+logger = logging.getLogger(__name__)
+
+
+class UserDirectory:
+    """Org users cached in the StateStore's users table.
+
+    Lookups read one row; a user missing from the cache (or older than
+    `max_age`) is fetched with user.info and stored. sync() streams the whole
+    org through aio.iterUsers and writes it `batch_size` users at a time, so
+    neither a sync nor scan() holds the org in memory. sync_if_stale() skips
+    the walk when the last full sync is newer than `sync_interval`. Nothing
+    syncs in the background; callers that need the whole org run it.
+    """
+
+    def __init__(self, state, access_token, sync_interval=6 * 3600, max_age=24 * 3600, batch_size=500):
+        self.state = state
+        self.access_token = access_token
+        self.sync_interval = sync_interval
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self._sync_task = None
+
+    async def get(self, user_id):
+        """Return the user object, or None if Pronto doesn't know the user."""
+        user_id = int(user_id)
+        cached = self.state.get_user(user_id)
+        if cached is not None and time.time() - cached[1] < self.max_age:
+            return cached[0]
+        try:
+            info = await aio.userInfo(self.access_token, user_id)
+        except Exception as e:
+            logger.error(f"Failed to look up user {user_id}: {e}")
+            # A stale row beats no answer
+            return cached[0] if cached is not None else None
+        user = info.get("user")
+        if user:
+            self.state.upsert_users([user], time.time())
+        return user
+
+    async def name(self, user_id):
+        user = await self.get(user_id)
+        return user_fullname(user) if user else f"User {user_id}"
+
+    def scan(self):
+        """Iterate over every cached user without loading them all at once."""
+        return self.state.iter_users(self.batch_size)
+
+    async def sync(self):
+        """Refresh the cache from the users API and drop users who left the org."""
+        started = time.time()
+        batch = []
+        seen = 0
+        async for user in aio.iterUsers(self.access_token):
+            batch.append(user)
+            if len(batch) >= self.batch_size:
+                self.state.upsert_users(batch, started)
+                seen += len(batch)
+                batch = []
+        if batch:
+            self.state.upsert_users(batch, started)
+            seen += len(batch)
+        removed = self.state.delete_users_before(started)
+        self.state.set_meta("users_synced_at", started)
+        logger.info(f"User directory synced: {seen} users, {removed} removed, {time.time() - started:.1f}s")
+
+    async def sync_if_stale(self):
+        """Run sync() unless one finished within sync_interval (or is already running)."""
+        if self._sync_task is not None and not self._sync_task.done():
+            await asyncio.wait([self._sync_task])
+            return
+        last = float(self.state.get_meta("users_synced_at", 0))
+        if time.time() - last < self.sync_interval:
+            return
+        self._sync_task = asyncio.ensure_future(self.sync())
+        try:
+            await asyncio.shield(self._sync_task)
+        except Exception as e:
+            logger.error(f"User directory sync failed: {e}")